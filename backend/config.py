@@ -31,6 +31,9 @@ GOOGLE_CLIENT_ID = env('GOOGLE_CLIENT_ID')
 AD_REWARD_MAX_PER_HOUR = int(env('AD_REWARD_MAX_PER_HOUR', '5'))
 AD_REWARD_MAX_PER_DAY = int(env('AD_REWARD_MAX_PER_DAY', '20'))
 
+# Store readings.result_json in the compact card-index format (old rows stay readable either way)
+READINGS_COMPACT_RESULT = env('READINGS_COMPACT_RESULT', 'true').lower() == 'true'
+
 # Life settings
 LIFE_MAX = int(env('LIFE_MAX', '5'))
 
@@ -44,6 +47,67 @@ ADMIN_LIFE_OVERRIDE = int(env('ADMIN_LIFE_OVERRIDE', '99'))
 # Testing helpers
 DISABLE_INTERPRETATION_LIMITS = env('DISABLE_INTERPRETATION_LIMITS', 'false').lower() == 'true'
 
+# Daily Claude token budgets (0 = unlimited); over budget, generation serves cached or template text
+INTERPRETATION_USER_DAILY_TOKENS = int(env('INTERPRETATION_USER_DAILY_TOKENS', '100000'))
+INTERPRETATION_GLOBAL_DAILY_TOKENS = int(env('INTERPRETATION_GLOBAL_DAILY_TOKENS', '0'))
+
+# Estimated input-token budget per interpretation prompt (0 = no trimming)
+INTERPRETATION_PROMPT_TOKEN_BUDGET = int(env('INTERPRETATION_PROMPT_TOKEN_BUDGET', '2500'))
+
+# Interpretation cache
+INTERPRETATION_CACHE_ENABLED = env('INTERPRETATION_CACHE_ENABLED', 'true').lower() == 'true'
+INTERPRETATION_CACHE_MEMORY_SIZE = int(env('INTERPRETATION_CACHE_MEMORY_SIZE', '1024'))
+INTERPRETATION_CACHE_TTL_SECONDS = int(env('INTERPRETATION_CACHE_TTL_SECONDS', '604800'))  # 7 days
+INTERPRETATION_CACHE_MAX_ROWS = int(env('INTERPRETATION_CACHE_MAX_ROWS', '50000'))
+INTERPRETATION_CACHE_PRUNE_EVERY = int(env('INTERPRETATION_CACHE_PRUNE_EVERY', '200'))
+
+# Interpretation generation coalescing
+INTERPRETATION_SINGLE_FLIGHT_LEASE_SECONDS = int(env('INTERPRETATION_SINGLE_FLIGHT_LEASE_SECONDS', '120'))
+INTERPRETATION_SINGLE_FLIGHT_WAIT_SECONDS = int(env('INTERPRETATION_SINGLE_FLIGHT_WAIT_SECONDS', '90'))
+
+# Interpretation generate deadline (0 disables; clients may pass deadline_ms).
+# Keep 0 until every shipped app handles provisional responses.
+INTERPRETATION_GENERATE_DEADLINE_SECONDS = float(env('INTERPRETATION_GENERATE_DEADLINE_SECONDS', '0'))
+INTERPRETATION_BACKGROUND_DRAIN_SECONDS = float(env('INTERPRETATION_BACKGROUND_DRAIN_SECONDS', '30'))
+
+# LLM generation admission (per worker)
+INTERPRETATION_LLM_CONCURRENCY = int(env('INTERPRETATION_LLM_CONCURRENCY', '32'))
+INTERPRETATION_LLM_QUEUE_SIZE = int(env('INTERPRETATION_LLM_QUEUE_SIZE', '64'))
+INTERPRETATION_LLM_THREADS = int(env('INTERPRETATION_LLM_THREADS', '16'))
+
+# What to do with a generation when the client disconnects: cancel or persist
+INTERPRETATION_DISCONNECT_POLICY_GENERATE = env('INTERPRETATION_DISCONNECT_POLICY_GENERATE', 'persist')
+INTERPRETATION_DISCONNECT_POLICY_STREAM = env('INTERPRETATION_DISCONNECT_POLICY_STREAM', 'cancel')
+
+# Interpretation job queue / worker
+INTERPRETATION_JOB_MAX_ATTEMPTS = int(env('INTERPRETATION_JOB_MAX_ATTEMPTS', '5'))
+INTERPRETATION_JOB_RETRY_BACKOFF = float(env('INTERPRETATION_JOB_RETRY_BACKOFF', '10'))
+INTERPRETATION_JOB_LEASE_SECONDS = int(env('INTERPRETATION_JOB_LEASE_SECONDS', '300'))
+INTERPRETATION_WORKER_CONCURRENCY = int(env('INTERPRETATION_WORKER_CONCURRENCY', '8'))
+INTERPRETATION_WORKER_POLL_SECONDS = float(env('INTERPRETATION_WORKER_POLL_SECONDS', '1'))
+
+# Fortune keys whose interpretation /readings/execute enqueues right away (no client question)
+INTERPRETATION_PREFETCH_KEYS = set(env_list('INTERPRETATION_PREFETCH_KEYS', ''))
+
+# today_free pregeneration
+TODAY_FREE_PREGEN_CONCURRENCY = int(env('TODAY_FREE_PREGEN_CONCURRENCY', '8'))
+TODAY_FREE_PREGEN_LEAD_MINUTES = int(env('TODAY_FREE_PREGEN_LEAD_MINUTES', '30'))
+
+# Daily draw precomputation (0 workers = one per CPU)
+DAILY_DRAWS_ACTIVE_DAYS = int(env('DAILY_DRAWS_ACTIVE_DAYS', '14'))
+DAILY_DRAWS_WORKERS = int(env('DAILY_DRAWS_WORKERS', '0'))
+DAILY_DRAWS_SHARD_SIZE = int(env('DAILY_DRAWS_SHARD_SIZE', '50000'))
+DAILY_DRAWS_LEAD_MINUTES = int(env('DAILY_DRAWS_LEAD_MINUTES', '60'))
+
+# Spread registry (fortune_spreads) reload interval; 0 = load once at startup
+SPREAD_REGISTRY_RELOAD_SECONDS = float(env('SPREAD_REGISTRY_RELOAD_SECONDS', '60'))
+
+# Seed version for new readings (1 = sha256 + Mersenne Twister, 2 = blake2b counter stream; opt in to 2).
+# Date-seeded readings switch on READINGS_SEED_VERSION_FROM (UTC seed date, YYYY-MM-DD; empty = now),
+# so set it to a future seed date together with READINGS_SEED_VERSION.
+READINGS_SEED_VERSION = int(env('READINGS_SEED_VERSION', '1'))
+READINGS_SEED_VERSION_FROM = env('READINGS_SEED_VERSION_FROM', '')
+
 # Dev-only auth
 ENABLE_DEV_AUTH = env('ENABLE_DEV_AUTH', 'false').lower() == 'true'
 DEV_AUTH_TOKEN = env('DEV_AUTH_TOKEN', '')
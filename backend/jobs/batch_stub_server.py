@@ -0,0 +1,71 @@
+"""Local stand-in for the Anthropic Message Batches API.
+
+Batches end immediately and every request succeeds with a canned text, so
+regenerate_batch can be exercised end to end without Anthropic:
+
+    uvicorn backend.jobs.batch_stub_server:app --port 8787
+    python -m backend.jobs.regenerate_batch --checkpoint /tmp/regen.json \
+        --batches-url http://localhost:8787/v1/messages/batches --poll-seconds 1
+"""
+
+import json
+from uuid import uuid4
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+app = FastAPI(title='Message Batches stand-in')
+
+_batches: dict[str, dict] = {}
+
+
+@app.post('/v1/messages/batches')
+async def create_batch(request: Request):
+    body = await request.json()
+    batch_id = f'msgbatch_stub_{uuid4().hex}'
+    results = []
+    for item in body.get('requests', []):
+        params = item.get('params') or {}
+        results.append(
+            {
+                'custom_id': item['custom_id'],
+                'result': {
+                    'type': 'succeeded',
+                    'message': {
+                        'model': params.get('model'),
+                        'content': [{'type': 'text', 'text': f"[stub] {item['custom_id']}"}],
+                        'stop_reason': 'end_turn',
+                        'usage': {'input_tokens': 0, 'output_tokens': 0},
+                    },
+                },
+            }
+        )
+    base_url = str(request.base_url).rstrip('/')
+    _batches[batch_id] = {
+        'id': batch_id,
+        'type': 'message_batch',
+        'processing_status': 'ended',
+        'request_counts': {'processing': 0, 'succeeded': len(results), 'errored': 0, 'canceled': 0, 'expired': 0},
+        'results_url': f'{base_url}/v1/messages/batches/{batch_id}/results',
+        '_results': results,
+    }
+    return _public(_batches[batch_id])
+
+
+@app.get('/v1/messages/batches/{batch_id}')
+def get_batch(batch_id: str):
+    if batch_id not in _batches:
+        raise HTTPException(status_code=404, detail='Batch not found')
+    return _public(_batches[batch_id])
+
+
+@app.get('/v1/messages/batches/{batch_id}/results')
+def get_results(batch_id: str):
+    if batch_id not in _batches:
+        raise HTTPException(status_code=404, detail='Batch not found')
+    lines = [json.dumps(item, ensure_ascii=False) for item in _batches[batch_id]['_results']]
+    return PlainTextResponse('\n'.join(lines) + '\n', media_type='application/x-jsonl')
+
+
+def _public(batch: dict) -> dict:
+    return {key: value for key, value in batch.items() if not key.startswith('_')}
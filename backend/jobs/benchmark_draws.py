@@ -0,0 +1,75 @@
+"""Check and benchmark the batch draw engine against generate_reading.
+
+Draws the same synthetic users through services.batch_draws and through
+generate_reading one by one, for every seed version, fails if any result
+differs, and prints readings per second on one core for each path:
+
+    python -m backend.jobs.benchmark_draws
+    python -m backend.jobs.benchmark_draws --users 200000 --fortune-key celtic_work --date 2026-10-18
+    python -m backend.jobs.benchmark_draws --seed-version 2
+"""
+
+import argparse
+import time
+import uuid
+
+from ..services.batch_draws import draw_seeds, generate_readings_batch
+from ..services.readings import SEED_VERSIONS, build_seed, generate_reading
+
+_DEFAULT_KEYS = ['today_free', 'today_deep_love', 'week_one', 'celtic_work', 'hexagram_love', 'flower_timing', 'partner_sexual']
+
+
+def measure(fortune_key: str, users: int, date_str: str, seed_version: int) -> dict:
+    items = [(str(uuid.UUID(int=index + 1)), fortune_key, date_str) for index in range(users)]
+    seeds = [build_seed(user_id, key, day) for user_id, key, day in items]
+
+    started = time.perf_counter()
+    draw_seeds(seeds, fortune_key, seed_version)
+    arrays = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = generate_readings_batch(items, seed_version)
+    readings = time.perf_counter() - started
+
+    started = time.perf_counter()
+    single = [
+        generate_reading(user_id, key, seed_override=seed, seed_version=seed_version)
+        for (user_id, key, _), seed in zip(items, seeds)
+    ]
+    per_reading = time.perf_counter() - started
+
+    mismatches = sum(1 for left, right in zip(batch, single) if left != right)
+    return {
+        'arrays_per_s': users / arrays,
+        'batch_per_s': users / readings,
+        'single_per_s': users / per_reading,
+        'mismatches': mismatches,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--fortune-key', action='append', dest='fortune_keys')
+    parser.add_argument('--date', default='2026-01-01')
+    parser.add_argument('--seed-version', type=int, action='append', dest='seed_versions', choices=SEED_VERSIONS)
+    args = parser.parse_args()
+
+    print(
+        f"{'fortune_key':<16} {'version':>7} {'arrays/s':>10} {'batch/s':>10} {'single/s':>10} {'mismatches':>10}"
+    )
+    failed = False
+    for fortune_key in args.fortune_keys or _DEFAULT_KEYS:
+        for seed_version in args.seed_versions or SEED_VERSIONS:
+            result = measure(fortune_key, args.users, args.date, seed_version)
+            failed = failed or result['mismatches'] > 0
+            print(
+                f"{fortune_key:<16} {seed_version:>7} {result['arrays_per_s']:>10.0f} {result['batch_per_s']:>10.0f} "
+                f"{result['single_per_s']:>10.0f} {result['mismatches']:>10}"
+            )
+    if failed:
+        raise SystemExit('batch draws differ from generate_reading')
+
+
+if __name__ == '__main__':
+    main()
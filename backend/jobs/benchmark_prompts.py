@@ -0,0 +1,103 @@
+"""Benchmark prompt rendering time and size per fortune key.
+
+Renders synthetic readings (card meanings from card_meanings, a partner
+profile from a fixed hand) and prints the average render time, prompt size
+and estimated input tokens, untrimmed and at the token budget:
+
+    python -m backend.jobs.benchmark_prompts
+    python -m backend.jobs.benchmark_prompts --iterations 50000 --budget 1200
+"""
+
+import argparse
+import random
+import time
+
+from ..config import INTERPRETATION_PROMPT_TOKEN_BUDGET
+from ..services.card_meanings import CARD_MEANINGS, get_card_meaning
+from ..services.interpretation_prompt import build_prompt_parts, compose_prompt, estimate_tokens
+from ..services.partner_sexual import build_partner_profile, build_partner_sexual_deck
+
+_CELTIC_POSITIONS = ['現状', '障害', '目標', '過去', '近未来', '根本', '本人', '周囲', '願望', '結果']
+
+
+def sample_inputs(seed: int = 7) -> dict[str, dict]:
+    rng = random.Random(seed)
+    names = sorted(CARD_MEANINGS)
+
+    def cards(positions: list[str]) -> list[dict]:
+        drawn = []
+        for position in positions:
+            name = rng.choice(names)
+            upright = rng.random() < 0.5
+            meaning = get_card_meaning(name, upright) or {}
+            drawn.append(
+                {
+                    'position': position,
+                    'card_name': name,
+                    'upright': upright,
+                    'meaning_short': meaning.get('short_meaning') or '',
+                    'keywords': list(meaning.get('keywords') or []),
+                }
+            )
+        return drawn
+
+    hand = build_partner_sexual_deck()[:7]
+    for index, card in enumerate(hand):
+        card['upright'] = index % 3 != 0
+    profile = build_partner_profile(hand)
+    return {
+        'today_free': {'type': 'today_free', 'fortune_type_key': 'today_free', 'cards': cards(['base'])},
+        'today_deep_love': {
+            'type': 'today_deep',
+            'fortune_type_key': 'today_deep_love',
+            'cards': cards(['総合', '恋愛', '仕事', '金運', 'トラブル']),
+        },
+        'celtic_work': {
+            'type': 'celtic_cross',
+            'fortune_type_key': 'celtic_work',
+            'cards': cards(_CELTIC_POSITIONS),
+            'question': '今の職場で評価されるには何を優先すべきか',
+        },
+        'partner_sexual': {
+            'type': 'partner_sexual',
+            'fortune_type_key': 'partner_sexual',
+            'cards': [
+                {'position': str(index + 1), 'card_name': card['name'], 'upright': card['upright']}
+                for index, card in enumerate(hand)
+            ],
+            'sexual_profile': profile,
+        },
+    }
+
+
+def measure(input_json: dict, iterations: int, budget: int) -> dict:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        system_prompt, reading_prompt = build_prompt_parts(input_json, token_budget=budget)
+    elapsed = time.perf_counter() - started
+    prompt = compose_prompt(system_prompt, reading_prompt)
+    return {
+        'us_per_render': elapsed / iterations * 1e6,
+        'chars': len(prompt),
+        'tokens': estimate_tokens(prompt),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--budget', type=int, default=INTERPRETATION_PROMPT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    print(f"{'fortune_key':<16} {'budget':>7} {'us/render':>10} {'chars':>7} {'est_tokens':>10}")
+    for fortune_key, input_json in sample_inputs().items():
+        for budget in (0, args.budget):
+            result = measure(input_json, args.iterations, budget)
+            print(
+                f"{fortune_key:<16} {budget:>7} {result['us_per_render']:>10.2f} "
+                f"{result['chars']:>7} {result['tokens']:>10}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Precompute the next daily window's draws for recently active users.
+
+Users who drew a daily key (today_*, week_one) in the last
+DAILY_DRAWS_ACTIVE_DAYS days are split into shards. A process pool computes
+each shard with the batch draw engine and COPYs it into daily_draws for every
+UTC seed date the next 05:00 JST window uses:
+
+    python -m backend.jobs.precompute_daily_draws
+    python -m backend.jobs.precompute_daily_draws --loop
+    python -m backend.jobs.precompute_daily_draws --workers 8 --active-days 7
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import psycopg
+
+# Pool processes re-import this module, so it connects directly instead of
+# importing backend.db (which would open a connection pool in every worker).
+from ..config import (
+    DAILY_DRAWS_ACTIVE_DAYS,
+    DAILY_DRAWS_LEAD_MINUTES,
+    DAILY_DRAWS_SHARD_SIZE,
+    DAILY_DRAWS_WORKERS,
+    DATABASE_URL,
+)
+from ..services.daily_draws import active_pairs, materialize_shard, next_reset_utc, prune, window_seed_dates
+
+logger = logging.getLogger('backend.jobs.precompute_daily_draws')
+
+
+def precompute(window_start: datetime, workers: int, active_days: int, shard_size: int) -> dict:
+    started = time.perf_counter()
+    draw_days = window_seed_dates(window_start)
+    with psycopg.connect(DATABASE_URL) as conn:
+        with conn.cursor() as cur:
+            pairs = active_pairs(cur, active_days)
+    pairs.sort()
+    shards = [pairs[start : start + shard_size] for start in range(0, len(pairs), shard_size)]
+
+    written = 0
+    failed = 0
+    if shards:
+        with ProcessPoolExecutor(
+            max_workers=min(workers or os.cpu_count() or 1, len(shards)),
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as pool:
+            futures = [pool.submit(materialize_shard, draw_days, shard) for shard in shards]
+            for future in as_completed(futures):
+                try:
+                    written += future.result()
+                except Exception:
+                    logger.exception('Daily draw shard failed')
+                    failed += 1
+
+    with psycopg.connect(DATABASE_URL) as conn:
+        with conn.cursor() as cur:
+            pruned = prune(cur, draw_days[0] - timedelta(days=1))
+        conn.commit()
+
+    counts = {
+        'pairs': len(pairs),
+        'draw_dates': [day.isoformat() for day in draw_days],
+        'shards': len(shards),
+        'failed_shards': failed,
+        'written': written,
+        'pruned': pruned,
+        'seconds': round(time.perf_counter() - started, 1),
+    }
+    logger.info('Daily draw precomputation for window %s: %s', window_start.isoformat(), counts)
+    return counts
+
+
+def run_loop(workers: int, active_days: int, shard_size: int, lead_minutes: int) -> None:
+    while True:
+        next_reset = next_reset_utc()
+        run_at = next_reset - timedelta(minutes=lead_minutes)
+        delay = (run_at - datetime.now(timezone.utc)).total_seconds()
+        if delay > 0:
+            logger.info('Next daily draw precomputation at %s', run_at.isoformat())
+            time.sleep(delay)
+        counts = precompute(next_reset, workers, active_days, shard_size)
+        if counts['failed_shards']:
+            # One more pass before the reset; rows already written are kept.
+            precompute(next_reset, workers, active_days, shard_size)
+        time.sleep(max(0.0, (next_reset - datetime.now(timezone.utc)).total_seconds()) + 60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Precompute daily draws ahead of the 05:00 JST reset.')
+    parser.add_argument('--loop', action='store_true', help='run before every 05:00 JST reset')
+    parser.add_argument('--workers', type=int, default=DAILY_DRAWS_WORKERS, help='processes (0 = one per CPU)')
+    parser.add_argument('--active-days', type=int, default=DAILY_DRAWS_ACTIVE_DAYS)
+    parser.add_argument('--shard-size', type=int, default=DAILY_DRAWS_SHARD_SIZE)
+    parser.add_argument('--lead-minutes', type=int, default=DAILY_DRAWS_LEAD_MINUTES)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    if args.loop:
+        run_loop(args.workers, args.active_days, args.shard_size, args.lead_minutes)
+    else:
+        precompute(next_reset_utc(), args.workers, args.active_days, args.shard_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Pregenerate every today_free interpretation (78 cards x 2 orientations).
+
+Run once for the next daily window, or keep running and fire shortly before
+each 05:00 JST reset:
+
+    python -m backend.jobs.pregenerate_today_free
+    python -m backend.jobs.pregenerate_today_free --loop
+    python -m backend.jobs.pregenerate_today_free --date 2026-01-01
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+
+from ..config import TODAY_FREE_PREGEN_CONCURRENCY, TODAY_FREE_PREGEN_LEAD_MINUTES
+from ..db import get_conn
+from ..services.claude import ClaudeClient, close_http_client
+from ..services.decks import FULL_DECK
+from ..services.interpretations import build_interpretation_input, daily_window_start_utc, enrich_input
+from ..services.today_free import existing_pregenerated, prune_pregenerated, save_pregenerated, window_date
+
+logger = logging.getLogger('backend.jobs.pregenerate_today_free')
+
+
+def build_today_free_inputs(target: date) -> list[tuple[str, bool, dict]]:
+    done = existing_pregenerated(target)
+    inputs = []
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            for card in FULL_DECK:
+                for upright in (True, False):
+                    if (card['name'], upright) in done:
+                        continue
+                    result_json = {
+                        'type': 'today_free',
+                        'fortune_type_key': 'today_free',
+                        'slots': [{'position': '今日', 'card': {**card, 'upright': upright}}],
+                    }
+                    input_json = enrich_input(cur, build_interpretation_input(result_json))
+                    inputs.append((card['name'], upright, input_json))
+    return inputs
+
+
+async def pregenerate(target: date, concurrency: int) -> dict:
+    inputs = await asyncio.to_thread(build_today_free_inputs, target)
+    counts = {'generated': 0, 'failed': 0, 'skipped': len(FULL_DECK) * 2 - len(inputs)}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate_one(card_name: str, upright: bool, input_json: dict) -> None:
+        async with semaphore:
+            client = ClaudeClient()
+            # Pregenerated rows must come from Claude, never from the local templates.
+            client.mode = 'llm'
+            try:
+                # Bypass the prompt cache so each day gets a fresh reading.
+                prompt, output_text = await client.generate(input_json, use_cache=False)
+            except Exception:
+                logger.exception('Pregeneration failed card=%s upright=%s', card_name, upright)
+                counts['failed'] += 1
+                return
+            if client.used_fallback or not output_text:
+                counts['failed'] += 1
+                return
+            await asyncio.to_thread(
+                save_pregenerated, target, card_name, upright, prompt, output_text, client.last_call.model
+            )
+            counts['generated'] += 1
+
+    await asyncio.gather(*(generate_one(*item) for item in inputs))
+    deleted = await asyncio.to_thread(prune_pregenerated, target - timedelta(days=2))
+    logger.info('today_free pregeneration for %s: %s (pruned %s old rows)', target, counts, deleted)
+    return counts
+
+
+async def run_loop(concurrency: int, lead_minutes: int) -> None:
+    while True:
+        next_reset = daily_window_start_utc() + timedelta(days=1)
+        run_at = next_reset - timedelta(minutes=lead_minutes)
+        delay = (run_at - datetime.now(timezone.utc)).total_seconds()
+        if delay > 0:
+            logger.info('Next today_free pregeneration at %s', run_at.isoformat())
+            await asyncio.sleep(delay)
+        counts = await pregenerate(window_date(next_reset), concurrency)
+        if counts['failed']:
+            # One more pass before the reset; existing rows are skipped.
+            await pregenerate(window_date(next_reset), concurrency)
+        await asyncio.sleep(max(0.0, (next_reset - datetime.now(timezone.utc)).total_seconds()) + 60)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    try:
+        if args.loop:
+            await run_loop(args.concurrency, args.lead_minutes)
+        else:
+            target = date.fromisoformat(args.date) if args.date else window_date() + timedelta(days=1)
+            await pregenerate(target, args.concurrency)
+    finally:
+        await close_http_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Pregenerate today_free interpretations.')
+    parser.add_argument('--date', help='JST window date (YYYY-MM-DD); defaults to the next window')
+    parser.add_argument('--loop', action='store_true', help='run before every 05:00 JST reset')
+    parser.add_argument('--concurrency', type=int, default=TODAY_FREE_PREGEN_CONCURRENCY)
+    parser.add_argument('--lead-minutes', type=int, default=TODAY_FREE_PREGEN_LEAD_MINUTES)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    asyncio.run(_main(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""Regenerate interpretations in bulk through the Anthropic Message Batches API.
+
+Selected readings are rebuilt with build_prompt, submitted in batches and the
+results are written back as new interpretation_versions. Progress is kept in a
+JSON checkpoint so an interrupted run resumes where it stopped. Each request's
+custom_id is '<run id>_<reading id>' and versions are stored idempotently on
+it, so results written again after a crash never become duplicate versions:
+
+    python -m backend.jobs.regenerate_batch --checkpoint regen.json --fortune-key celtic_work --model claude-...
+    python -m backend.jobs.regenerate_batch --checkpoint regen.json            # resume
+
+Point --batches-url at a local stand-in (backend.jobs.batch_stub_server) to
+test without calling Anthropic.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import httpx
+
+from ..db import get_conn
+from ..services.claude import CallStats, ClaudeClient
+from ..services.interpretations import store_interpretation
+
+logger = logging.getLogger('backend.jobs.regenerate_batch')
+
+_WRITE_CHECKPOINT_EVERY = 100
+
+
+def select_readings(
+    fortune_keys: list[str],
+    since: datetime | None,
+    until: datetime | None,
+    limit: int | None,
+) -> list[str]:
+    clauses = []
+    params: list = []
+    if fortune_keys:
+        clauses.append('ft.key = ANY(%s)')
+        params.append(fortune_keys)
+    if since:
+        clauses.append('r.created_at >= %s')
+        params.append(since)
+    if until:
+        clauses.append('r.created_at < %s')
+        params.append(until)
+    sql = (
+        'SELECT ri.reading_id FROM reading_interpretations ri '
+        'JOIN readings r ON r.id = ri.reading_id '
+        'JOIN fortune_types ft ON ft.id = r.fortune_type_id'
+    )
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY r.created_at'
+    if limit:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return [str(row[0]) for row in cur.fetchall()]
+
+
+def load_inputs(reading_ids: list[str]) -> dict[str, dict]:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'SELECT reading_id, input_json FROM reading_interpretations WHERE reading_id = ANY(%s::uuid[])',
+                (reading_ids,),
+            )
+            return {str(row[0]): row[1] for row in cur.fetchall()}
+
+
+class BatchRegenerator:
+    def __init__(self, checkpoint_path: str, client: ClaudeClient, batches_url: str, http: httpx.Client):
+        self.checkpoint_path = checkpoint_path
+        self.client = client
+        self.batches_url = batches_url.rstrip('/')
+        self.http = http
+        self.state: dict = {}
+
+    def load_or_start(self, reading_ids_factory) -> None:
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding='utf-8') as fh:
+                self.state = json.load(fh)
+            logger.info(
+                'Resuming from %s: %s queued, %s batches',
+                self.checkpoint_path,
+                len(self.state['queued']),
+                len(self.state['batches']),
+            )
+            self.client.model = self.state['model']
+            submitting = self.state.get('submitting')
+            if submitting:
+                logger.warning(
+                    'The previous run stopped while submitting %s requests at %s. That batch may exist '
+                    'upstream; its requests are submitted again and only one result per reading is stored.',
+                    submitting['count'],
+                    submitting['started_at'],
+                )
+            return
+        reading_ids = reading_ids_factory()
+        self.state = {
+            'run_id': uuid4().hex[:16],
+            'model': self.client.model,
+            'queued': reading_ids,
+            'batches': [],
+            'failed': {},
+        }
+        self.save()
+        logger.info('Selected %s readings for regeneration with %s', len(reading_ids), self.client.model)
+
+    def save(self) -> None:
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(self.state, fh, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def submit_queued(self, batch_size: int) -> None:
+        while self.state['queued']:
+            chunk = self.state['queued'][:batch_size]
+            inputs = load_inputs(chunk)
+            requests_body = []
+            for reading_id in chunk:
+                input_json = inputs.get(reading_id)
+                if not isinstance(input_json, dict):
+                    self.state['failed'][reading_id] = 'missing input_json'
+                    continue
+                _, params = self.client.build_message_params(input_json)
+                requests_body.append({'custom_id': self._custom_id(reading_id), 'params': params})
+
+            batch_id = None
+            if requests_body:
+                # The batch id only exists once the POST returns; record the attempt first.
+                self.state['submitting'] = {
+                    'count': len(requests_body),
+                    'started_at': datetime.now(timezone.utc).isoformat(),
+                }
+                self.save()
+                response = self.http.post(
+                    self.batches_url, json={'requests': requests_body}, headers=self.client.api_headers()
+                )
+                response.raise_for_status()
+                batch_id = response.json()['id']
+                self.state['batches'].append(
+                    {'batch_id': batch_id, 'status': 'submitted', 'written': []}
+                )
+            self.state['queued'] = self.state['queued'][len(chunk):]
+            self.state.pop('submitting', None)
+            self.save()
+            logger.info('Submitted batch %s with %s requests', batch_id, len(requests_body))
+
+    def collect(self, poll_seconds: float) -> None:
+        for batch in self.state['batches']:
+            if batch['status'] == 'written':
+                continue
+            info = self._wait_until_ended(batch['batch_id'], poll_seconds)
+            self._write_results(batch, info['results_url'])
+            batch['status'] = 'written'
+            self.save()
+
+    def _wait_until_ended(self, batch_id: str, poll_seconds: float) -> dict:
+        while True:
+            response = self.http.get(f'{self.batches_url}/{batch_id}', headers=self.client.api_headers())
+            response.raise_for_status()
+            info = response.json()
+            if info.get('processing_status') == 'ended':
+                return info
+            logger.info('Batch %s is %s %s', batch_id, info.get('processing_status'), info.get('request_counts'))
+            time.sleep(poll_seconds)
+
+    def _write_results(self, batch: dict, results_url: str) -> None:
+        written = set(batch['written'])
+        pending: dict[str, tuple[str, str, CallStats]] = {}
+        with self.http.stream('GET', results_url, headers=self.client.api_headers()) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                custom_id = item.get('custom_id')
+                if not custom_id:
+                    continue
+                reading_id = _reading_id(custom_id)
+                if reading_id in written:
+                    continue
+                result = item.get('result') or {}
+                if result.get('type') != 'succeeded':
+                    self.state['failed'][reading_id] = result.get('type') or 'unknown'
+                    continue
+                message = result.get('message') or {}
+                text = ''.join(
+                    block.get('text', '') for block in message.get('content', []) if block.get('type') == 'text'
+                ).strip()
+                if not text:
+                    self.state['failed'][reading_id] = 'empty'
+                    continue
+                stats = CallStats(
+                    model=message.get('model') or self.client.model,
+                    source='batch',
+                    attempts=1,
+                    stop_reason=message.get('stop_reason'),
+                )
+                stats.add_usage(message.get('usage'))
+                pending[reading_id] = (custom_id, text, stats)
+                if len(pending) >= _WRITE_CHECKPOINT_EVERY:
+                    self._flush(batch, pending)
+        self._flush(batch, pending)
+
+    def _custom_id(self, reading_id: str) -> str:
+        # Checkpoints from before run ids used the bare reading id.
+        run_id = self.state.get('run_id')
+        return f'{run_id}_{reading_id}' if run_id else reading_id
+
+    def _flush(self, batch: dict, pending: dict[str, tuple[str, str, CallStats]]) -> None:
+        if not pending:
+            return
+        inputs = load_inputs(list(pending))
+        for reading_id, (custom_id, text, stats) in pending.items():
+            input_json = inputs.get(reading_id) or {}
+            prompt, _ = self.client.build_message_params(input_json)
+            stats.fortune_key = input_json.get('fortune_type_key') or ''
+            store_interpretation(reading_id, prompt, text, stats.model, stats, batch_custom_id=custom_id)
+            batch['written'].append(reading_id)
+        pending.clear()
+        self.save()
+
+
+def _reading_id(custom_id: str) -> str:
+    return custom_id.rsplit('_', 1)[-1]
+
+
+def _parse_datetime(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Regenerate interpretations via Message Batches.')
+    parser.add_argument('--checkpoint', required=True, help='JSON checkpoint file (created or resumed)')
+    parser.add_argument('--fortune-key', action='append', default=[], help='repeatable fortune_type_key filter')
+    parser.add_argument('--since', help='readings created at or after (ISO 8601)')
+    parser.add_argument('--until', help='readings created before (ISO 8601)')
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--model', help='model to regenerate with (default: ANTHROPIC_MODEL)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--poll-seconds', type=float, default=60.0)
+    parser.add_argument('--batches-url', help='default: ANTHROPIC_API_URL + /batches')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+
+    client = ClaudeClient()
+    # A regeneration run uses one model for every reading; latency routing does not apply to batches.
+    client.model_routing = False
+    if args.model:
+        client.model = args.model
+    client.validate_model_name()
+    batches_url = args.batches_url or f"{client.api_url.rstrip('/')}/batches"
+
+    with httpx.Client(timeout=120.0) as http:
+        job = BatchRegenerator(args.checkpoint, client, batches_url, http)
+        job.load_or_start(
+            lambda: select_readings(
+                args.fortune_key, _parse_datetime(args.since), _parse_datetime(args.until), args.limit
+            )
+        )
+        job.submit_queued(max(1, args.batch_size))
+        job.collect(args.poll_seconds)
+
+    logger.info(
+        'Regeneration finished: %s written, %s failed',
+        sum(len(batch['written']) for batch in job.state['batches']),
+        len(job.state['failed']),
+    )
+
+
+if __name__ == '__main__':
+    main()
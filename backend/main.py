@@ -1,13 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routes import auth, master, life, readings, warnings, billing, affiliate, consultation, interpretations, shop
-from .services.claude import ClaudeClient
+from .routes import auth, master, life, readings, warnings, billing, affiliate, consultation, interpretations, shop, metrics
+from .db import get_conn
+from .services.claude import ClaudeClient, close_http_client
+from .services.interpretations import drain_background_generations
+from .services.spread_registry import spread_registry
+
+
+def load_spreads() -> None:
+    spread_registry.start_reloader(get_conn)
 
 
 def create_app() -> FastAPI:
     ClaudeClient().validate_model_name()
     app = FastAPI(title='Tarot App API')
+    app.add_event_handler('startup', load_spreads)
+    app.add_event_handler('shutdown', drain_background_generations)
+    app.add_event_handler('shutdown', close_http_client)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=['*'],
@@ -25,6 +35,7 @@ def create_app() -> FastAPI:
     app.include_router(consultation.router)
     app.include_router(interpretations.router)
     app.include_router(shop.router)
+    app.include_router(metrics.router)
     return app
 
 
@@ -1,14 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
-from datetime import datetime, timedelta, timezone
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from psycopg.types.json import Json
+from starlette.concurrency import run_in_threadpool
 
+from ..config import (
+    INTERPRETATION_DISCONNECT_POLICY_GENERATE,
+    INTERPRETATION_DISCONNECT_POLICY_STREAM,
+    INTERPRETATION_GENERATE_DEADLINE_SECONDS,
+)
 from ..db import get_conn
-from ..services.claude import ClaudeClient
-from ..config import DISABLE_INTERPRETATION_LIMITS
-from ..services.card_meanings import get_card_meaning
-from ..services.partner_sexual import get_partner_card_meaning
+from ..services.claude import CallStats
 from ..services.interpretation_prompt import build_prompt
+from ..services.interpretation_jobs import enqueue_job, get_job
+from ..services.interpretation_prefetch import claim_prefetched
+from ..services.interpretation_templates import render_interpretation
+from ..services.llm_executor import LLMQueueFull, llm_executor, run_llm_sync
+from ..services.today_free import find_pregenerated
+from ..services.interpretations import (
+    enrich_input,
+    generate_with_deadline,
+    get_latest_interpretation,
+    load_generation_input,
+    start_stream_generation,
+    store_interpretation,
+    stream_disconnected,
+)
 from .security import get_user_id
 
 router = APIRouter(prefix='/interpretations', tags=['interpretations'])
@@ -37,7 +57,7 @@ def save_interpretation_input(payload: InterpretationInputRequest, user_id: str
             )
             if not cur.fetchone():
                 raise HTTPException(status_code=404, detail='Reading not found')
-            enriched = _enrich_input(cur, payload.input_json)
+            enriched = enrich_input(cur, payload.input_json)
             cur.execute(
                 'INSERT INTO reading_interpretations (reading_id, input_json) VALUES (%s, %s) ON CONFLICT (reading_id) DO UPDATE SET input_json = EXCLUDED.input_json',
                 (payload.reading_id, Json(enriched)),
@@ -70,112 +90,144 @@ def save_interpretation_output(payload: InterpretationOutputRequest, user_id: st
 
 
 @router.post('/generate')
-def generate_interpretation(reading_id: str, user_id: str = Depends(get_user_id)):
+async def generate_interpretation(
+    request: Request,
+    reading_id: str,
+    deadline_ms: int | None = Query(None, ge=100),
+    user_id: str = Depends(get_user_id),
+):
+    input_json, existing_today = await run_in_threadpool(_load_generation_input, reading_id, user_id)
+    if existing_today:
+        return existing_today
+
+    deadline = deadline_ms / 1000 if deadline_ms is not None else INTERPRETATION_GENERATE_DEADLINE_SECONDS
+    # Double taps and client retries share one upstream call and one stored version.
+    try:
+        return await generate_with_deadline(
+            reading_id,
+            input_json,
+            deadline,
+            is_disconnected=request.is_disconnected,
+            on_disconnect=INTERPRETATION_DISCONNECT_POLICY_GENERATE,
+        )
+    except LLMQueueFull as exc:
+        raise _queue_full(exc)
+
+
+@router.post('/generate/stream')
+async def stream_interpretation(reading_id: str, user_id: str = Depends(get_user_id)):
+    input_json, existing_today = await run_in_threadpool(_load_generation_input, reading_id, user_id)
+    if not existing_today:
+        try:
+            llm_executor.check_capacity()
+        except LLMQueueFull as exc:
+            raise _queue_full(exc)
+
+    async def events():
+        if existing_today:
+            yield _sse_event('delta', {'text': existing_today['output_text']})
+            yield _sse_event('done', existing_today)
+            return
+
+        pregenerated = await run_llm_sync(find_pregenerated, input_json)
+        if pregenerated:
+            prompt, output_text, model = pregenerated
+            stats = CallStats(
+                model=model, fortune_key=input_json.get('fortune_type_key') or '', source='pregenerated'
+            )
+            yield _sse_event('delta', {'text': output_text})
+            next_version = await run_llm_sync(store_interpretation, reading_id, prompt, output_text, model, stats)
+            yield _sse_event(
+                'done',
+                {
+                    'reading_id': reading_id,
+                    'prompt': prompt,
+                    'output_text': output_text,
+                    'version': next_version,
+                    'model': model,
+                },
+            )
+            return
+
+        # Show the local template reading at once; the client replaces it as deltas arrive.
+        yield _sse_event('placeholder', {'text': render_interpretation(input_json)})
+        # The upstream call runs in its own task so a disconnect (which closes
+        # this generator) can either cancel it or leave it to finish and store.
+        queue: asyncio.Queue = asyncio.Queue()
+        task = start_stream_generation(reading_id, input_json, queue)
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == 'delta':
+                    yield _sse_event('delta', {'text': payload})
+                elif kind == 'done':
+                    yield _sse_event('done', payload)
+                    return
+                else:
+                    # Nothing was stored; the client keeps the placeholder and may retry.
+                    yield _sse_event('error', {'detail': 'Interpretation generation failed'})
+                    return
+        finally:
+            stream_disconnected(task, INTERPRETATION_DISCONNECT_POLICY_STREAM)
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.post('/jobs', status_code=202)
+def enqueue_interpretation_job(reading_id: str, user_id: str = Depends(get_user_id)):
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                'SELECT ri.input_json, ft.key '
-                'FROM reading_interpretations ri '
+                'SELECT ri.input_json FROM reading_interpretations ri '
                 'JOIN readings r ON r.id = ri.reading_id '
-                'JOIN fortune_types ft ON ft.id = r.fortune_type_id '
                 'WHERE ri.reading_id = %s AND r.user_id = %s',
                 (reading_id, user_id),
             )
             row = cur.fetchone()
             if not row:
                 raise HTTPException(status_code=404, detail='Interpretation input not found')
-            input_json, fortune_key = row[0], row[1]
+            job_id, status = enqueue_job(cur, reading_id, user_id)
+            conn.commit()
 
-            if not DISABLE_INTERPRETATION_LIMITS:
-                if fortune_key and fortune_key.startswith('today_'):
-                    window_start = _daily_window_start_utc()
-                    existing_today = _get_latest_interpretation_for_today(
-                        cur, user_id, fortune_key, window_start
-                    )
-                    if existing_today:
-                        return existing_today
+    return {'job_id': job_id, 'status': status, 'placeholder': render_interpretation(row[0] or {})}
 
-    client = ClaudeClient()
-    prompt, output_text = client.generate(input_json)
 
+@router.get('/jobs/{job_id}')
+def get_interpretation_job(job_id: str, user_id: str = Depends(get_user_id)):
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                'SELECT COALESCE(MAX(version), 0) FROM interpretation_versions WHERE reading_id = %s',
-                (reading_id,),
-            )
-            next_version = (cur.fetchone()[0] or 0) + 1
-            cur.execute(
-                'UPDATE reading_interpretations SET output_text = %s, updated_at = now() WHERE reading_id = %s',
-                (output_text, reading_id),
-            )
-            cur.execute(
-                'INSERT INTO interpretation_versions (reading_id, version, prompt, output_text, model) VALUES (%s, %s, %s, %s, %s)',
-                (reading_id, next_version, prompt, output_text, client.model),
-            )
-            conn.commit()
+            job = get_job(cur, job_id, user_id)
+            if not job:
+                raise HTTPException(status_code=404, detail='Job not found')
+            if job['status'] == 'succeeded':
+                job['result'] = get_latest_interpretation(cur, job['reading_id'])
 
-    return {
-        'reading_id': reading_id,
-        'prompt': prompt,
-        'output_text': output_text,
-        'version': next_version,
-        'model': client.model,
-    }
-
-
-def _daily_window_start_utc() -> datetime:
-    # Daily reset at 05:00 JST
-    now_utc = datetime.now(timezone.utc)
-    now_jst = now_utc + timedelta(hours=9)
-    if now_jst.hour < 5:
-        base_date = (now_jst - timedelta(days=1)).date()
-    else:
-        base_date = now_jst.date()
-    window_start_jst = datetime.combine(base_date, datetime.min.time()) + timedelta(hours=5)
-    return (window_start_jst - timedelta(hours=9)).replace(tzinfo=timezone.utc)
-
-
-def _get_latest_interpretation(cur, reading_id: str) -> dict | None:
-    cur.execute(
-        'SELECT output_text, updated_at FROM reading_interpretations WHERE reading_id = %s',
-        (reading_id,),
-    )
-    row = cur.fetchone()
-    if not row or not row[0]:
-        return None
-    cur.execute(
-        'SELECT version, model FROM interpretation_versions WHERE reading_id = %s ORDER BY version DESC LIMIT 1',
-        (reading_id,),
-    )
-    vrow = cur.fetchone()
-    version = vrow[0] if vrow else 0
-    model = vrow[1] if vrow else None
-    return {
-        'reading_id': reading_id,
-        'prompt': None,
-        'output_text': row[0],
-        'version': version,
-        'model': model,
-    }
-
-
-def _get_latest_interpretation_for_today(
-    cur, user_id: str, fortune_key: str, window_start: datetime
-) -> dict | None:
-    cur.execute(
-        'SELECT r.id '
-        'FROM readings r '
-        'JOIN fortune_types ft ON ft.id = r.fortune_type_id '
-        'JOIN reading_interpretations ri ON ri.reading_id = r.id '
-        'WHERE r.user_id = %s AND ft.key = %s AND ri.updated_at >= %s '
-        'ORDER BY ri.updated_at DESC LIMIT 1',
-        (user_id, fortune_key, window_start),
+    return job
+
+
+def _queue_full(exc: LLMQueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail='Interpretation service is busy',
+        headers={'Retry-After': str(exc.retry_after)},
     )
-    row = cur.fetchone()
-    if not row:
-        return None
-    return _get_latest_interpretation(cur, row[0])
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def _load_generation_input(reading_id: str, user_id: str) -> tuple[dict, dict | None]:
+    loaded = load_generation_input(reading_id, user_id)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail='Interpretation input not found')
+    input_json, existing_today = loaded
+    prefetched = claim_prefetched(reading_id)
+    return input_json, existing_today or prefetched
 
 
 @router.get('/{reading_id}')
@@ -223,86 +275,5 @@ def get_interpretation_history(reading_id: str, user_id: str = Depends(get_user_
     return {'items': items}
 
 
-def _enrich_input(cur, input_json: dict) -> dict:
-    if not isinstance(input_json, dict):
-        return input_json
-    cards = input_json.get('cards')
-    if not isinstance(cards, list) or not cards:
-        return input_json
-    fortune_key = (input_json.get('fortune_type_key') or '').strip()
-
-    if fortune_key == 'partner_sexual':
-        enriched_cards = []
-        for card in cards:
-            if not isinstance(card, dict):
-                enriched_cards.append(card)
-                continue
-            updated = dict(card)
-            meaning = get_partner_card_meaning(updated)
-            if not updated.get('meaning_short'):
-                updated['meaning_short'] = meaning.get('short_meaning')
-            if not updated.get('keywords'):
-                updated['keywords'] = meaning.get('keywords') or []
-            enriched_cards.append(updated)
-        return {**input_json, 'cards': enriched_cards}
-
-    names = [card.get('card_name') for card in cards if isinstance(card, dict) and card.get('card_name')]
-    if not names:
-        return input_json
-
-    cur.execute(
-        'SELECT c.name, m.orientation, m.short_meaning, m.keywords FROM card_catalog c LEFT JOIN card_meanings m ON m.card_id = c.id WHERE c.name = ANY(%s)',
-        (names,),
-    )
-    rows = cur.fetchall()
-    meaning_map: dict[str, dict[str, dict]] = {}
-    for name, orientation, short_meaning, keywords in rows:
-        if name not in meaning_map:
-            meaning_map[name] = {}
-        if orientation:
-            meaning_map[name][orientation] = {
-                'short_meaning': short_meaning,
-                'keywords': keywords or [],
-            }
-
-    def orientation_key(card: dict) -> str:
-        upright = card.get('upright')
-        if upright is None:
-            return 'none'
-        return 'upright' if upright else 'reversed'
-
-    enriched_cards = []
-    for card in cards:
-        if not isinstance(card, dict):
-            enriched_cards.append(card)
-            continue
-        name = card.get('card_name')
-        if not name or name not in meaning_map:
-            enriched_cards.append(card)
-            continue
-        orient = orientation_key(card)
-        meaning = meaning_map.get(name, {}).get(orient)
-        if not meaning:
-            fallback = get_card_meaning(name, card.get('upright'))
-            if not fallback:
-                enriched_cards.append(card)
-                continue
-            updated = dict(card)
-            if not updated.get('meaning_short'):
-                updated['meaning_short'] = fallback.get('short_meaning')
-            if not updated.get('keywords'):
-                updated['keywords'] = fallback.get('keywords') or []
-            enriched_cards.append(updated)
-            continue
-        updated = dict(card)
-        if not updated.get('meaning_short'):
-            updated['meaning_short'] = meaning.get('short_meaning')
-        if not updated.get('keywords'):
-            updated['keywords'] = meaning.get('keywords') or []
-        enriched_cards.append(updated)
-
-    return {**input_json, 'cards': enriched_cards}
-
-
 def _build_prompt(input_json: dict) -> str:
     return build_prompt(input_json)
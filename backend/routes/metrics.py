@@ -0,0 +1,62 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..db import get_conn
+from ..services.daily_draws import lookup_stats
+from ..services.interpretation_cache import cache_stats
+from ..services.interpretation_prefetch import prefetch_summary
+from ..services.interpretation_usage import usage_summary
+from ..services.interpretations import disconnect_stats
+from ..services.llm_executor import llm_executor
+from ..services.model_routing import routing_stats
+from ..services.output_limits import output_limits
+from ..services.spread_registry import spread_registry
+from ..services.token_budget import budget_stats
+from ..services.upstream_guard import upstream_stats
+from .security import get_user_id, is_admin_user
+
+router = APIRouter(prefix='/metrics', tags=['metrics'])
+
+
+def _require_admin(user_id: str = Depends(get_user_id)) -> str:
+    if not is_admin_user(user_id):
+        raise HTTPException(status_code=403, detail='Admin only')
+    return user_id
+
+
+@router.get('')
+def get_metrics(user_id: str = Depends(_require_admin)):
+    return {
+        'interpretation_cache': cache_stats(),
+        'anthropic_upstream': upstream_stats(),
+        'llm_executor': llm_executor.snapshot(),
+        'model_routing': routing_stats(),
+        'output_limits': output_limits.snapshot(),
+        'token_budget': budget_stats(),
+        'disconnects': disconnect_stats(),
+        'daily_draws': lookup_stats(),
+        'spreads': spread_registry.snapshot(),
+    }
+
+
+@router.get('/interpretations')
+def get_interpretation_usage(
+    days: int = Query(7, ge=1, le=90),
+    group_by: Literal['fortune_key', 'model', 'fortune_key_model'] = 'fortune_key_model',
+    user_id: str = Depends(_require_admin),
+):
+    return {'days': days, 'group_by': group_by, 'items': usage_summary(days, group_by)}
+
+
+@router.get('/prefetch')
+def get_prefetch_hit_rate(days: int = Query(7, ge=1, le=90), user_id: str = Depends(_require_admin)):
+    return {'days': days, 'items': prefetch_summary(days)}
+
+
+@router.post('/spreads/reload')
+def reload_spreads(user_id: str = Depends(_require_admin)):
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            spread_registry.reload(cur)
+    return spread_registry.snapshot()
@@ -5,8 +5,12 @@ from uuid import uuid4
 
 from psycopg.types.json import Json
 
+from ..config import READINGS_COMPACT_RESULT
 from ..db import get_conn
-from ..services.readings import generate_reading, build_seed
+from ..services.daily_draws import is_daily_key, precomputed_result, seed_date
+from ..services.interpretation_prefetch import prefetch_interpretation
+from ..services.reading_codec import compact_result, expand_result
+from ..services.readings import build_seed, generate_reading, seed_version_for
 from .security import get_user_id, is_admin_user
 
 router = APIRouter(prefix='/readings', tags=['readings'])
@@ -117,25 +121,36 @@ def _execute_one(cur, user_id: str, fortune_type_key: str, input_json: dict | No
                 (str(uuid4()), user_id, 'consume', -1, f'execute:{fortune_type_key}'),
             )
 
-    if fortune_type_key.startswith('today_') or fortune_type_key == 'week_one':
-        existing = _get_today_reading(cur, user_id, fortune_type_id)
+    draw_date = seed_date()
+    seed = seed_override or build_seed(user_id, fortune_type_key, draw_date)
+    seed_version = seed_version_for(draw_date if seed_override is None else None)
+    result_json = None
+    if is_daily_key(fortune_type_key):
+        existing, precomputed = _get_today_reading(
+            cur, user_id, fortune_type_id, fortune_type_key if seed_override is None else None, draw_date
+        )
         if existing:
             return existing
+        if seed_override is None:
+            result_json = precomputed_result(fortune_type_key, seed, seed_version, *precomputed)
 
-    seed = seed_override or build_seed(user_id, fortune_type_key)
-    result_json = generate_reading(user_id, fortune_type_key, input_json, seed_override=seed)
+    if result_json is None:
+        result_json = generate_reading(
+            user_id, fortune_type_key, input_json, seed_override=seed, seed_version=seed_version
+        )
 
     reading_id = str(uuid4())
     cur.execute(
-        'INSERT INTO readings (id, user_id, fortune_type_id, access_type, input_json, result_json, seed) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+        'INSERT INTO readings (id, user_id, fortune_type_id, access_type, input_json, result_json, seed, seed_version) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)',
         (
             reading_id,
             user_id,
             fortune_type_id,
             access_type_used,
             Json(input_json or {}),
-            Json(result_json),
+            Json(compact_result(result_json) if READINGS_COMPACT_RESULT else result_json),
             seed,
+            seed_version,
         ),
     )
     if consumed_purchase_id:
@@ -143,21 +158,29 @@ def _execute_one(cur, user_id: str, fortune_type_key: str, input_json: dict | No
             'UPDATE purchases SET status = %s WHERE id = %s',
             ('consumed', consumed_purchase_id),
         )
+    prefetch_interpretation(cur, reading_id, user_id, fortune_type_key, result_json, input_json)
     return reading_id, result_json
 
 
-def _get_today_reading(cur, user_id: str, fortune_type_id: str):
+def _get_today_reading(
+    cur, user_id: str, fortune_type_id: str, draw_key: str | None = None, draw_date: str | None = None
+):
+    """Today's reading if there is one, plus the precomputed (seed_version, spread_fingerprint, cards) for draw_key."""
     window_start = _daily_window_start_utc()
     cur.execute(
+        'SELECT r.id, r.result_json, d.seed_version, d.spread_fingerprint, d.cards FROM (SELECT 1) one '
+        'LEFT JOIN LATERAL ('
         'SELECT id, result_json FROM readings '
         'WHERE user_id = %s AND fortune_type_id = %s AND created_at >= %s '
-        'ORDER BY created_at DESC LIMIT 1',
-        (user_id, fortune_type_id, window_start),
+        'ORDER BY created_at DESC LIMIT 1) r ON true '
+        'LEFT JOIN daily_draws d ON d.user_id = %s AND d.draw_date = %s AND d.fortune_key = %s',
+        (user_id, fortune_type_id, window_start, user_id, draw_date, draw_key),
     )
     row = cur.fetchone()
-    if not row:
-        return None
-    return row[0], row[1]
+    precomputed = (row[2], row[3], row[4]) if row else (None, None, None)
+    if not row or row[0] is None:
+        return None, precomputed
+    return (row[0], expand_result(row[1])), precomputed
 
 
 def _daily_window_start_utc() -> datetime:
@@ -180,12 +203,12 @@ def list_readings(limit: int = 20, user_id: str = Depends(get_user_id)):
         with conn.cursor() as cur:
             if admin_user:
                 cur.execute(
-                    'SELECT id, fortune_type_id, access_type, input_json, result_json, seed, created_at FROM readings ORDER BY created_at DESC LIMIT %s',
+                    'SELECT id, fortune_type_id, access_type, input_json, result_json, seed, seed_version, created_at FROM readings ORDER BY created_at DESC LIMIT %s',
                     (limit,),
                 )
             else:
                 cur.execute(
-                    'SELECT id, fortune_type_id, access_type, input_json, result_json, seed, created_at FROM readings WHERE user_id = %s ORDER BY created_at DESC LIMIT %s',
+                    'SELECT id, fortune_type_id, access_type, input_json, result_json, seed, seed_version, created_at FROM readings WHERE user_id = %s ORDER BY created_at DESC LIMIT %s',
                     (user_id, limit),
                 )
             rows = cur.fetchall()
@@ -196,9 +219,10 @@ def list_readings(limit: int = 20, user_id: str = Depends(get_user_id)):
             'fortune_type_id': r[1],
             'access_type': r[2],
             'input_json': r[3],
-            'result_json': r[4],
+            'result_json': expand_result(r[4]),
             'seed': r[5],
-            'created_at': r[6],
+            'seed_version': r[6],
+            'created_at': r[7],
         }
         for r in rows
     ]
@@ -213,12 +237,12 @@ def get_reading(reading_id: str, user_id: str = Depends(get_user_id)):
         with conn.cursor() as cur:
             if admin_user:
                 cur.execute(
-                    'SELECT id, fortune_type_id, access_type, input_json, result_json, seed, created_at FROM readings WHERE id = %s',
+                    'SELECT id, fortune_type_id, access_type, input_json, result_json, seed, seed_version, created_at FROM readings WHERE id = %s',
                     (reading_id,),
                 )
             else:
                 cur.execute(
-                    'SELECT id, fortune_type_id, access_type, input_json, result_json, seed, created_at FROM readings WHERE user_id = %s AND id = %s',
+                    'SELECT id, fortune_type_id, access_type, input_json, result_json, seed, seed_version, created_at FROM readings WHERE user_id = %s AND id = %s',
                     (user_id, reading_id),
                 )
             row = cur.fetchone()
@@ -231,7 +255,8 @@ def get_reading(reading_id: str, user_id: str = Depends(get_user_id)):
         'fortune_type_id': row[1],
         'access_type': row[2],
         'input_json': row[3],
-        'result_json': row[4],
+        'result_json': expand_result(row[4]),
         'seed': row[5],
-        'created_at': row[6],
+        'seed_version': row[6],
+        'created_at': row[7],
     }
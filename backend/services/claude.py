@@ -1,15 +1,24 @@
+import asyncio
+import json
 import logging
 import os
 import re
 import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 
 from dotenv import load_dotenv
 
-import requests
-from requests import Response
-from requests.exceptions import HTTPError, RequestException
+import httpx
 
-from .interpretation_prompt import build_prompt
+from .interpretation_cache import cache_key, get_cached, put_cached
+from .interpretation_prompt import build_prompt, build_prompt_parts, compose_prompt, estimate_tokens
+from .interpretation_templates import render_interpretation
+from .llm_executor import run_llm_sync
+from .model_routing import ModelRoute, latency, load_routes, resolve_route
+from .output_limits import output_limits
+from .token_budget import charge_tokens
+from .upstream_guard import UpstreamUnavailable, guarded_call, hedge_budget, under_load
 
 load_dotenv()
 
@@ -20,6 +29,122 @@ _MODEL_ID_PATTERN = re.compile(
 )
 _DEFAULT_MODEL = 'claude-3-5-sonnet-20241022'
 
+# Anthropic only caches prompt prefixes of at least this many tokens (Haiku models: twice as many).
+_MIN_CACHEABLE_TOKENS = 1024
+
+_RETRYABLE_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+# interpretation_versions.model / call stats model for locally rendered template and fallback text.
+TEMPLATE_MODEL = 'template'
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    # One keep-alive pool per process so calls reuse TLS connections.
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=int(os.environ.get('ANTHROPIC_MAX_CONNECTIONS', '200')),
+                max_keepalive_connections=int(os.environ.get('ANTHROPIC_MAX_KEEPALIVE', '50')),
+                keepalive_expiry=float(os.environ.get('ANTHROPIC_KEEPALIVE_EXPIRY', '60')),
+            ),
+        )
+    return _http_client
+
+
+def _min_cacheable_tokens(model: str) -> int:
+    return _MIN_CACHEABLE_TOKENS * 2 if 'haiku' in (model or '') else _MIN_CACHEABLE_TOKENS
+
+
+async def _iter_sse_events(response: httpx.Response) -> AsyncIterator[dict]:
+    async for line in response.aiter_lines():
+        if not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if not data:
+            continue
+        try:
+            yield json.loads(data)
+        except ValueError:
+            logger.warning('Skipping malformed Anthropic stream event: %s', data[:200])
+
+
+def _upstream_failed(response: httpx.Response) -> bool:
+    return response.status_code in _RETRYABLE_STATUSES or response.status_code >= 500
+
+
+def _billed_tokens(usage: dict | None) -> int:
+    if not isinstance(usage, dict):
+        return 0
+    fields = ('input_tokens', 'cache_creation_input_tokens', 'output_tokens')
+    return sum(int(usage.get(field) or 0) for field in fields)
+
+
+def _duplicate_tokens(task: asyncio.Future, winner: httpx.Response) -> int:
+    """Tokens billed for the other request of a hedged pair."""
+    if task.done():
+        if task.cancelled() or task.exception() is not None or not task.result().is_success:
+            return 0
+        response = task.result()
+    else:
+        # About to be cancelled; Anthropic keeps generating it, so bill it like the winner.
+        response = winner
+    try:
+        return _billed_tokens(response.json().get('usage'))
+    except ValueError:
+        return 0
+
+
+class StreamInterrupted(Exception):
+    """The stream failed after text was emitted; the partial text must not be stored."""
+
+
+class _StreamErrorEvent(Exception):
+    """Anthropic sent an in-stream error event (e.g. overloaded_error)."""
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+@dataclass
+class CallStats:
+    """Accounting for one generate/stream call; source is api, cache, template or fallback."""
+
+    model: str
+    fortune_key: str = ''
+    source: str = 'api'
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    latency_ms: int = 0
+    # The attempt that produced the text, without failed attempts or backoff.
+    upstream_latency_ms: int | None = None
+    first_token_ms: int | None = None
+    attempts: int = 0
+    stop_reason: str | None = None
+    hedged: bool = False
+    # Tokens Anthropic bills for every attempt and hedge duplicate, charged to the daily budgets.
+    billed_tokens: int = 0
+
+    @property
+    def fallback(self) -> bool:
+        return self.source == 'fallback'
+
+    def add_usage(self, usage: dict | None) -> None:
+        if not isinstance(usage, dict):
+            return
+        for field in ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens'):
+            if usage.get(field) is not None:
+                setattr(self, field, int(usage[field]))
+
 
 class ClaudeClient:
     def __init__(self):
@@ -30,8 +155,22 @@ class ClaudeClient:
         self.max_tokens_today_deep = int(os.environ.get('ANTHROPIC_MAX_TOKENS_TODAY_DEEP', '2600'))
         self.max_retries = int(os.environ.get('ANTHROPIC_MAX_RETRIES', '3'))
         self.retry_backoff = float(os.environ.get('ANTHROPIC_RETRY_BACKOFF', '1.5'))
+        self.timeout = float(os.environ.get('ANTHROPIC_TIMEOUT', '30'))
+        self.prompt_caching = os.environ.get('ANTHROPIC_PROMPT_CACHING', 'true').lower() == 'true'
         self.allow_fallback = os.environ.get('ALLOW_AI_FALLBACK', 'true').lower() == 'true'
         self.skip_model_validation = os.environ.get('ANTHROPIC_SKIP_MODEL_VALIDATION', 'false').lower() == 'true'
+        # Per fortune key/type model, max_tokens and timeout; turn off to pin every call to self.model.
+        self.model_routing = os.environ.get('ANTHROPIC_MODEL_ROUTING', 'true').lower() == 'true'
+        # llm: always call Claude; template: always render locally; auto: render locally while Claude is overloaded.
+        self.mode = os.environ.get('INTERPRETATION_MODE', 'llm').lower()
+        # Hedging (routes with hedge=true): after this latency percentile of the model, fire a duplicate request.
+        self.hedge_percentile = float(os.environ.get('ANTHROPIC_HEDGE_PERCENTILE', '0.9'))
+        self.hedge_delay_ms = int(os.environ.get('ANTHROPIC_HEDGE_DELAY_MS', '8000'))
+        # Set by callers when the daily token budget is spent: serve cached or template text only.
+        self.over_budget = False
+        # Set by callers to charge the reading's user (and the global budget) for each call.
+        self.reading_id: str | None = None
+        self.last_call: CallStats | None = None
 
     def validate_model_name(self) -> None:
         if self.skip_model_validation:
@@ -39,7 +178,14 @@ class ClaudeClient:
         if not self.api_key and self.allow_fallback:
             return
 
-        model = (self.model or '').strip()
+        models = {self.model}
+        if self.model_routing:
+            models.update(route.model for route in load_routes(self.model).values())
+            models.update(route.downgrade_model for route in load_routes(self.model).values() if route.downgrade_model)
+        for model in sorted(models, key=lambda item: item or ''):
+            self._validate_model_id((model or '').strip())
+
+    def _validate_model_id(self, model: str) -> None:
         if not model:
             raise RuntimeError(
                 'ANTHROPIC_MODEL is empty. Set a valid model id like '
@@ -64,38 +210,68 @@ class ClaudeClient:
                 'or set ANTHROPIC_SKIP_MODEL_VALIDATION=true.'
             )
 
-    def generate(self, input_json: dict) -> tuple[str, str]:
+    @property
+    def used_fallback(self) -> bool:
+        return self.last_call is not None and self.last_call.fallback
+
+    async def generate(self, input_json: dict, use_cache: bool = True) -> tuple[str, str]:
+        stats = self._start_call(input_json)
         if not self.api_key:
             if self.allow_fallback:
                 logger.warning('ANTHROPIC_API_KEY not set; using fallback interpretation.')
+                self._mark_local(stats, 'fallback')
                 return build_prompt(input_json), self._fallback_text(input_json)
             raise RuntimeError('ANTHROPIC_API_KEY is not set')
 
-        prompt = build_prompt(input_json)
-        payload = {
-            'model': self.model,
-            'max_tokens': self._resolve_max_tokens(input_json),
-            'temperature': 0.7,
-            'messages': [
-                {'role': 'user', 'content': prompt},
-            ],
-        }
-        headers = {
-            'x-api-key': self.api_key,
-            'anthropic-version': '2023-06-01',
-            'content-type': 'application/json',
-        }
+        if self.model_routing:
+            output_limits.refresh_if_stale()
+        prompt, payload, route = self._build_request(input_json)
+        key = cache_key(prompt, payload['model'], payload['max_tokens'])
+        if use_cache:
+            cached = await run_llm_sync(get_cached, key)
+            if cached is not None:
+                # The cache key includes the routed model, so the text came from it.
+                stats.source = 'cache'
+                stats.model = payload['model']
+                return prompt, cached
+        if self._use_template():
+            self._mark_local(stats, 'template')
+            return prompt, render_interpretation(input_json)
+
+        started = time.monotonic()
+        try:
+            text = await self._request(payload, stats, route.timeout, self._hedge_delay(route))
+        finally:
+            stats.latency_ms = int((time.monotonic() - started) * 1000)
+            stats.model = payload['model']
+            await self._charge(stats)
+        if text is None:
+            logger.warning('Falling back after Anthropic API failures.')
+            self._mark_local(stats, 'fallback')
+            return prompt, self._fallback_text(input_json)
+        # Truncated output would be served to every identical prompt for the whole TTL.
+        if text and stats.stop_reason != 'max_tokens':
+            await run_llm_sync(put_cached, key, payload['model'], payload['max_tokens'], text)
+        return prompt, text
 
+    async def _request(
+        self, payload: dict, stats: CallStats, timeout: float, hedge_delay: float | None = None
+    ) -> str | None:
+        """Send one message request with retries; None means the caller should fall back."""
+        headers = self.api_headers()
         attempt = 0
         tried_default_model = False
         while True:
             attempt += 1
+            stats.attempts = attempt
+            attempt_started = time.monotonic()
             try:
-                response = requests.post(self.api_url, json=payload, headers=headers, timeout=30)
+                response = await self._post(payload, headers, timeout, hedge_delay, stats)
+                attempt_ms = self._record_attempt(payload['model'], attempt_started, timeout, _upstream_failed(response))
                 if self._should_retry(response, attempt):
-                    self._sleep(attempt)
+                    await self._sleep(attempt)
                     continue
-                if not response.ok:
+                if not response.is_success:
                     logger.error(
                         'Anthropic API error status=%s body=%s',
                         response.status_code,
@@ -107,17 +283,24 @@ class ClaudeClient:
                 for block in data.get('content', []):
                     if block.get('type') == 'text':
                         text += block.get('text', '')
-                if data.get('stop_reason') == 'max_tokens':
+                stats.add_usage(data.get('usage'))
+                stats.billed_tokens += _billed_tokens(data.get('usage'))
+                stats.stop_reason = data.get('stop_reason')
+                stats.upstream_latency_ms = attempt_ms
+                if stats.stop_reason == 'max_tokens':
                     logger.warning(
                         'Anthropic output may be truncated by max_tokens=%s. Consider increasing ANTHROPIC_MAX_TOKENS.',
                         payload.get('max_tokens'),
                     )
                 if not text.strip():
                     logger.warning('Anthropic API returned empty text content.')
-                return prompt, text.strip()
-            except RequestException as exc:
+                return text.strip()
+            except httpx.HTTPError as exc:
+                if not isinstance(exc, httpx.HTTPStatusError):
+                    # Timeouts and transport errors; error responses were recorded above.
+                    self._record_attempt(payload['model'], attempt_started, timeout, failed=True)
                 response = getattr(exc, 'response', None)
-                if isinstance(exc, HTTPError) and response is not None:
+                if isinstance(exc, httpx.HTTPStatusError) and response is not None:
                     if response.status_code == 404:
                         logger.error(
                             'Anthropic model not found. Check ANTHROPIC_MODEL. status=%s body=%s',
@@ -138,25 +321,313 @@ class ClaudeClient:
                             continue
                     if not self._should_retry(response, attempt):
                         if self.allow_fallback:
-                            logger.warning('Falling back after Anthropic API failures.')
-                            return prompt, self._fallback_text(input_json)
+                            return None
                         raise
                 logger.exception('Anthropic API request failed: %s', exc)
                 if attempt >= self.max_retries:
                     if self.allow_fallback:
-                        logger.warning('Falling back after Anthropic API failures.')
-                        return prompt, self._fallback_text(input_json)
+                        return None
                     raise
-                self._sleep(attempt)
+                await self._sleep(attempt)
                 continue
+            except UpstreamUnavailable as exc:
+                logger.warning('Skipping Anthropic call: %s', exc)
+                if self.allow_fallback:
+                    return None
+                raise
+
+    async def _post(
+        self, payload: dict, headers: dict, timeout: float, hedge_delay: float | None, stats: CallStats
+    ) -> httpx.Response:
+        """POST once; with a hedge delay, race a duplicate request against a slow first one."""
+        client = _get_http_client()
+
+        async def send() -> httpx.Response:
+            async with guarded_call() as slot:
+                response = await client.post(self.api_url, json=payload, headers=headers, timeout=timeout)
+                slot.observe(response.status_code)
+                return response
+
+        if hedge_delay is None:
+            return await send()
+        tasks = [asyncio.ensure_future(send())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done or not hedge_budget.try_acquire():
+                return await tasks[0]
+            stats.hedged = True
+            tasks.append(asyncio.ensure_future(send()))
+            pending = set(tasks)
+            first_failure = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().is_success:
+                        if task is tasks[1]:
+                            hedge_budget.note_win()
+                        for other in tasks:
+                            if other is not task:
+                                stats.billed_tokens += _duplicate_tokens(other, task.result())
+                        return task.result()
+                    first_failure = first_failure or task
+            # Neither succeeded: surface the first failure (error response or exception).
+            return first_failure.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _hedge_delay(self, route: ModelRoute) -> float | None:
+        if not route.hedge or under_load():
+            return None
+        hedge_budget.note_request()
+        delay_ms = latency.percentile(route.model, self.hedge_percentile)
+        return (delay_ms if delay_ms is not None else self.hedge_delay_ms) / 1000
+
+    async def stream(self, input_json: dict) -> AsyncIterator[str]:
+        """Yield text deltas as Anthropic streams them.
+
+        Retries only happen before the first delta is emitted. A failure after
+        that raises StreamInterrupted, so callers never store a truncated
+        reading. A failure or an empty response before any delta falls back to
+        the template (when ALLOW_AI_FALLBACK is on).
+        """
+        stats = self._start_call(input_json)
+        if not self.api_key:
+            if self.allow_fallback:
+                logger.warning('ANTHROPIC_API_KEY not set; using fallback interpretation.')
+                self._mark_local(stats, 'fallback')
+                yield self._fallback_text(input_json)
+                return
+            raise RuntimeError('ANTHROPIC_API_KEY is not set')
+
+        if self.model_routing:
+            output_limits.refresh_if_stale()
+        prompt, payload, route = self._build_request(input_json)
+        key = cache_key(prompt, payload['model'], payload['max_tokens'])
+        cached = await run_llm_sync(get_cached, key)
+        if cached is not None:
+            stats.source = 'cache'
+            stats.model = payload['model']
+            yield cached
+            return
+        if self._use_template():
+            self._mark_local(stats, 'template')
+            yield render_interpretation(input_json)
+            return
+
+        payload['stream'] = True
+        headers = self.api_headers()
+
+        client = _get_http_client()
+        attempt = 0
+        tried_default_model = False
+        emitted = False
+        chunks: list[str] = []
+        started = time.monotonic()
+        try:
+            while True:
+                attempt += 1
+                stats.attempts = attempt
+                stats.model = payload['model']
+                attempt_started = time.monotonic()
+                output_billed = 0
+                try:
+                    async with guarded_call() as slot, client.stream(
+                        'POST', self.api_url, json=payload, headers=headers, timeout=route.timeout
+                    ) as response:
+                        slot.observe(response.status_code)
+                        if _upstream_failed(response):
+                            self._record_attempt(stats.model, attempt_started, route.timeout, failed=True)
+                        if self._should_retry(response, attempt):
+                            await self._sleep(attempt)
+                            continue
+                        if not response.is_success:
+                            await response.aread()
+                            logger.error(
+                                'Anthropic API error status=%s body=%s',
+                                response.status_code,
+                                (response.text or '')[:500],
+                            )
+                        response.raise_for_status()
+                        async for event in _iter_sse_events(response):
+                            event_type = event.get('type')
+                            if event_type == 'content_block_delta':
+                                delta = event.get('delta') or {}
+                                if delta.get('type') == 'text_delta' and delta.get('text'):
+                                    if not emitted:
+                                        stats.first_token_ms = int((time.monotonic() - started) * 1000)
+                                    emitted = True
+                                    # Estimated until message_delta reports the real count.
+                                    estimated = estimate_tokens(delta['text'])
+                                    output_billed += estimated
+                                    stats.billed_tokens += estimated
+                                    chunks.append(delta['text'])
+                                    yield delta['text']
+                            elif event_type == 'message_start':
+                                usage = (event.get('message') or {}).get('usage')
+                                stats.add_usage(usage)
+                                stats.billed_tokens += _billed_tokens(usage)
+                                output_billed = int((usage or {}).get('output_tokens') or 0)
+                            elif event_type == 'message_delta':
+                                stats.add_usage(event.get('usage'))
+                                output_tokens = (event.get('usage') or {}).get('output_tokens')
+                                if output_tokens is not None:
+                                    stats.billed_tokens += int(output_tokens) - output_billed
+                                    output_billed = int(output_tokens)
+                                stats.stop_reason = (event.get('delta') or {}).get('stop_reason')
+                                if stats.stop_reason == 'max_tokens':
+                                    logger.warning(
+                                        'Anthropic output may be truncated by max_tokens=%s. Consider increasing ANTHROPIC_MAX_TOKENS.',
+                                        payload.get('max_tokens'),
+                                    )
+                            elif event_type == 'error':
+                                logger.error('Anthropic stream error: %s', event.get('error'))
+                                raise _StreamErrorEvent(str((event.get('error') or {}).get('type') or 'error'))
+                    stats.upstream_latency_ms = self._record_attempt(stats.model, attempt_started, route.timeout)
+                    stats.latency_ms = int((time.monotonic() - started) * 1000)
+                    if not emitted:
+                        logger.warning('Anthropic API returned empty text content.')
+                        if not self.allow_fallback:
+                            raise RuntimeError('Anthropic API returned empty text content')
+                        self._mark_local(stats, 'fallback')
+                        yield self._fallback_text(input_json)
+                        return
+                    if stats.stop_reason and stats.stop_reason != 'max_tokens':
+                        await run_llm_sync(
+                            put_cached, key, payload['model'], payload['max_tokens'], ''.join(chunks).strip()
+                        )
+                    return
+                except (httpx.HTTPError, _StreamErrorEvent) as exc:
+                    if not isinstance(exc, httpx.HTTPStatusError):
+                        self._record_attempt(stats.model, attempt_started, route.timeout, failed=True)
+                    if emitted:
+                        logger.exception('Anthropic stream interrupted: %s', exc)
+                        stats.latency_ms = int((time.monotonic() - started) * 1000)
+                        raise StreamInterrupted(str(exc)) from exc
+                    response = getattr(exc, 'response', None)
+                    if isinstance(exc, httpx.HTTPStatusError) and response is not None:
+                        if (
+                            response.status_code == 404
+                            and not tried_default_model
+                            and str(payload.get('model', '')).endswith('-latest')
+                        ):
+                            tried_default_model = True
+                            payload['model'] = _DEFAULT_MODEL
+                            logger.warning(
+                                'Retrying Anthropic request with default model %s after 404.',
+                                _DEFAULT_MODEL,
+                            )
+                            continue
+                        if not self._should_retry(response, attempt):
+                            if self.allow_fallback:
+                                logger.warning('Falling back after Anthropic API failures.')
+                                self._mark_local(stats, 'fallback')
+                                stats.latency_ms = int((time.monotonic() - started) * 1000)
+                                yield self._fallback_text(input_json)
+                                return
+                            raise
+                    logger.exception('Anthropic API request failed: %s', exc)
+                    if attempt >= self.max_retries:
+                        if self.allow_fallback:
+                            logger.warning('Falling back after Anthropic API failures.')
+                            self._mark_local(stats, 'fallback')
+                            stats.latency_ms = int((time.monotonic() - started) * 1000)
+                            yield self._fallback_text(input_json)
+                            return
+                        raise
+                    await self._sleep(attempt)
+                    continue
+                except UpstreamUnavailable as exc:
+                    logger.warning('Skipping Anthropic call: %s', exc)
+                    if not self.allow_fallback:
+                        raise
+                    self._mark_local(stats, 'fallback')
+                    stats.latency_ms = int((time.monotonic() - started) * 1000)
+                    yield self._fallback_text(input_json)
+                    return
+        finally:
+            await self._charge(stats)
+
+    async def _charge(self, stats: CallStats) -> None:
+        if not self.reading_id or stats.billed_tokens <= 0:
+            return
+        try:
+            # Shielded so a call cancelled by a disconnect still gets charged.
+            await asyncio.shield(run_llm_sync(charge_tokens, self.reading_id, stats.billed_tokens))
+        except Exception:
+            logger.exception('Charging %s tokens for reading_id=%s failed.', stats.billed_tokens, self.reading_id)
+
+    def _record_attempt(self, model: str, started: float, timeout: float, failed: bool = False) -> int:
+        """Feed one upstream attempt to the latency tracker; failures count as the full timeout."""
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        latency.record(model, int(timeout * 1000) if failed else elapsed_ms)
+        return elapsed_ms
+
+    def _mark_local(self, stats: CallStats, source: str) -> None:
+        # Template and fallback text is rendered here, not by the routed Claude model.
+        stats.source = source
+        stats.model = TEMPLATE_MODEL
+
+    def _use_template(self) -> bool:
+        if self.mode == 'template' or self.over_budget:
+            return True
+        return self.mode == 'auto' and under_load()
+
+    def _start_call(self, input_json: dict) -> CallStats:
+        fortune_key = str(input_json.get('fortune_type_key') or '') if isinstance(input_json, dict) else ''
+        self.last_call = CallStats(model=self.model, fortune_key=fortune_key)
+        return self.last_call
+
+    def build_message_params(self, input_json: dict) -> tuple[str, dict]:
+        """Return the stored prompt text and the Messages API request body."""
+        prompt, payload, _ = self._build_request(input_json)
+        return prompt, payload
+
+    def resolve_route(self, input_json: dict) -> ModelRoute:
+        if self.model_routing:
+            route = resolve_route(load_routes(self.model), input_json)
+            fortune_key = str(input_json.get('fortune_type_key') or '') if isinstance(input_json, dict) else ''
+            return output_limits.apply(route, fortune_key)
+        return ModelRoute(model=self.model, max_tokens=self._resolve_max_tokens(input_json), timeout=self.timeout)
+
+    def _build_request(self, input_json: dict) -> tuple[str, dict, ModelRoute]:
+        route = self.resolve_route(input_json)
+        system_prompt, reading_prompt = build_prompt_parts(input_json)
+        prompt = compose_prompt(system_prompt, reading_prompt)
+        return prompt, self._build_payload(route, system_prompt, reading_prompt), route
+
+    def _build_payload(self, route: ModelRoute, system_prompt: str, reading_prompt: str) -> dict:
+        system_block = {'type': 'text', 'text': system_prompt}
+        if self.prompt_caching and estimate_tokens(system_prompt) >= _min_cacheable_tokens(route.model):
+            # The system block is identical for every reading of a fortune key,
+            # so Anthropic can serve it from its prompt cache. Shorter prefixes
+            # are never cached, so they are sent without the marker.
+            system_block['cache_control'] = {'type': 'ephemeral'}
+        return {
+            'model': route.model,
+            'max_tokens': max(1, route.max_tokens),
+            'temperature': 0.7,
+            'system': [system_block],
+            'messages': [
+                {'role': 'user', 'content': reading_prompt},
+            ],
+        }
+
+    def api_headers(self) -> dict:
+        return {
+            'x-api-key': self.api_key,
+            'anthropic-version': '2023-06-01',
+            'content-type': 'application/json',
+        }
 
-    def _should_retry(self, response: Response, attempt: int) -> bool:
+    def _should_retry(self, response: httpx.Response, attempt: int) -> bool:
         if attempt >= self.max_retries:
             return False
-        return response.status_code in (408, 409, 429, 500, 502, 503, 504)
+        return response.status_code in _RETRYABLE_STATUSES
 
-    def _sleep(self, attempt: int) -> None:
-        time.sleep(self.retry_backoff * attempt)
+    async def _sleep(self, attempt: int) -> None:
+        await asyncio.sleep(self.retry_backoff * attempt)
 
     def _resolve_max_tokens(self, input_json: dict) -> int:
         if isinstance(input_json, dict):
@@ -167,13 +638,7 @@ class ClaudeClient:
         return max(1, self.max_tokens_default)
 
     def _fallback_text(self, input_json: dict) -> str:
-        card_names = []
-        cards = input_json.get('cards') if isinstance(input_json, dict) else None
-        if isinstance(cards, list):
-            for card in cards:
-                if isinstance(card, dict) and card.get('card_name'):
-                    card_names.append(card.get('card_name'))
-        if card_names:
-            joined = ' / '.join(card_names[:3])
-            return f'AI解釈は未設定です。カード: {joined}'
+        text = render_interpretation(input_json)
+        if text:
+            return text
         return 'AI解釈は未設定です。'
@@ -0,0 +1,152 @@
+"""Daily draws computed ahead of the 05:00 JST reset.
+
+today_free, today_deep_* and week_one readings are seeded with
+build_seed(user_id, key, utc_date) and nothing else, so they are known in
+advance. backend.jobs.precompute_daily_draws writes them to daily_draws as
+card codes (see batch_draws.card_codes); /readings/execute fetches the draw
+in the same query that looks for today's reading and only calls
+generate_reading on a miss.
+
+The worker side (materialize_shard) runs in pool processes, so this module
+opens its own connection there instead of importing the app's pool.
+"""
+
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import psycopg
+
+from ..config import DATABASE_URL
+from .batch_draws import card_codes, draw_seeds, reading_from_codes
+from .readings import build_seed, seed_version_for
+from .spread_registry import get_spread, spread_registry
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def is_daily_key(fortune_type_key: str) -> bool:
+    return fortune_type_key.startswith('today_') or fortune_type_key == 'week_one'
+
+
+def seed_date(at: datetime | None = None) -> str:
+    """The date build_seed puts in today's seed (UTC, not the JST window)."""
+    return (at or datetime.now(timezone.utc)).astimezone(timezone.utc).strftime('%Y-%m-%d')
+
+
+def next_reset_utc(at: datetime | None = None) -> datetime:
+    """Start of the next daily window (05:00 JST = 20:00 UTC)."""
+    at = (at or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    reset = at.replace(hour=20, minute=0, second=0, microsecond=0)
+    return reset if reset > at else reset + timedelta(days=1)
+
+
+def window_seed_dates(window_start: datetime) -> list[date]:
+    """UTC seed dates in use during the daily window starting at window_start.
+
+    A window runs 05:00-05:00 JST (20:00-20:00 UTC), so it spans two UTC dates.
+    """
+    window_end = window_start + timedelta(days=1) - timedelta(microseconds=1)
+    return sorted({window_start.astimezone(timezone.utc).date(), window_end.astimezone(timezone.utc).date()})
+
+
+def active_pairs(cur, active_days: int) -> list[tuple[str, str]]:
+    """(user_id, fortune_key) for daily keys each user drew in the last active_days days."""
+    cur.execute(
+        'SELECT DISTINCT r.user_id::text, ft.key FROM readings r '
+        'JOIN fortune_types ft ON ft.id = r.fortune_type_id '
+        "WHERE r.created_at > now() - %s * interval '1 day' "
+        "AND (ft.key LIKE 'today\\_%%' OR ft.key = 'week_one') "
+        # one_time readings get a random seed, so there is nothing to precompute.
+        "AND ft.access_type_default <> 'one_time'",
+        (active_days,),
+    )
+    return cur.fetchall()
+
+
+def compute_rows(draw_day: date, pairs: list[tuple[str, str]]) -> list[tuple]:
+    """daily_draws rows for (user_id, fortune_key) pairs on one seed date."""
+    by_key: dict[str, list[str]] = {}
+    for user_id, fortune_key in pairs:
+        by_key.setdefault(fortune_key, []).append(user_id)
+    rows = []
+    day = draw_day.isoformat()
+    seed_version = seed_version_for(day)
+    for fortune_key, user_ids in by_key.items():
+        batch = draw_seeds([build_seed(user_id, fortune_key, day) for user_id in user_ids], fortune_key, seed_version)
+        fingerprint = batch.spread.fingerprint
+        for user_id, codes in zip(user_ids, card_codes(batch).tolist()):
+            rows.append((user_id, draw_day, fortune_key, seed_version, fingerprint, codes))
+    return rows
+
+
+def store_rows(conn, rows: list[tuple]) -> int:
+    """COPY rows into daily_draws; rows drawn with another seed version or spread are replaced."""
+    with conn.cursor() as cur:
+        cur.execute('CREATE TEMP TABLE daily_draws_load (LIKE daily_draws INCLUDING DEFAULTS) ON COMMIT DROP')
+        with cur.copy(
+            'COPY daily_draws_load (user_id, draw_date, fortune_key, seed_version, spread_fingerprint, cards) FROM STDIN'
+        ) as copy:
+            for row in rows:
+                copy.write_row(row)
+        cur.execute(
+            'INSERT INTO daily_draws (user_id, draw_date, fortune_key, seed_version, spread_fingerprint, cards) '
+            'SELECT user_id, draw_date, fortune_key, seed_version, spread_fingerprint, cards FROM daily_draws_load '
+            'ON CONFLICT (user_id, draw_date, fortune_key) DO UPDATE SET '
+            'seed_version = EXCLUDED.seed_version, spread_fingerprint = EXCLUDED.spread_fingerprint, '
+            'cards = EXCLUDED.cards, created_at = now() '
+            'WHERE daily_draws.seed_version <> EXCLUDED.seed_version '
+            'OR daily_draws.spread_fingerprint IS DISTINCT FROM EXCLUDED.spread_fingerprint'
+        )
+        written = cur.rowcount
+    conn.commit()
+    return written
+
+
+def materialize_shard(draw_days: list[date], pairs: list[tuple[str, str]]) -> int:
+    """Compute and store one shard of users; runs in a worker process."""
+    written = 0
+    with psycopg.connect(DATABASE_URL) as conn:
+        with conn.cursor() as cur:
+            # Pool processes start with only the built-in spreads.
+            spread_registry.reload(cur)
+        for draw_day in draw_days:
+            written += store_rows(conn, compute_rows(draw_day, pairs))
+    return written
+
+
+def prune(cur, keep_from: date) -> int:
+    cur.execute('DELETE FROM daily_draws WHERE draw_date < %s', (keep_from,))
+    return cur.rowcount
+
+
+def precomputed_result(
+    fortune_type_key: str,
+    seed: str,
+    seed_version: int,
+    row_seed_version: int | None,
+    row_fingerprint: str | None,
+    codes: list[int] | None,
+):
+    """result_json for a looked-up daily_draws row, or None on a miss.
+
+    A row only counts when it was drawn with the seed version the reading will
+    record and with the key's current spread definition.
+    """
+    hit = (
+        codes is not None
+        and row_seed_version == seed_version
+        and row_fingerprint == get_spread(fortune_type_key).fingerprint
+    )
+    with _lock:
+        _stats['hits' if hit else 'misses'] += 1
+    if not hit:
+        return None
+    return reading_from_codes(fortune_type_key, seed, codes)
+
+
+def lookup_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    total = stats['hits'] + stats['misses']
+    return {**stats, 'hit_rate': round(stats['hits'] / total, 4) if total else 0.0}
@@ -0,0 +1,62 @@
+"""Card decks. Deck order is part of the stored reading format (see reading_codec): only append."""
+
+from .partner_sexual import build_partner_sexual_deck
+
+MAJOR_ARCANA = [
+    'The Fool',
+    'The Magician',
+    'The High Priestess',
+    'The Empress',
+    'The Emperor',
+    'The Hierophant',
+    'The Lovers',
+    'The Chariot',
+    'Strength',
+    'The Hermit',
+    'Wheel of Fortune',
+    'Justice',
+    'The Hanged Man',
+    'Death',
+    'Temperance',
+    'The Devil',
+    'The Tower',
+    'The Star',
+    'The Moon',
+    'The Sun',
+    'Judgement',
+    'The World',
+]
+
+MINOR_SUITS = ['Wands', 'Cups', 'Swords', 'Pentacles']
+MINOR_RANKS = [
+    'Ace',
+    'Two',
+    'Three',
+    'Four',
+    'Five',
+    'Six',
+    'Seven',
+    'Eight',
+    'Nine',
+    'Ten',
+    'Page',
+    'Knight',
+    'Queen',
+    'King',
+]
+
+MAJOR_DECK = [{'name': name, 'arcana': 'major'} for name in MAJOR_ARCANA]
+MINOR_DECK = [
+    {'name': f'{rank} of {suit}', 'arcana': 'minor', 'suit': suit, 'rank': rank}
+    for suit in MINOR_SUITS
+    for rank in MINOR_RANKS
+]
+FULL_DECK = MAJOR_DECK + MINOR_DECK
+PARTNER_SEXUAL_DECK = build_partner_sexual_deck()
+
+# Deck names used by fortune_spreads.deck.
+DECKS = {'tarot': FULL_DECK, 'partner_sexual': PARTNER_SEXUAL_DECK}
+
+
+def deck_cards(deck: str, major_only: bool = False) -> list[dict]:
+    return MAJOR_DECK if major_only else DECKS[deck]
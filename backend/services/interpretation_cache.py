@@ -0,0 +1,124 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from ..config import (
+    INTERPRETATION_CACHE_ENABLED,
+    INTERPRETATION_CACHE_MAX_ROWS,
+    INTERPRETATION_CACHE_MEMORY_SIZE,
+    INTERPRETATION_CACHE_PRUNE_EVERY,
+    INTERPRETATION_CACHE_TTL_SECONDS,
+)
+from ..db import get_conn
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+_stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0}
+_puts_since_prune = 0
+
+
+def cache_key(prompt: str, model: str, max_tokens: int) -> str:
+    raw = f'{model}\n{max_tokens}\n{prompt}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def get_cached(key: str) -> str | None:
+    if not INTERPRETATION_CACHE_ENABLED:
+        return None
+
+    now = time.monotonic()
+    with _lock:
+        entry = _memory.get(key)
+        if entry and now - entry[0] < INTERPRETATION_CACHE_TTL_SECONDS:
+            _memory.move_to_end(key)
+            _stats['memory_hits'] += 1
+            return entry[1]
+        if entry:
+            del _memory[key]
+
+    text = _get_from_db(key)
+    with _lock:
+        if text is None:
+            _stats['misses'] += 1
+            return None
+        _stats['db_hits'] += 1
+        _remember(key, text, now)
+    return text
+
+
+def put_cached(key: str, model: str, max_tokens: int, text: str) -> None:
+    global _puts_since_prune
+    if not INTERPRETATION_CACHE_ENABLED or not text:
+        return
+
+    with _lock:
+        _remember(key, text, time.monotonic())
+        _stats['stores'] += 1
+        _puts_since_prune += 1
+        should_prune = _puts_since_prune >= INTERPRETATION_CACHE_PRUNE_EVERY
+        if should_prune:
+            _puts_since_prune = 0
+
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'INSERT INTO interpretation_cache (cache_key, model, max_tokens, output_text) VALUES (%s, %s, %s, %s) '
+                    'ON CONFLICT (cache_key) DO UPDATE SET output_text = EXCLUDED.output_text, created_at = now(), last_hit_at = now()',
+                    (key, model, max_tokens, text),
+                )
+                if should_prune:
+                    _prune(cur)
+                conn.commit()
+    except Exception:
+        logger.warning('Failed to store interpretation cache entry.', exc_info=True)
+
+
+def cache_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+        stats['memory_entries'] = len(_memory)
+    lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+    stats['hit_rate'] = round((stats['memory_hits'] + stats['db_hits']) / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def _remember(key: str, text: str, stored_at: float) -> None:
+    _memory[key] = (stored_at, text)
+    _memory.move_to_end(key)
+    while len(_memory) > INTERPRETATION_CACHE_MEMORY_SIZE:
+        _memory.popitem(last=False)
+
+
+def _get_from_db(key: str) -> str | None:
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'UPDATE interpretation_cache SET hit_count = hit_count + 1, last_hit_at = now() '
+                    "WHERE cache_key = %s AND created_at > now() - %s * interval '1 second' "
+                    'RETURNING output_text',
+                    (key, INTERPRETATION_CACHE_TTL_SECONDS),
+                )
+                row = cur.fetchone()
+                conn.commit()
+    except Exception:
+        logger.warning('Failed to read interpretation cache entry.', exc_info=True)
+        return None
+    return row[0] if row else None
+
+
+def _prune(cur) -> None:
+    cur.execute(
+        "DELETE FROM interpretation_cache WHERE created_at <= now() - %s * interval '1 second'",
+        (INTERPRETATION_CACHE_TTL_SECONDS,),
+    )
+    cur.execute(
+        'DELETE FROM interpretation_cache WHERE cache_key IN ('
+        'SELECT cache_key FROM interpretation_cache ORDER BY last_hit_at DESC OFFSET %s)',
+        (INTERPRETATION_CACHE_MAX_ROWS,),
+    )
@@ -0,0 +1,99 @@
+from ..config import (
+    INTERPRETATION_JOB_LEASE_SECONDS,
+    INTERPRETATION_JOB_MAX_ATTEMPTS,
+    INTERPRETATION_JOB_RETRY_BACKOFF,
+)
+from ..db import get_conn
+
+
+def enqueue_job(cur, reading_id: str, user_id: str) -> tuple[str, str]:
+    cur.execute(
+        "SELECT id, status FROM interpretation_jobs WHERE reading_id = %s AND status IN ('queued', 'running') "
+        'ORDER BY created_at DESC LIMIT 1',
+        (reading_id,),
+    )
+    row = cur.fetchone()
+    if row:
+        return str(row[0]), row[1]
+    cur.execute(
+        'INSERT INTO interpretation_jobs (reading_id, user_id, max_attempts) VALUES (%s, %s, %s) RETURNING id, status',
+        (reading_id, user_id, INTERPRETATION_JOB_MAX_ATTEMPTS),
+    )
+    row = cur.fetchone()
+    return str(row[0]), row[1]
+
+
+def get_job(cur, job_id: str, user_id: str) -> dict | None:
+    cur.execute(
+        'SELECT id, reading_id, status, attempts, max_attempts, last_error, result_version, created_at, updated_at '
+        'FROM interpretation_jobs WHERE id = %s AND user_id = %s',
+        (job_id, user_id),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    return {
+        'job_id': str(row[0]),
+        'reading_id': str(row[1]),
+        'status': row[2],
+        'attempts': row[3],
+        'max_attempts': row[4],
+        'last_error': row[5],
+        'result_version': row[6],
+        'created_at': row[7],
+        'updated_at': row[8],
+    }
+
+
+def claim_job(worker_id: str) -> dict | None:
+    # Running jobs whose lease expired belong to a crashed worker and are claimed again.
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE interpretation_jobs SET status = 'running', attempts = attempts + 1, "
+                'locked_at = now(), locked_by = %s, updated_at = now() '
+                'WHERE id = ('
+                'SELECT id FROM interpretation_jobs '
+                "WHERE (status = 'queued' AND run_after <= now()) "
+                "OR (status = 'running' AND locked_at < now() - %s * interval '1 second') "
+                'ORDER BY run_after FOR UPDATE SKIP LOCKED LIMIT 1'
+                ') RETURNING id, reading_id, user_id, attempts, max_attempts',
+                (worker_id, INTERPRETATION_JOB_LEASE_SECONDS),
+            )
+            row = cur.fetchone()
+            conn.commit()
+    if not row:
+        return None
+    return {
+        'id': str(row[0]),
+        'reading_id': str(row[1]),
+        'user_id': str(row[2]),
+        'attempts': row[3],
+        'max_attempts': row[4],
+    }
+
+
+def complete_job(job_id: str, result_version: int | None) -> None:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE interpretation_jobs SET status = 'succeeded', result_version = %s, last_error = NULL, "
+                'locked_at = NULL, updated_at = now() WHERE id = %s',
+                (result_version, job_id),
+            )
+            conn.commit()
+
+
+def fail_job(job: dict, error: str) -> str:
+    """Requeue with exponential backoff, or dead-letter once attempts run out."""
+    status = 'dead' if job['attempts'] >= job['max_attempts'] else 'queued'
+    delay = INTERPRETATION_JOB_RETRY_BACKOFF * (2 ** max(0, job['attempts'] - 1))
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'UPDATE interpretation_jobs SET status = %s, last_error = %s, locked_at = NULL, '
+                "run_after = now() + %s * interval '1 second', updated_at = now() WHERE id = %s",
+                (status, error[:2000], delay, job['id']),
+            )
+            conn.commit()
+    return status
@@ -0,0 +1,94 @@
+"""Speculative interpretation generation at reading execution time.
+
+For fortune keys in INTERPRETATION_PREFETCH_KEYS (types where the app never
+adds a question) /readings/execute stores the server-built interpretation
+input and enqueues an interpretation job in the same transaction, so the
+worker starts on Claude while the client is still posting /interpretations/input.
+When the client then calls generate, a finished prefetch is returned as is
+and one still in flight is joined through single_flight.
+"""
+
+from psycopg.types.json import Json
+
+from ..config import INTERPRETATION_PREFETCH_KEYS
+from ..db import get_conn
+from .interpretation_jobs import enqueue_job
+from .interpretations import build_interpretation_input, enrich_input, get_latest_interpretation
+
+
+def prefetch_interpretation(
+    cur, reading_id: str, user_id: str, fortune_key: str, result_json: dict, request_json: dict | None
+) -> bool:
+    if fortune_key not in INTERPRETATION_PREFETCH_KEYS:
+        return False
+    request_json = request_json or {}
+    if request_json.get('question'):
+        return False
+    input_json = enrich_input(cur, build_interpretation_input(result_json, unit=request_json.get('unit')))
+    cur.execute(
+        'INSERT INTO reading_interpretations (reading_id, input_json) VALUES (%s, %s) ON CONFLICT (reading_id) DO NOTHING',
+        (reading_id, Json(input_json)),
+    )
+    cur.execute(
+        'INSERT INTO interpretation_prefetches (reading_id, fortune_key) VALUES (%s, %s) ON CONFLICT (reading_id) DO NOTHING',
+        (reading_id, fortune_key),
+    )
+    enqueue_job(cur, reading_id, user_id)
+    return True
+
+
+def claim_prefetched(reading_id: str) -> dict | None:
+    """Record that the client asked for a prefetched reading; return its interpretation if already stored."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'UPDATE interpretation_prefetches SET requested_at = COALESCE(requested_at, now()) '
+                'WHERE reading_id = %s RETURNING reading_id',
+                (reading_id,),
+            )
+            if not cur.fetchone():
+                return None
+            conn.commit()
+            return get_latest_interpretation(cur, reading_id)
+
+
+def prefetched_interpretation(reading_id: str) -> dict | None:
+    """The stored interpretation of a prefetched reading, so its job does not generate twice."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1 FROM interpretation_prefetches WHERE reading_id = %s', (reading_id,))
+            if not cur.fetchone():
+                return None
+            return get_latest_interpretation(cur, reading_id)
+
+
+def prefetch_summary(days: int) -> list[dict]:
+    """Per fortune key: prefetches, how many the client asked for, and tokens spent on the rest."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'SELECT p.fortune_key, COUNT(*), COUNT(p.requested_at), '
+                'COUNT(*) FILTER (WHERE p.requested_at IS NOT NULL AND EXISTS ('
+                'SELECT 1 FROM interpretation_versions v WHERE v.reading_id = p.reading_id AND v.created_at <= p.requested_at)), '
+                'COALESCE(SUM(cs.tokens) FILTER (WHERE p.requested_at IS NULL), 0) '
+                'FROM interpretation_prefetches p '
+                'LEFT JOIN LATERAL ('
+                'SELECT SUM(input_tokens + output_tokens) AS tokens FROM interpretation_call_stats '
+                "WHERE reading_id = p.reading_id AND source = 'api') cs ON true "
+                "WHERE p.created_at > now() - %s * interval '1 day' "
+                'GROUP BY p.fortune_key ORDER BY p.fortune_key',
+                (days,),
+            )
+            rows = cur.fetchall()
+
+    return [
+        {
+            'fortune_key': fortune_key,
+            'prefetched': prefetched,
+            'requested': requested,
+            'ready_when_requested': ready,
+            'hit_rate': round(requested / prefetched, 4) if prefetched else 0.0,
+            'wasted_tokens': int(wasted_tokens),
+        }
+        for fortune_key, prefetched, requested, ready, wasted_tokens in rows
+    ]
@@ -1,3 +1,14 @@
+"""Prompt compiler for interpretation requests.
+
+Per fortune key/type the instruction (system) part is assembled once from the
+constant blocks below and cached; per call only the cards, question and
+metrics are rendered.
+"""
+
+import functools
+
+from ..config import INTERPRETATION_PROMPT_TOKEN_BUDGET
+
 FORTUNE_PROMPT_HINTS = {
     'today_free': '今日の運勢として、全体の流れと1日の過ごし方に焦点を当てる。',
     'today_deep_love': '今日の恋愛運として、相手との距離感や行動のヒントに焦点を当てる。',
@@ -53,206 +64,247 @@ TYPE_FALLBACK_HINTS = {
 }
 
 
+_PREAMBLE = (
+    'You are a professional tarot reader.',
+    'Write a concrete and direct Japanese interpretation.',
+    'Tone: warm, honest, and practical.',
+    'Avoid vague language; be specific and actionable.',
+    'Use consistent sentence style (desu/masu).',
+    'When mentioning any tarot card, copy the exact English card name shown in the Cards section (e.g., "Knight of Cups"). Do not translate or alter card names.',
+)
+
+_UNIT_LABELS = {
+    'day': '1日',
+    'week': '1週間',
+    'month': '1か月',
+    'year': '1年',
+}
+
+_FLOWER_TIMING_FORMAT = (
+    'This is a flower timing reading with 12 positions.',
+    'Time unit: {unit_label}.',
+    'Interpret as N units from now (e.g., 3 months later), not calendar months or specific dates.',
+    'Rule: The Fool indicates the lucky timing. If The Fool does not appear, there is no timing.',
+    'Output format (exact labels, no bullets):',
+    'ラッキータイミング: 〇{unit_label}後',
+    '理由: ...',
+    '結論: ...',
+    'If no The Fool, set ラッキータイミング to "該当なし" and explain that there is no timing.',
+)
+
+_RESULT_ADVICE_CONCLUSION = ('結果: ...', 'アドバイス: ...', '結論: ...')
+
+_TODAY_DEEP_FORMAT = (
+    'Output format (exact labels, no bullets):',
+    *(
+        line
+        for title in ('今日の総合運', '今日の恋愛運', '今日の仕事運', '今日の金運', '今日のトラブル運')
+        for line in (f'# {title}', *_RESULT_ADVICE_CONCLUSION)
+    ),
+    'Each line should be 1-3 sentences.',
+    'Use the base card for 総合運, and the labeled positions for the other categories.',
+)
+
+_TODAY_FORMAT = (
+    'Output format (exact labels, no bullets):',
+    *_RESULT_ADVICE_CONCLUSION,
+    'Each line should be 1-3 sentences.',
+)
+
+_PARTNER_SEXUAL_FORMAT = (
+    'This is a trump-card based sexual tendency spread.',
+    'Important fixed rule: upright = S, reversed = M.',
+    'Card meanings are symbolic nuance, not literal facts or fixed labels.',
+    'Infer tendencies from aggregate patterns and numeric metrics, not from a single card.',
+    'Output format (exact labels, no bullets):',
+    '判定: ...',
+    'S度: ...%',
+    'M度: ...%',
+    '傾向: ...',
+    'スイッチャー傾向: ...',
+    '補足: ...',
+    'Reflect the given percentages and the tendency card directly in the text.',
+)
+
+_SENTENCES_FORMAT = ('Output: 6-10 sentences, no bullet points.',)
+
+_TRIANGLE_CRIME_RULES = (
+    'Interpretation perspective: analyze a potentially harmful counterpart (the offender side), not the querent as perpetrator.',
+    'Never provide suggestions that enable, justify, or optimize criminal acts.',
+    'Focus on warning signs, boundary setting, evidence preservation, and safety-oriented actions for the querent.',
+    'Output format (exact labels, no bullets):',
+    '危険度: 低 / 中 / 高 / 緊急 のいずれか1つ',
+    '根拠: カード配置から危険度を判断した理由を簡潔に述べる。',
+    '対策: 相談者が今日から取るべき安全行動を具体的に述べる。',
+)
+
+_CLOSING = (
+    'Focus on the positions (past/present/future or given labels).',
+    'Treat card meanings as nuance and metaphor; avoid one-to-one deterministic claims.',
+    'Avoid claiming certainty; offer guidance.',
+    '',
+    'Fortune type: {kind}',
+    'Fortune key: {fortune_key}',
+    'Focus: {hint}',
+)
+
+_CARDS_HEADER = 'Cards:\nUse the following card names verbatim whenever you mention them.'
+
+# Reading-part trim levels, tried in order until the prompt fits the input
+# budget: (max keywords per card, None = all; compact partner metrics).
+_TRIM_LEVELS = ((None, False), (3, False), (3, True), (1, True), (0, True))
+
+
 def build_prompt(input_json: dict) -> str:
     if not isinstance(input_json, dict):
         return 'No input provided.'
+    return compose_prompt(*build_prompt_parts(input_json))
+
+
+def compose_prompt(system_prompt: str, reading_prompt: str) -> str:
+    return f'{system_prompt}\n\n{reading_prompt}'
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Claude token count: about 4 ASCII characters or 1 Japanese character per token."""
+    # Non-ASCII characters here are almost all 3-byte CJK, so the extra UTF-8
+    # bytes divided by 2 approximates their count without a Python-level loop.
+    non_ascii = (len(text.encode('utf-8')) - len(text)) // 2
+    return (len(text) - non_ascii) // 4 + non_ascii
+
+
+def build_prompt_parts(input_json: dict, token_budget: int | None = None) -> tuple[str, str]:
+    """Return (system_prompt, reading_prompt).
 
+    The system part depends only on the fortune key/type (and unit for
+    flower_timing), so it is compiled once per combination, is byte-identical
+    across readings and can be marked for Anthropic prompt caching. Cards,
+    question and metrics go in the reading part, which is the only thing
+    rendered per call. If the estimated size is over token_budget (default
+    INTERPRETATION_PROMPT_TOKEN_BUDGET, 0 = no limit), extra keywords and
+    derived partner metrics are dropped first.
+    """
     kind = input_json.get('type', 'reading')
     fortune_key = input_json.get('fortune_type_key') or ''
-    cards = input_json.get('cards', [])
-    question = input_json.get('question') or ''
-    context = input_json.get('context') or ''
-    unit = input_json.get('unit')
-    sexual_profile = input_json.get('sexual_profile') if isinstance(input_json.get('sexual_profile'), dict) else None
-    hint = FORTUNE_PROMPT_HINTS.get(fortune_key) or TYPE_FALLBACK_HINTS.get(kind) or 'カードの配置に沿って簡潔に解釈する。'
-    default_question = FORTUNE_QUESTION_TEXT.get(fortune_key) or ''
+    unit_label = _UNIT_LABELS.get(input_json.get('unit') or 'month', '1か月') if fortune_key == 'flower_timing' else ''
+    system_prompt, system_tokens = _system_prompt(str(kind), str(fortune_key), unit_label)
 
-    is_today = fortune_key.startswith('today_')
-    is_today_deep = fortune_key.startswith('today_deep_') or kind == 'today_deep'
-    lines = [
-        'You are a professional tarot reader.',
-        'Write a concrete and direct Japanese interpretation.',
-        'Tone: warm, honest, and practical.',
-        'Avoid vague language; be specific and actionable.',
-        'Use consistent sentence style (desu/masu).',
-        'When mentioning any tarot card, copy the exact English card name shown in the Cards section (e.g., "Knight of Cups"). Do not translate or alter card names.',
-    ]
+    budget = INTERPRETATION_PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    for max_keywords, compact_metrics in _TRIM_LEVELS:
+        reading_prompt = _reading_prompt(input_json, str(fortune_key), max_keywords, compact_metrics)
+        if not budget or system_tokens + estimate_tokens(reading_prompt) <= budget:
+            break
+    return system_prompt, reading_prompt
 
+
+@functools.lru_cache(maxsize=256)
+def _system_prompt(kind: str, fortune_key: str, unit_label: str) -> tuple[str, int]:
+    hint = FORTUNE_PROMPT_HINTS.get(fortune_key) or TYPE_FALLBACK_HINTS.get(kind) or 'カードの配置に沿って簡潔に解釈する。'
     if fortune_key == 'flower_timing':
-        unit_label = {
-            'day': '1日',
-            'week': '1週間',
-            'month': '1か月',
-            'year': '1年',
-        }.get(unit or 'month', '1か月')
-        lines.extend(
-            [
-                'This is a flower timing reading with 12 positions.',
-                f'Time unit: {unit_label}.',
-                'Interpret as N units from now (e.g., 3 months later), not calendar months or specific dates.',
-                'Rule: The Fool indicates the lucky timing. If The Fool does not appear, there is no timing.',
-                'Output format (exact labels, no bullets):',
-                f'ラッキータイミング: 〇{unit_label}後',
-                '理由: ...',
-                '結論: ...',
-                'If no The Fool, set ラッキータイミング to "該当なし" and explain that there is no timing.',
-            ]
-        )
-    elif is_today_deep:
-        lines.extend(
-            [
-                'Output format (exact labels, no bullets):',
-                '# 今日の総合運',
-                '結果: ...',
-                'アドバイス: ...',
-                '結論: ...',
-                '# 今日の恋愛運',
-                '結果: ...',
-                'アドバイス: ...',
-                '結論: ...',
-                '# 今日の仕事運',
-                '結果: ...',
-                'アドバイス: ...',
-                '結論: ...',
-                '# 今日の金運',
-                '結果: ...',
-                'アドバイス: ...',
-                '結論: ...',
-                '# 今日のトラブル運',
-                '結果: ...',
-                'アドバイス: ...',
-                '結論: ...',
-                'Each line should be 1-3 sentences.',
-                'Use the base card for 総合運, and the labeled positions for the other categories.',
-            ]
-        )
-    elif is_today:
-        lines.extend(
-            [
-                'Output format (exact labels, no bullets):',
-                '結果: ...',
-                'アドバイス: ...',
-                '結論: ...',
-                'Each line should be 1-3 sentences.',
-            ]
-        )
+        output_format = tuple(line.format(unit_label=unit_label) for line in _FLOWER_TIMING_FORMAT)
+    elif fortune_key.startswith('today_deep_') or kind == 'today_deep':
+        output_format = _TODAY_DEEP_FORMAT
+    elif fortune_key.startswith('today_'):
+        output_format = _TODAY_FORMAT
     elif fortune_key == 'partner_sexual':
-        lines.extend(
-            [
-                'This is a trump-card based sexual tendency spread.',
-                'Important fixed rule: upright = S, reversed = M.',
-                'Card meanings are symbolic nuance, not literal facts or fixed labels.',
-                'Infer tendencies from aggregate patterns and numeric metrics, not from a single card.',
-                'Output format (exact labels, no bullets):',
-                '判定: ...',
-                'S度: ...%',
-                'M度: ...%',
-                '傾向: ...',
-                'スイッチャー傾向: ...',
-                '補足: ...',
-                'Reflect the given percentages and the tendency card directly in the text.',
-            ]
-        )
+        output_format = _PARTNER_SEXUAL_FORMAT
     else:
-        lines.append('Output: 6-10 sentences, no bullet points.')
-
-    if fortune_key == 'triangle_crime':
-        lines.extend(
-            [
-                'Interpretation perspective: analyze a potentially harmful counterpart (the offender side), not the querent as perpetrator.',
-                'Never provide suggestions that enable, justify, or optimize criminal acts.',
-                'Focus on warning signs, boundary setting, evidence preservation, and safety-oriented actions for the querent.',
-                'Output format (exact labels, no bullets):',
-                '危険度: 低 / 中 / 高 / 緊急 のいずれか1つ',
-                '根拠: カード配置から危険度を判断した理由を簡潔に述べる。',
-                '対策: 相談者が今日から取るべき安全行動を具体的に述べる。',
-            ]
-        )
+        output_format = _SENTENCES_FORMAT
+    rules = _TRIANGLE_CRIME_RULES if fortune_key == 'triangle_crime' else ()
+    closing = '\n'.join(_CLOSING).format(kind=kind, fortune_key=fortune_key or '-', hint=hint)
+    text = '\n'.join((*_PREAMBLE, *output_format, *rules, closing))
+    return text, estimate_tokens(text)
 
-    lines.extend(
-        [
-            '',
-            f'Fortune type: {kind}',
-            f'Fortune key: {fortune_key}' if fortune_key else 'Fortune key: -',
-            f'Focus: {hint}',
-            'Cards:',
-            'Use the following card names verbatim whenever you mention them.',
-        ]
-    )
 
-    for card in cards:
-        if not isinstance(card, dict):
-            continue
-        pos = card.get('position', '')
-        name = card.get('card_name', '')
-        meaning = card.get('meaning_short') or ''
-        keywords = card.get('keywords') or []
-        upright = card.get('upright')
-        orient = 'upright' if upright is True else 'reversed' if upright is False else 'neutral'
-        keyword_text = ', '.join(keywords)
-        lines.append(f'- {pos}: {name} ({orient}) | {meaning} | {keyword_text}')
+def _reading_prompt(input_json: dict, fortune_key: str, max_keywords: int | None, compact_metrics: bool) -> str:
+    lines = [_CARDS_HEADER]
+    for card in input_json.get('cards') or []:
+        if isinstance(card, dict):
+            lines.append(_card_line(card, max_keywords))
 
+    question = input_json.get('question') or ''
+    context = input_json.get('context') or ''
+    default_question = FORTUNE_QUESTION_TEXT.get(fortune_key) or ''
     if question or context or default_question:
         lines.append('')
-        if question:
-            lines.append(f'Question: {question}')
-        elif default_question:
-            lines.append(f'Question: {default_question}')
+        if question or default_question:
+            lines.append(f'Question: {question or default_question}')
         if context:
             lines.append(f'Context: {context}')
-    if sexual_profile:
-        lines.extend(
-            [
-                '',
-                'Partner Sexual Metrics:',
-                f"- Upright(S) count: {sexual_profile.get('s_count')}",
-                f"- Reversed(M) count: {sexual_profile.get('m_count')}",
-                f"- S degree: {sexual_profile.get('s_percent')}%",
-                f"- M degree: {sexual_profile.get('m_percent')}%",
-                f"- Balance label: {sexual_profile.get('balance_label')}",
-                f"- Dominant attribute: {sexual_profile.get('dominant_attribute')}",
-            ]
+
+    sexual_profile = input_json.get('sexual_profile')
+    if isinstance(sexual_profile, dict) and sexual_profile:
+        lines.extend(_partner_metric_lines(sexual_profile, compact_metrics))
+    return '\n'.join(lines)
+
+
+def _card_line(card: dict, max_keywords: int | None) -> str:
+    upright = card.get('upright')
+    orient = 'upright' if upright is True else 'reversed' if upright is False else 'neutral'
+    line = f"- {card.get('position', '')}: {card.get('card_name', '')} ({orient}) | {card.get('meaning_short') or ''}"
+    keywords = card.get('keywords') or []
+    if max_keywords is None:
+        return f"{line} | {', '.join(keywords)}"
+    if max_keywords:
+        return f"{line} | {', '.join(keywords[:max_keywords])}"
+    return line
+
+
+def _partner_metric_lines(profile: dict, compact: bool) -> list[str]:
+    # Compact mode keeps what the output format asks for and drops counts the
+    # model can derive from the percentages (S/M counts, polarity, imbalance)
+    # plus the suit and rank breakdowns.
+    lines = ['', 'Partner Sexual Metrics:']
+    if not compact:
+        lines.append(f"- Upright(S) count: {profile.get('s_count')}")
+        lines.append(f"- Reversed(M) count: {profile.get('m_count')}")
+    lines.extend(
+        [
+            f"- S degree: {profile.get('s_percent')}%",
+            f"- M degree: {profile.get('m_percent')}%",
+            f"- Balance label: {profile.get('balance_label')}",
+            f"- Dominant attribute: {profile.get('dominant_attribute')}",
+        ]
+    )
+    tendency = profile.get('tendency')
+    if isinstance(tendency, dict):
+        lines.append(
+            f"- Tendency card: {tendency.get('card', {}).get('name')} ({tendency.get('attribute')}) | {tendency.get('category')} | {tendency.get('theme')}"
         )
-        tendency = sexual_profile.get('tendency')
-        if isinstance(tendency, dict):
-            lines.append(
-                f"- Tendency card: {tendency.get('card', {}).get('name')} ({tendency.get('attribute')}) | {tendency.get('category')} | {tendency.get('theme')}"
-            )
-        switcher = sexual_profile.get('switcher')
-        if isinstance(switcher, dict):
+    switcher = profile.get('switcher')
+    if isinstance(switcher, dict):
+        if compact:
+            lines.append(f"- Switcher: detected={switcher.get('detected')}")
+        else:
             left = switcher.get('left') or {}
             right = switcher.get('right') or {}
             lines.append(
                 f"- Switcher: detected={switcher.get('detected')} left(S/M)={left.get('s')}/{left.get('m')} right(S/M)={right.get('s')}/{right.get('m')}"
             )
-        numeric_traits = sexual_profile.get('numeric_traits')
-        if isinstance(numeric_traits, dict):
-            lines.append(f"- Polarity index (S%-M%): {numeric_traits.get('polarity_index')}")
-            lines.append(f"- Imbalance count |S-M|: {numeric_traits.get('imbalance_count')}")
-            suit_counts = numeric_traits.get('suit_counts') or {}
-            if isinstance(suit_counts, dict):
-                lines.append(
-                    '- Suit counts: '
-                    f"Spade={suit_counts.get('Spade', 0)} "
-                    f"Club={suit_counts.get('Club', 0)} "
-                    f"Diamond={suit_counts.get('Diamond', 0)} "
-                    f"Harts={suit_counts.get('Harts', 0)} "
-                    f"Joker={suit_counts.get('Joker', 0)}"
-                )
-            rank_band_counts = numeric_traits.get('rank_band_counts') or {}
-            if isinstance(rank_band_counts, dict):
-                lines.append(
-                    '- Rank bands: '
-                    f"low(1-6)={rank_band_counts.get('low', 0)} "
-                    f"mid(7-10)={rank_band_counts.get('mid', 0)} "
-                    f"high(J-Q-K)={rank_band_counts.get('high', 0)} "
-                    f"joker={rank_band_counts.get('joker', 0)}"
-                )
-        lines.append(
-            f"- Joker boost: applied={sexual_profile.get('joker_boost_applied')} target={sexual_profile.get('joker_boost_target')}"
-        )
-    lines.append('')
-    lines.append('Focus on the positions (past/present/future or given labels).')
-    lines.append('Treat card meanings as nuance and metaphor; avoid one-to-one deterministic claims.')
-    lines.append('Avoid claiming certainty; offer guidance.')
-    return '\n'.join(lines)
+    numeric_traits = profile.get('numeric_traits')
+    if isinstance(numeric_traits, dict) and not compact:
+        lines.append(f"- Polarity index (S%-M%): {numeric_traits.get('polarity_index')}")
+        lines.append(f"- Imbalance count |S-M|: {numeric_traits.get('imbalance_count')}")
+        suit_counts = numeric_traits.get('suit_counts') or {}
+        if isinstance(suit_counts, dict):
+            lines.append(
+                '- Suit counts: '
+                f"Spade={suit_counts.get('Spade', 0)} "
+                f"Club={suit_counts.get('Club', 0)} "
+                f"Diamond={suit_counts.get('Diamond', 0)} "
+                f"Harts={suit_counts.get('Harts', 0)} "
+                f"Joker={suit_counts.get('Joker', 0)}"
+            )
+        rank_band_counts = numeric_traits.get('rank_band_counts') or {}
+        if isinstance(rank_band_counts, dict):
+            lines.append(
+                '- Rank bands: '
+                f"low(1-6)={rank_band_counts.get('low', 0)} "
+                f"mid(7-10)={rank_band_counts.get('mid', 0)} "
+                f"high(J-Q-K)={rank_band_counts.get('high', 0)} "
+                f"joker={rank_band_counts.get('joker', 0)}"
+            )
+    lines.append(
+        f"- Joker boost: applied={profile.get('joker_boost_applied')} target={profile.get('joker_boost_target')}"
+    )
+    return lines
@@ -0,0 +1,213 @@
+"""Local, template-based interpretations.
+
+Renders the same labeled formats build_prompt asks Claude for, using the
+card meanings already attached to the input (DB card_meanings via
+enrich_input), then card_meanings.CARD_MEANINGS and partner_sexual.CARD_MAP.
+Used as the fallback text, as an instant placeholder while Claude runs and
+as the whole interpretation when INTERPRETATION_MODE selects it.
+"""
+
+from .card_meanings import get_card_meaning
+from .interpretation_prompt import FORTUNE_QUESTION_TEXT
+from .partner_sexual import get_partner_card_meaning
+
+_UNIT_LABELS = {'day': '1日', 'week': '1週間', 'month': '1か月', 'year': '1年'}
+
+_TODAY_DEEP_SECTIONS = [
+    ('総合', '今日の総合運'),
+    ('恋愛', '今日の恋愛運'),
+    ('仕事', '今日の仕事運'),
+    ('金運', '今日の金運'),
+    ('トラブル', '今日のトラブル運'),
+]
+
+_UPRIGHT_ADVICE = 'この流れを活かし、「{keyword}」を意識した行動を一つ選んで実行してみてください。'
+_REVERSED_ADVICE = '「{keyword}」に振り回されないよう、予定を詰め込みすぎず一呼吸おいて判断してください。'
+_NEUTRAL_ADVICE = '「{keyword}」をキーワードに、今できる小さな一歩から始めてみてください。'
+
+# Cards that weigh towards a higher 危険度 in triangle_crime, in addition to reversed cards.
+_WARNING_CARDS = frozenset(
+    {
+        'The Tower',
+        'The Devil',
+        'The Moon',
+        'Death',
+        'Three of Swords',
+        'Five of Swords',
+        'Seven of Swords',
+        'Nine of Swords',
+        'Ten of Swords',
+    }
+)
+_DANGER_LEVELS = ['低', '中', '中', '高', '高', '緊急']
+
+
+def render_interpretation(input_json: dict) -> str:
+    if not isinstance(input_json, dict):
+        return ''
+    kind = str(input_json.get('type') or '')
+    fortune_key = str(input_json.get('fortune_type_key') or '')
+    cards = [_with_meaning(card) for card in input_json.get('cards') or [] if isinstance(card, dict)]
+
+    if fortune_key == 'flower_timing':
+        return _render_flower_timing(cards, input_json.get('unit'))
+    if fortune_key.startswith('today_deep_') or kind == 'today_deep':
+        return _render_today_deep(cards)
+    if fortune_key.startswith('today_'):
+        return _render_result_advice_conclusion(cards)
+    if fortune_key == 'partner_sexual':
+        return _render_partner_sexual(input_json.get('sexual_profile'))
+    text = _render_sentences(cards, input_json.get('question') or FORTUNE_QUESTION_TEXT.get(fortune_key) or '')
+    if fortune_key == 'triangle_crime':
+        text = f'{text}\n{_render_triangle_crime(cards)}'
+    return text
+
+
+def _with_meaning(card: dict) -> dict:
+    if card.get('meaning_short'):
+        return card
+    if card.get('arcana') == 'trump':
+        meaning = get_partner_card_meaning(card)
+    else:
+        meaning = get_card_meaning(card.get('card_name') or '', card.get('upright')) or {}
+    return {
+        **card,
+        'meaning_short': meaning.get('short_meaning') or '',
+        'keywords': card.get('keywords') or meaning.get('keywords') or [],
+    }
+
+
+def _orientation(card: dict) -> str:
+    upright = card.get('upright')
+    return '正位置' if upright is True else '逆位置' if upright is False else ''
+
+
+def _card_label(card: dict) -> str:
+    orientation = _orientation(card)
+    name = card.get('card_name') or 'カード'
+    return f'{name}（{orientation}）' if orientation else name
+
+
+def _first_keyword(card: dict) -> str:
+    keywords = card.get('keywords') or []
+    if keywords:
+        return str(keywords[0])
+    return (card.get('meaning_short') or '').split('・')[0] or '今の流れ'
+
+
+def _result_line(card: dict) -> str:
+    meaning = card.get('meaning_short') or '今の流れ'
+    return f'{_card_label(card)}は「{meaning}」を示しています。'
+
+
+def _advice_line(card: dict) -> str:
+    template = {True: _UPRIGHT_ADVICE, False: _REVERSED_ADVICE}.get(card.get('upright'), _NEUTRAL_ADVICE)
+    return template.format(keyword=_first_keyword(card))
+
+
+def _conclusion_line(card: dict) -> str:
+    if card.get('upright') is False:
+        return '焦らず整えることで、流れは少しずつ好転していきます。'
+    return '前向きな意識が、良い結果につながりやすい流れです。'
+
+
+def _render_result_advice_conclusion(cards: list[dict]) -> str:
+    if not cards:
+        return '結果: カードが見つかりませんでした。\nアドバイス: もう一度占ってみてください。\n結論: 今日は落ち着いて過ごしましょう。'
+    card = cards[0]
+    return '\n'.join(
+        [
+            f'結果: {_result_line(card)}',
+            f'アドバイス: {_advice_line(card)}',
+            f'結論: {_conclusion_line(card)}',
+        ]
+    )
+
+
+def _render_today_deep(cards: list[dict]) -> str:
+    by_position = {card.get('position'): card for card in cards}
+    lines = []
+    for index, (position, title) in enumerate(_TODAY_DEEP_SECTIONS):
+        card = by_position.get(position) or (cards[index] if index < len(cards) else None)
+        lines.append(f'# {title}')
+        lines.append(_render_result_advice_conclusion([card] if card else []))
+    return '\n'.join(lines)
+
+
+def _render_flower_timing(cards: list[dict], unit: str | None) -> str:
+    unit_label = _UNIT_LABELS.get(unit or 'month', '1か月')
+    fool_index = next(
+        (index for index, card in enumerate(cards) if card.get('card_name') == 'The Fool'),
+        None,
+    )
+    if fool_index is None:
+        return '\n'.join(
+            [
+                'ラッキータイミング: 該当なし',
+                '理由: 12枚の中にThe Foolが現れなかったため、今回は特定のタイミングは示されていません。',
+                '結論: 時期を待つよりも、目の前の準備を着実に進めることが大切です。',
+            ]
+        )
+    position = str(cards[fool_index].get('position') or '')
+    count = int(position) if position.isdigit() else fool_index + 1
+    unit_text = unit_label[1:] if unit_label.startswith('1') else unit_label
+    return '\n'.join(
+        [
+            f'ラッキータイミング: {count}{unit_text}後',
+            f'理由: {count}番目の位置にThe Foolが現れ、新しい一歩を踏み出す好機を示しています。',
+            f'結論: {count}{unit_text}後を目安に準備を整え、思い切って行動に移してみてください。',
+        ]
+    )
+
+
+def _render_partner_sexual(profile: dict | None) -> str:
+    profile = profile if isinstance(profile, dict) else {}
+    tendency = profile.get('tendency') if isinstance(profile.get('tendency'), dict) else {}
+    switcher = profile.get('switcher') if isinstance(profile.get('switcher'), dict) else {}
+    tendency_card = (tendency.get('card') or {}).get('name') or '-'
+    theme = ' / '.join(item for item in [tendency.get('category'), tendency.get('theme')] if item) or '特定の傾向なし'
+    return '\n'.join(
+        [
+            f"判定: {profile.get('balance_label') or '判定不能'}",
+            f"S度: {profile.get('s_percent', 0)}%",
+            f"M度: {profile.get('m_percent', 0)}%",
+            f'傾向: {tendency_card} が示す「{theme}」に関心が向きやすい傾向です。',
+            'スイッチャー傾向: '
+            + ('左右で傾向が入れ替わり、相手や状況によって役割が変わりやすいタイプです。' if switcher.get('detected') else '目立ったスイッチャー傾向は見られません。'),
+            '補足: カードの傾向は目安です。お互いの同意と安全を最優先にしてください。',
+        ]
+    )
+
+
+def _render_sentences(cards: list[dict], question: str) -> str:
+    sentences = []
+    if question:
+        sentences.append(f'「{question}」について、カードの配置から読み解きます。')
+    for card in cards[:10]:
+        position = card.get('position')
+        prefix = f'{position}の位置の' if position and position not in ('base', 'extra', 'カード') else ''
+        sentences.append(f'{prefix}{_result_line(card)}')
+    if cards:
+        sentences.append(_advice_line(cards[-1]))
+        sentences.append(_conclusion_line(cards[-1]))
+    else:
+        sentences.append('カードが見つかりませんでした。')
+    return ''.join(sentences)
+
+
+def _render_triangle_crime(cards: list[dict]) -> str:
+    reversed_count = sum(1 for card in cards if card.get('upright') is False)
+    warning = [card for card in cards if card.get('card_name') in _WARNING_CARDS]
+    level = _DANGER_LEVELS[min(len(_DANGER_LEVELS) - 1, reversed_count + 2 * len(warning))]
+    if warning:
+        names = '、'.join(card.get('card_name') for card in warning)
+        reason = f'逆位置が{reversed_count}枚あり、警戒を示す{names}が出ていることから判断しました。'
+    else:
+        reason = f'逆位置が{reversed_count}枚で、強い警戒を示すカードは出ていないことから判断しました。'
+    return '\n'.join(
+        [
+            f'危険度: {level}',
+            f'根拠: {reason}',
+            '対策: 一人で対応せず、やり取りや出来事の記録を残し、信頼できる人や専門窓口に早めに相談してください。',
+        ]
+    )
@@ -0,0 +1,78 @@
+from ..db import get_conn
+
+_GROUP_COLUMNS = {
+    'fortune_key': ('fortune_key',),
+    'model': ('model',),
+    'fortune_key_model': ('fortune_key', 'model'),
+}
+
+
+def usage_summary(days: int, group_by: str = 'fortune_key_model') -> list[dict]:
+    """Aggregate interpretation_call_stats over the last `days` days."""
+    columns = _GROUP_COLUMNS[group_by]
+    group_sql = ', '.join(columns)
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f'SELECT {group_sql}, '
+                'COUNT(*), '
+                "COUNT(*) FILTER (WHERE source = 'api'), "
+                "COUNT(*) FILTER (WHERE source = 'cache'), "
+                "COUNT(*) FILTER (WHERE source = 'template'), "
+                "COUNT(*) FILTER (WHERE source = 'fallback'), "
+                "COUNT(*) FILTER (WHERE stop_reason = 'max_tokens'), "
+                'COUNT(*) FILTER (WHERE hedged), '
+                'COALESCE(SUM(input_tokens), 0), '
+                'COALESCE(SUM(output_tokens), 0), '
+                'COALESCE(SUM(cache_creation_input_tokens), 0), '
+                'COALESCE(SUM(cache_read_input_tokens), 0), '
+                "percentile_cont(0.5) WITHIN GROUP (ORDER BY latency_ms) FILTER (WHERE source = 'api'), "
+                "percentile_cont(0.95) WITHIN GROUP (ORDER BY latency_ms) FILTER (WHERE source = 'api'), "
+                "AVG(attempts) FILTER (WHERE source = 'api') "
+                'FROM interpretation_call_stats '
+                "WHERE created_at > now() - %s * interval '1 day' "
+                f'GROUP BY {group_sql} ORDER BY {group_sql}',
+                (days,),
+            )
+            rows = cur.fetchall()
+
+    summary = []
+    for row in rows:
+        item = dict(zip(columns, row))
+        (
+            calls,
+            api_calls,
+            cache_hits,
+            templates,
+            fallbacks,
+            max_tokens_stops,
+            hedged,
+            input_tokens,
+            output_tokens,
+            cache_creation_tokens,
+            cache_read_tokens,
+            p50,
+            p95,
+            avg_attempts,
+        ) = row[len(columns):]
+        item.update(
+            {
+                'calls': calls,
+                'api_calls': api_calls,
+                'cache_hits': cache_hits,
+                'templates': templates,
+                'fallbacks': fallbacks,
+                'fallback_rate': round(fallbacks / calls, 4) if calls else 0.0,
+                'max_tokens_rate': round(max_tokens_stops / api_calls, 4) if api_calls else 0.0,
+                'hedge_rate': round(hedged / api_calls, 4) if api_calls else 0.0,
+                'input_tokens': int(input_tokens),
+                'output_tokens': int(output_tokens),
+                'cache_creation_input_tokens': int(cache_creation_tokens),
+                'cache_read_input_tokens': int(cache_read_tokens),
+                'latency_p50_ms': round(p50) if p50 is not None else None,
+                'latency_p95_ms': round(p95) if p95 is not None else None,
+                'avg_attempts': round(float(avg_attempts), 2) if avg_attempts is not None else None,
+            }
+        )
+        summary.append(item)
+    return summary
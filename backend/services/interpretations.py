@@ -0,0 +1,626 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+
+from ..config import (
+    DISABLE_INTERPRETATION_LIMITS,
+    INTERPRETATION_BACKGROUND_DRAIN_SECONDS,
+    INTERPRETATION_SINGLE_FLIGHT_LEASE_SECONDS,
+    INTERPRETATION_SINGLE_FLIGHT_WAIT_SECONDS,
+)
+from ..db import get_conn
+from .card_meanings import get_card_meaning
+from .claude import CallStats, ClaudeClient
+from .interpretation_prompt import build_prompt
+from .interpretation_templates import render_interpretation
+from .llm_executor import LLMQueueFull, llm_executor, run_llm_sync
+from .partner_sexual import get_partner_card_meaning
+from .today_free import find_pregenerated
+from .token_budget import over_budget
+
+logger = logging.getLogger(__name__)
+
+_POLL_INTERVAL_SECONDS = 0.25
+_DISCONNECT_CHECK_SECONDS = 0.5
+_inflight: dict[str, asyncio.Future] = {}
+_sharers: dict[str, int] = defaultdict(int)
+_background: set[asyncio.Task] = set()
+_output_tokens: dict[str, deque[int]] = defaultdict(lambda: deque(maxlen=50))
+_disconnects = {
+    endpoint: {'cancelled': 0, 'persisted': 0, 'tokens_saved_estimate': 0} for endpoint in ('generate', 'stream')
+}
+
+
+async def generate_and_store(reading_id: str, input_json: dict, store_fallback: bool = True) -> dict:
+    """Generate and store one interpretation version.
+
+    fallback is true when Anthropic failed and the text is the local
+    template. With store_fallback=False (the job worker) that text is not
+    stored and version is None, so the job can be retried instead.
+    """
+    async with llm_executor.slot():
+        pregenerated = await run_llm_sync(find_pregenerated, input_json)
+        if pregenerated:
+            prompt, output_text, model = pregenerated
+            stats = CallStats(model=model, fortune_key=input_json.get('fortune_type_key') or '', source='pregenerated')
+        else:
+            client = ClaudeClient()
+            client.reading_id = reading_id
+            client.over_budget = await run_llm_sync(over_budget, reading_id)
+            prompt, output_text = await client.generate(input_json)
+            stats = client.last_call
+            model = stats.model
+            _note_output_tokens(stats)
+    if stats.fallback and not store_fallback:
+        next_version = None
+    else:
+        next_version = await run_llm_sync(store_interpretation, reading_id, prompt, output_text, model, stats)
+    return {
+        'reading_id': reading_id,
+        'prompt': prompt,
+        'output_text': output_text,
+        'version': next_version,
+        'model': model,
+        'fallback': stats.fallback,
+    }
+
+
+async def generate_with_deadline(
+    reading_id: str,
+    input_json: dict,
+    deadline_seconds: float,
+    is_disconnected: Callable[[], Awaitable[bool]] | None = None,
+    on_disconnect: str = 'persist',
+) -> dict:
+    """Generate, but answer with a provisional interpretation once the deadline passes.
+
+    The generation keeps running in the background and stores its version as
+    usual, so GET /interpretations/{reading_id} serves the final text later.
+    If the client disconnects first, on_disconnect='cancel' aborts the upstream
+    call unless other callers are sharing it; 'persist' lets it finish.
+    """
+    llm_executor.check_capacity()
+    task = asyncio.ensure_future(single_flight(reading_id, lambda: generate_and_store(reading_id, input_json)))
+    _background.add(task)
+    task.add_done_callback(_background_done)
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds > 0 else None
+    while True:
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        if remaining is not None and remaining <= 0:
+            break
+        timeout = remaining
+        if is_disconnected is not None:
+            timeout = _DISCONNECT_CHECK_SECONDS if remaining is None else min(remaining, _DISCONNECT_CHECK_SECONDS)
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if done:
+            return {**task.result(), 'provisional': False}
+        if is_disconnected is not None and await is_disconnected():
+            if on_disconnect == 'cancel' and not _sharers.get(reading_id):
+                task.cancel()
+                _note_disconnect('generate', cancelled=True, input_json=input_json)
+            else:
+                _note_disconnect('generate', cancelled=False, input_json=input_json)
+            return {'reading_id': reading_id, 'disconnected': True}
+    logger.info('Generation for reading_id=%s passed its %ss deadline; continuing in background.', reading_id, deadline_seconds)
+    return await run_llm_sync(_provisional_interpretation, reading_id, input_json)
+
+
+def start_stream_generation(reading_id: str, input_json: dict, queue: asyncio.Queue) -> asyncio.Task:
+    """Stream and store one interpretation in its own task, pushing events to queue.
+
+    Events are ('delta', text), ('done', result) or ('error', exc). Running
+    outside the response lets the caller either cancel the task or leave it
+    to persist when the client goes away.
+    """
+    chunks: list[str] = []
+
+    async def produce() -> dict:
+        async with llm_executor.slot():
+            client = ClaudeClient()
+            client.reading_id = reading_id
+            client.over_budget = await run_llm_sync(over_budget, reading_id)
+            async for text in client.stream(input_json):
+                chunks.append(text)
+                queue.put_nowait(('delta', text))
+        stats = client.last_call
+        _note_output_tokens(stats)
+        prompt = build_prompt(input_json)
+        output_text = ''.join(chunks).strip()
+        if not output_text:
+            raise RuntimeError('Interpretation stream produced no text')
+        next_version = await run_llm_sync(store_interpretation, reading_id, prompt, output_text, stats.model, stats)
+        result = {
+            'reading_id': reading_id,
+            'prompt': prompt,
+            'output_text': output_text,
+            'version': next_version,
+            'model': stats.model,
+        }
+        queue.put_nowait(('done', result))
+        return result
+
+    def finished(task: asyncio.Task) -> None:
+        if task.cancelled():
+            _note_disconnect('stream', cancelled=True, input_json=input_json, emitted=''.join(chunks))
+        elif task.exception() is not None:
+            queue.put_nowait(('error', task.exception()))
+
+    task = asyncio.ensure_future(produce())
+    _background.add(task)
+    task.add_done_callback(_background_done)
+    task.add_done_callback(finished)
+    return task
+
+
+def stream_disconnected(task: asyncio.Task, on_disconnect: str) -> None:
+    if task.done():
+        return
+    if on_disconnect == 'cancel':
+        task.cancel()
+    else:
+        _note_disconnect('stream', cancelled=False)
+
+
+def _note_output_tokens(stats: CallStats) -> None:
+    if stats.source == 'api' and stats.output_tokens:
+        _output_tokens[stats.fortune_key].append(stats.output_tokens)
+
+
+def _note_disconnect(endpoint: str, cancelled: bool, input_json: dict | None = None, emitted: str = '') -> None:
+    counters = _disconnects[endpoint]
+    if not cancelled:
+        counters['persisted'] += 1
+        return
+    counters['cancelled'] += 1
+    # Rough estimate: the key's recent average output minus what was already
+    # streamed (about one token per Japanese character).
+    recent = _output_tokens.get((input_json or {}).get('fortune_type_key') or '')
+    if recent:
+        counters['tokens_saved_estimate'] += max(0, int(sum(recent) / len(recent)) - len(emitted))
+
+
+def disconnect_stats() -> dict:
+    return {endpoint: dict(counters) for endpoint, counters in _disconnects.items()}
+
+
+def _background_done(task: asyncio.Task) -> None:
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None and not isinstance(task.exception(), LLMQueueFull):
+        logger.error('Background interpretation generation failed.', exc_info=task.exception())
+
+
+def _provisional_interpretation(reading_id: str, input_json: dict) -> dict:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            previous = get_latest_interpretation(cur, reading_id)
+    if previous:
+        return {**previous, 'provisional': True, 'source': 'previous'}
+    return {
+        'reading_id': reading_id,
+        'prompt': None,
+        'output_text': render_interpretation(input_json),
+        'version': None,
+        'model': None,
+        'provisional': True,
+        'source': 'template',
+    }
+
+
+async def drain_background_generations() -> None:
+    """On shutdown, give in-flight background generations a chance to store their versions."""
+    if _background:
+        logger.info('Waiting for %s background interpretation generations.', len(_background))
+        await asyncio.wait(set(_background), timeout=INTERPRETATION_BACKGROUND_DRAIN_SECONDS)
+
+
+def store_interpretation(
+    reading_id: str,
+    prompt: str,
+    output_text: str,
+    model: str,
+    stats: CallStats | None = None,
+    batch_custom_id: str | None = None,
+) -> int:
+    """Store a new interpretation version; returns its version number.
+
+    With batch_custom_id, a result that was already stored returns its
+    existing version instead of adding a duplicate.
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # Serialize version allocation per reading so concurrent writers never collide.
+            cur.execute(
+                'SELECT pg_advisory_xact_lock(hashtext(%s))',
+                (f'interpretation_versions:{reading_id}',),
+            )
+            if batch_custom_id is not None:
+                cur.execute(
+                    'SELECT version FROM interpretation_versions WHERE reading_id = %s AND batch_custom_id = %s',
+                    (reading_id, batch_custom_id),
+                )
+                row = cur.fetchone()
+                if row:
+                    conn.commit()
+                    return row[0]
+            cur.execute(
+                'SELECT COALESCE(MAX(version), 0) FROM interpretation_versions WHERE reading_id = %s',
+                (reading_id,),
+            )
+            next_version = (cur.fetchone()[0] or 0) + 1
+            cur.execute(
+                'UPDATE reading_interpretations SET output_text = %s, updated_at = now() WHERE reading_id = %s',
+                (output_text, reading_id),
+            )
+            cur.execute(
+                'INSERT INTO interpretation_versions (reading_id, version, prompt, output_text, model, batch_custom_id) '
+                'VALUES (%s, %s, %s, %s, %s, %s) RETURNING id',
+                (reading_id, next_version, prompt, output_text, model, batch_custom_id),
+            )
+            version_id = cur.fetchone()[0]
+            if stats is not None:
+                _insert_call_stats(cur, version_id, reading_id, stats)
+            conn.commit()
+    return next_version
+
+
+def _insert_call_stats(cur, version_id, reading_id: str, stats: CallStats) -> None:
+    cur.execute(
+        'INSERT INTO interpretation_call_stats ('
+        'interpretation_version_id, reading_id, fortune_key, model, source, input_tokens, output_tokens, '
+        'cache_creation_input_tokens, cache_read_input_tokens, latency_ms, upstream_latency_ms, first_token_ms, attempts, '
+        'stop_reason, hedged'
+        ') VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+        (
+            version_id,
+            reading_id,
+            stats.fortune_key,
+            stats.model,
+            stats.source,
+            stats.input_tokens,
+            stats.output_tokens,
+            stats.cache_creation_input_tokens,
+            stats.cache_read_input_tokens,
+            stats.latency_ms,
+            stats.upstream_latency_ms,
+            stats.first_token_ms,
+            stats.attempts,
+            stats.stop_reason,
+            stats.hedged,
+        ),
+    )
+
+
+def load_generation_input(reading_id: str, user_id: str) -> tuple[dict, dict | None] | None:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'SELECT ri.input_json, ft.key '
+                'FROM reading_interpretations ri '
+                'JOIN readings r ON r.id = ri.reading_id '
+                'JOIN fortune_types ft ON ft.id = r.fortune_type_id '
+                'WHERE ri.reading_id = %s AND r.user_id = %s',
+                (reading_id, user_id),
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+            input_json, fortune_key = row[0], row[1]
+
+            if not DISABLE_INTERPRETATION_LIMITS:
+                if fortune_key and fortune_key.startswith('today_'):
+                    window_start = daily_window_start_utc()
+                    existing_today = _get_latest_interpretation_for_today(
+                        cur, user_id, fortune_key, window_start
+                    )
+                    if existing_today:
+                        return input_json, existing_today
+
+    return input_json, None
+
+
+def daily_window_start_utc() -> datetime:
+    # Daily reset at 05:00 JST
+    now_utc = datetime.now(timezone.utc)
+    now_jst = now_utc + timedelta(hours=9)
+    if now_jst.hour < 5:
+        base_date = (now_jst - timedelta(days=1)).date()
+    else:
+        base_date = now_jst.date()
+    window_start_jst = datetime.combine(base_date, datetime.min.time()) + timedelta(hours=5)
+    return (window_start_jst - timedelta(hours=9)).replace(tzinfo=timezone.utc)
+
+
+def get_latest_interpretation(cur, reading_id: str) -> dict | None:
+    cur.execute(
+        'SELECT output_text, updated_at FROM reading_interpretations WHERE reading_id = %s',
+        (reading_id,),
+    )
+    row = cur.fetchone()
+    if not row or not row[0]:
+        return None
+    cur.execute(
+        'SELECT version, model FROM interpretation_versions WHERE reading_id = %s ORDER BY version DESC LIMIT 1',
+        (reading_id,),
+    )
+    vrow = cur.fetchone()
+    version = vrow[0] if vrow else 0
+    model = vrow[1] if vrow else None
+    return {
+        'reading_id': reading_id,
+        'prompt': None,
+        'output_text': row[0],
+        'version': version,
+        'model': model,
+    }
+
+
+def _get_latest_interpretation_for_today(
+    cur, user_id: str, fortune_key: str, window_start: datetime
+) -> dict | None:
+    cur.execute(
+        'SELECT r.id '
+        'FROM readings r '
+        'JOIN fortune_types ft ON ft.id = r.fortune_type_id '
+        'JOIN reading_interpretations ri ON ri.reading_id = r.id '
+        'WHERE r.user_id = %s AND ft.key = %s AND ri.updated_at >= %s '
+        'ORDER BY ri.updated_at DESC LIMIT 1',
+        (user_id, fortune_key, window_start),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    return get_latest_interpretation(cur, row[0])
+
+
+def enrich_input(cur, input_json: dict) -> dict:
+    if not isinstance(input_json, dict):
+        return input_json
+    cards = input_json.get('cards')
+    if not isinstance(cards, list) or not cards:
+        return input_json
+    fortune_key = (input_json.get('fortune_type_key') or '').strip()
+
+    if fortune_key == 'partner_sexual':
+        enriched_cards = []
+        for card in cards:
+            if not isinstance(card, dict):
+                enriched_cards.append(card)
+                continue
+            updated = dict(card)
+            meaning = get_partner_card_meaning(updated)
+            if not updated.get('meaning_short'):
+                updated['meaning_short'] = meaning.get('short_meaning')
+            if not updated.get('keywords'):
+                updated['keywords'] = meaning.get('keywords') or []
+            enriched_cards.append(updated)
+        return {**input_json, 'cards': enriched_cards}
+
+    names = [card.get('card_name') for card in cards if isinstance(card, dict) and card.get('card_name')]
+    if not names:
+        return input_json
+
+    cur.execute(
+        'SELECT c.name, m.orientation, m.short_meaning, m.keywords FROM card_catalog c LEFT JOIN card_meanings m ON m.card_id = c.id WHERE c.name = ANY(%s)',
+        (names,),
+    )
+    rows = cur.fetchall()
+    meaning_map: dict[str, dict[str, dict]] = {}
+    for name, orientation, short_meaning, keywords in rows:
+        if name not in meaning_map:
+            meaning_map[name] = {}
+        if orientation:
+            meaning_map[name][orientation] = {
+                'short_meaning': short_meaning,
+                'keywords': keywords or [],
+            }
+
+    def orientation_key(card: dict) -> str:
+        upright = card.get('upright')
+        if upright is None:
+            return 'none'
+        return 'upright' if upright else 'reversed'
+
+    enriched_cards = []
+    for card in cards:
+        if not isinstance(card, dict):
+            enriched_cards.append(card)
+            continue
+        name = card.get('card_name')
+        if not name or name not in meaning_map:
+            enriched_cards.append(card)
+            continue
+        orient = orientation_key(card)
+        meaning = meaning_map.get(name, {}).get(orient)
+        if not meaning:
+            fallback = get_card_meaning(name, card.get('upright'))
+            if not fallback:
+                enriched_cards.append(card)
+                continue
+            updated = dict(card)
+            if not updated.get('meaning_short'):
+                updated['meaning_short'] = fallback.get('short_meaning')
+            if not updated.get('keywords'):
+                updated['keywords'] = fallback.get('keywords') or []
+            enriched_cards.append(updated)
+            continue
+        updated = dict(card)
+        if not updated.get('meaning_short'):
+            updated['meaning_short'] = meaning.get('short_meaning')
+        if not updated.get('keywords'):
+            updated['keywords'] = meaning.get('keywords') or []
+        enriched_cards.append(updated)
+
+    return {**input_json, 'cards': enriched_cards}
+
+
+_POSITION_LABELS = {
+    'hexagram': ['過去', '立場', '現在', '未来', 'アドバイス', '周囲', '結果'],
+    'celtic_cross': ['現状', 'キー', '表層', '深層', '過去', '未来', '総合', '希望と恐れ', '周囲', '立場'],
+    'triangle_warning': ['動機', '機会', '自己正当化'],
+    'compatibility': ['相手', '相性', '自分'],
+    'today_deep': ['恋愛', '仕事', '金運', 'トラブル'],
+}
+
+
+def build_interpretation_input(
+    result_json: dict,
+    question: str = '',
+    context: str = '',
+    unit: str | None = None,
+) -> dict:
+    """Server-side equivalent of the app's _buildInterpretationInput (draw_screen.dart)."""
+    kind = str(result_json.get('type') or '')
+    cards = []
+    for idx, slot in enumerate(result_json.get('slots') or []):
+        if not isinstance(slot, dict):
+            continue
+        cards.append(_input_card(slot.get('card') or {}, _position_label(kind, idx, str(slot.get('position') or ''))))
+
+    base_card = result_json.get('base_card')
+    if base_card:
+        cards.insert(0, _input_card(base_card, '総合' if kind == 'today_deep' else 'base'))
+    for card in result_json.get('extra_cards') or []:
+        cards.append(_input_card(card, 'extra'))
+
+    input_json = {
+        'type': result_json.get('type'),
+        'fortune_type_key': result_json.get('fortune_type_key'),
+        'question': question.strip(),
+        'context': context.strip(),
+        'cards': cards,
+    }
+    if unit:
+        input_json['unit'] = unit
+    if result_json.get('sexual_profile') is not None:
+        input_json['sexual_profile'] = result_json['sexual_profile']
+    return input_json
+
+
+def _position_label(kind: str, index: int, fallback: str) -> str:
+    if kind == 'partner_sexual':
+        return fallback or str(index + 1)
+    labels = _POSITION_LABELS.get(kind)
+    if labels and index < len(labels):
+        return labels[index]
+    return fallback
+
+
+def _input_card(card: dict, position: str) -> dict:
+    return {
+        'position': position,
+        'card_name': card.get('name'),
+        'arcana': card.get('arcana'),
+        'suit': card.get('suit'),
+        'rank': card.get('rank'),
+        'asset_name': card.get('asset_name'),
+        'upright': card.get('upright'),
+        'meaning_short': None,
+        'keywords': [],
+    }
+
+
+async def single_flight(reading_id: str, produce: Callable[[], Awaitable[dict]]) -> dict:
+    """Run produce() once per reading, sharing its result with concurrent callers.
+
+    Callers in the same worker await one future; callers in other workers wait
+    for the version written by whichever worker holds the inflight row.
+    """
+    existing = _inflight.get(reading_id)
+    if existing is not None:
+        _sharers[reading_id] += 1
+        try:
+            return await asyncio.shield(existing)
+        finally:
+            _sharers[reading_id] -= 1
+            if not _sharers[reading_id]:
+                del _sharers[reading_id]
+
+    future = asyncio.get_running_loop().create_future()
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[reading_id] = future
+    try:
+        result = await _run_across_workers(reading_id, produce)
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        _inflight.pop(reading_id, None)
+
+
+async def _run_across_workers(reading_id: str, produce: Callable[[], Awaitable[dict]]) -> dict:
+    deadline = time.monotonic() + INTERPRETATION_SINGLE_FLIGHT_WAIT_SECONDS
+    while True:
+        baseline, claimed = await run_llm_sync(_claim, reading_id)
+        if claimed:
+            try:
+                return await produce()
+            finally:
+                await run_llm_sync(_release, reading_id)
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(_POLL_INTERVAL_SECONDS)
+            result, still_inflight = await run_llm_sync(_poll, reading_id, baseline)
+            if result:
+                return result
+            if not still_inflight:
+                break
+        else:
+            logger.warning('Timed out waiting for inflight interpretation reading_id=%s', reading_id)
+            return await produce()
+
+
+def _claim(reading_id: str) -> tuple[int, bool]:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # Read the baseline before claiming: if the holder stores and
+            # releases in between, our claim succeeds instead of waiting forever.
+            cur.execute(
+                'SELECT COALESCE(MAX(version), 0) FROM interpretation_versions WHERE reading_id = %s',
+                (reading_id,),
+            )
+            baseline = cur.fetchone()[0] or 0
+            conn.commit()
+            cur.execute(
+                'INSERT INTO interpretation_inflight (reading_id, started_at) VALUES (%s, now()) '
+                'ON CONFLICT (reading_id) DO UPDATE SET started_at = now() '
+                "WHERE interpretation_inflight.started_at < now() - %s * interval '1 second' "
+                'RETURNING reading_id',
+                (reading_id, INTERPRETATION_SINGLE_FLIGHT_LEASE_SECONDS),
+            )
+            claimed = cur.fetchone() is not None
+            conn.commit()
+    return baseline, claimed
+
+
+def _release(reading_id: str) -> None:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM interpretation_inflight WHERE reading_id = %s', (reading_id,))
+            conn.commit()
+
+
+def _poll(reading_id: str, baseline: int) -> tuple[dict | None, bool]:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'SELECT version, prompt, output_text, model FROM interpretation_versions '
+                'WHERE reading_id = %s AND version > %s ORDER BY version DESC LIMIT 1',
+                (reading_id, baseline),
+            )
+            row = cur.fetchone()
+            if row:
+                return {
+                    'reading_id': reading_id,
+                    'prompt': row[1],
+                    'output_text': row[2],
+                    'version': row[0],
+                    'model': row[3],
+                }, False
+            cur.execute('SELECT 1 FROM interpretation_inflight WHERE reading_id = %s', (reading_id,))
+            return None, cur.fetchone() is not None
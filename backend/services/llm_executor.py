@@ -0,0 +1,107 @@
+"""Admission control and a dedicated thread pool for interpretation generation.
+
+At most INTERPRETATION_LLM_CONCURRENCY generations run per worker and at most
+INTERPRETATION_LLM_QUEUE_SIZE wait; beyond that LLMQueueFull is raised and
+routes answer 503 with Retry-After. Blocking DB work done on behalf of a
+generation runs on its own threads so it never competes with Starlette's
+threadpool, which serves the cheap sync endpoints.
+"""
+
+import asyncio
+import functools
+import math
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any
+
+from ..config import INTERPRETATION_LLM_CONCURRENCY, INTERPRETATION_LLM_QUEUE_SIZE, INTERPRETATION_LLM_THREADS
+
+
+class LLMQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f'interpretation queue is full; retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+class LLMExecutor:
+    def __init__(self, max_concurrency: int, max_queue: int, threads: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='llm')
+        self._running = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._wait_ms: deque[int] = deque(maxlen=500)
+        self._run_seconds: deque[float] = deque(maxlen=100)
+        self._stats = {'admitted': 0, 'rejected': 0}
+
+    async def run_sync(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._threads, functools.partial(fn, *args))
+
+    def check_capacity(self) -> None:
+        """Raise LLMQueueFull if a new generation could not even queue."""
+        if self._running >= self.max_concurrency and len(self._waiters) >= self.max_queue:
+            self._stats['rejected'] += 1
+            raise LLMQueueFull(self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        enqueued_at = time.monotonic()
+        if self._running < self.max_concurrency and not self._waiters:
+            self._running += 1
+        else:
+            self.check_capacity()
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        started_at = time.monotonic()
+        self._wait_ms.append(int((started_at - enqueued_at) * 1000))
+        self._stats['admitted'] += 1
+        try:
+            yield
+        finally:
+            self._run_seconds.append(time.monotonic() - started_at)
+            self._release()
+
+    def retry_after(self) -> int:
+        average = sum(self._run_seconds) / len(self._run_seconds) if self._run_seconds else 5.0
+        rounds = (len(self._waiters) + 1) / max(1, self.max_concurrency)
+        return max(1, min(60, math.ceil(average * rounds)))
+
+    def snapshot(self) -> dict:
+        waits = sorted(self._wait_ms)
+        return {
+            'running': self._running,
+            'queued': len(self._waiters),
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'wait_ms_p50': waits[len(waits) // 2] if waits else 0,
+            'wait_ms_p95': waits[max(0, math.ceil(0.95 * len(waits)) - 1)] if waits else 0,
+            **self._stats,
+        }
+
+    def _release(self) -> None:
+        self._running -= 1
+        while self._waiters and self._running < self.max_concurrency:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._running += 1
+            waiter.set_result(None)
+
+
+llm_executor = LLMExecutor(INTERPRETATION_LLM_CONCURRENCY, INTERPRETATION_LLM_QUEUE_SIZE, INTERPRETATION_LLM_THREADS)
+
+
+async def run_llm_sync(fn: Callable[..., Any], *args: Any) -> Any:
+    return await llm_executor.run_sync(fn, *args)
@@ -0,0 +1,157 @@
+"""Pick the Anthropic model, max_tokens and timeout for a reading.
+
+Routes are looked up by fortune_type_key first, then by the result `type`,
+then `default`. A route with a p95 budget is downgraded to its
+downgrade_model while the primary model's recent p95 latency in this worker
+is over budget; once those samples age out of the window the primary model
+is tried again.
+
+ANTHROPIC_MODEL_ROUTES (JSON) overrides or adds routes, e.g.
+{"celtic_work": {"max_tokens": 2600, "timeout": 60}, "today_free": {"model": "claude-3-5-haiku-20241022", "hedge": true}}
+"""
+
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    model: str
+    max_tokens: int
+    timeout: float
+    downgrade_model: str = ''
+    p95_budget_ms: int = 0
+    hedge: bool = False
+
+
+@functools.lru_cache(maxsize=None)
+def load_routes(default_model: str) -> dict[str, ModelRoute]:
+    fast_model = os.environ.get('ANTHROPIC_FAST_MODEL', '').strip()
+    max_tokens = int(os.environ.get('ANTHROPIC_MAX_TOKENS', '1800'))
+    max_tokens_today_deep = int(os.environ.get('ANTHROPIC_MAX_TOKENS_TODAY_DEEP', '2600'))
+    timeout = float(os.environ.get('ANTHROPIC_TIMEOUT', '30'))
+    p95_budget_ms = int(os.environ.get('ANTHROPIC_P95_BUDGET_MS', '0'))
+
+    primary = ModelRoute(
+        model=default_model,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        downgrade_model=fast_model,
+        p95_budget_ms=p95_budget_ms if fast_model else 0,
+    )
+    # One-card and no-question readings are short; they go to the fast model when one is configured.
+    short = replace(primary, model=fast_model or default_model, downgrade_model='', p95_budget_ms=0)
+    routes = {
+        'default': primary,
+        'today_free': short,
+        'single_draw': short,
+        'no_desc_draw': short,
+        'today_deep': replace(primary, max_tokens=max_tokens_today_deep),
+        'celtic_cross': replace(primary, timeout=max(timeout, 45.0)),
+    }
+
+    for key in os.environ.get('ANTHROPIC_HEDGE_KEYS', '').split(','):
+        if key.strip():
+            routes[key.strip()] = replace(routes.get(key.strip(), primary), hedge=True)
+
+    raw = os.environ.get('ANTHROPIC_MODEL_ROUTES', '').strip()
+    if raw:
+        try:
+            overrides = json.loads(raw)
+        except ValueError:
+            logger.error('ANTHROPIC_MODEL_ROUTES is not valid JSON; ignoring it.')
+            overrides = {}
+        for key, values in overrides.items():
+            base = routes.get(key, primary)
+            fields = {name: values[name] for name in ModelRoute.__dataclass_fields__ if name in values}
+            routes[key] = replace(base, **fields)
+    return routes
+
+
+class LatencyTracker:
+    """Rolling window of per-attempt upstream latencies per model, for p95 checks.
+
+    Each attempt is one sample; timeouts and failed attempts count as the
+    attempt's full timeout, and retry backoff is never included.
+    """
+
+    def __init__(self, window_seconds: float, min_samples: int, max_samples: int = 500):
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque[tuple[float, int]]] = {}
+
+    def record(self, model: str, latency_ms: int) -> None:
+        with self._lock:
+            samples = self._samples.setdefault(model, deque(maxlen=self.max_samples))
+            samples.append((time.monotonic(), latency_ms))
+
+    def p95(self, model: str) -> int | None:
+        """p95 over the window, or None with too few samples to judge."""
+        return self.percentile(model, 0.95)
+
+    def percentile(self, model: str, quantile: float) -> int | None:
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            samples = self._samples.get(model)
+            if not samples:
+                return None
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            values = sorted(latency for _, latency in samples)
+        if len(values) < self.min_samples:
+            return None
+        return values[max(0, min(len(values) - 1, math.ceil(quantile * len(values)) - 1))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            models = list(self._samples)
+        return {model: {'p95_ms': self.p95(model), 'samples': len(self._samples[model])} for model in models}
+
+
+latency = LatencyTracker(
+    window_seconds=float(os.environ.get('ANTHROPIC_P95_WINDOW_SECONDS', '300')),
+    min_samples=int(os.environ.get('ANTHROPIC_P95_MIN_SAMPLES', '20')),
+)
+_downgraded: set[str] = set()
+
+
+def resolve_route(routes: dict[str, ModelRoute], input_json: dict) -> ModelRoute:
+    fortune_key = str(input_json.get('fortune_type_key') or '') if isinstance(input_json, dict) else ''
+    read_type = str(input_json.get('type') or '') if isinstance(input_json, dict) else ''
+    route = routes.get(fortune_key) or routes.get(read_type) or routes['default']
+    if not route.downgrade_model or not route.p95_budget_ms:
+        return route
+
+    p95 = latency.p95(route.model)
+    over_budget = p95 is not None and p95 > route.p95_budget_ms
+    if over_budget != (route.model in _downgraded):
+        if over_budget:
+            _downgraded.add(route.model)
+            logger.warning(
+                'Model %s p95 %sms is over its %sms budget; routing to %s.',
+                route.model,
+                p95,
+                route.p95_budget_ms,
+                route.downgrade_model,
+            )
+        else:
+            _downgraded.discard(route.model)
+            logger.warning('Model %s is back within its latency budget.', route.model)
+    if over_budget:
+        return replace(route, model=route.downgrade_model)
+    return route
+
+
+def routing_stats() -> dict:
+    return {'latency': latency.snapshot(), 'downgraded': sorted(_downgraded)}
@@ -0,0 +1,206 @@
+"""max_tokens and timeout ceilings learned from past output lengths.
+
+Every ANTHROPIC_ADAPTIVE_REFRESH_SECONDS the per-fortune-key distribution of
+output tokens and latency is read from interpretation_call_stats (api calls
+only). Keys without enough usage rows fall back to the length of stored
+interpretation_versions.output_text written by Claude api calls. A route's max_tokens becomes the
+ANTHROPIC_ADAPTIVE_PERCENTILE of output tokens times ANTHROPIC_ADAPTIVE_HEADROOM,
+rounded up to a multiple of 128 so the interpretation cache key stays stable
+between refreshes. Its timeout is derived the same way from the latency of the
+upstream attempt that answered (upstream_latency_ms), so failed attempts and
+retry backoff do not stretch it. Both only ever tighten the configured route.
+
+If a key's share of max_tokens stops goes over ANTHROPIC_MAX_TOKENS_ALERT_RATE,
+a warning is logged and that key goes back to its configured ceiling until
+the rate drops.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+
+from ..db import get_conn
+from .llm_executor import run_llm_sync
+from .model_routing import ModelRoute
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_STEP = 128
+# Japanese output runs at roughly one token per character.
+_TOKENS_PER_CHAR = 1.0
+
+
+@dataclass(frozen=True)
+class KeyLimits:
+    samples: int
+    max_tokens: int | None
+    timeout: float | None
+    max_tokens_rate: float
+
+
+class OutputLimits:
+    def __init__(
+        self,
+        enabled: bool,
+        percentile: float,
+        headroom: float,
+        min_samples: int,
+        days: int,
+        refresh_seconds: float,
+        min_max_tokens: int,
+        min_timeout: float,
+        alert_rate: float,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.days = days
+        self.refresh_seconds = refresh_seconds
+        self.min_max_tokens = min_max_tokens
+        self.min_timeout = min_timeout
+        self.alert_rate = alert_rate
+        self._lock = threading.Lock()
+        self._limits: dict[str, KeyLimits] = {}
+        self._alerting: set[str] = set()
+        self._refreshed_at = 0.0
+        self._refresh_task: asyncio.Future | None = None
+
+    def apply(self, route: ModelRoute, fortune_key: str) -> ModelRoute:
+        if not self.enabled or not fortune_key:
+            return route
+        with self._lock:
+            limits = self._limits.get(fortune_key)
+            alerting = fortune_key in self._alerting
+        if limits is None or alerting:
+            return route
+        changes = {}
+        if limits.max_tokens is not None:
+            changes['max_tokens'] = max(self.min_max_tokens, min(route.max_tokens, limits.max_tokens))
+        if limits.timeout is not None:
+            changes['timeout'] = max(self.min_timeout, min(route.timeout, limits.timeout))
+        return replace(route, **changes) if changes else route
+
+    def refresh_if_stale(self) -> None:
+        """Start a background refresh when the limits are older than refresh_seconds."""
+        if not self.enabled or self._refresh_task is not None:
+            return
+        if time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+        self._refresh_task = asyncio.ensure_future(run_llm_sync(self.refresh))
+        self._refresh_task.add_done_callback(self._refresh_done)
+
+    def refresh(self) -> None:
+        usage, lengths = _load_distributions(self.percentile, self.days)
+        limits: dict[str, KeyLimits] = {}
+        for fortune_key, (samples, output_tokens, latency_samples, latency_ms, max_tokens_stops) in usage.items():
+            if samples < self.min_samples:
+                continue
+            if latency_samples < self.min_samples:
+                latency_ms = None
+            limits[fortune_key] = KeyLimits(
+                samples=samples,
+                max_tokens=self._tokens_ceiling(output_tokens),
+                timeout=round(latency_ms * self.headroom / 1000, 1) if latency_ms is not None else None,
+                max_tokens_rate=round(max_tokens_stops / samples, 4),
+            )
+        for fortune_key, (samples, chars) in lengths.items():
+            if fortune_key in limits or samples < self.min_samples:
+                continue
+            limits[fortune_key] = KeyLimits(
+                samples=samples,
+                max_tokens=self._tokens_ceiling(chars * _TOKENS_PER_CHAR if chars is not None else None),
+                timeout=None,
+                max_tokens_rate=0.0,
+            )
+
+        alerting = {key for key, item in limits.items() if item.max_tokens_rate > self.alert_rate}
+        for fortune_key in sorted(alerting - self._alerting):
+            logger.warning(
+                'max_tokens stop rate for %s is %.1f%% (alert at %.1f%%); using its configured max_tokens.',
+                fortune_key,
+                limits[fortune_key].max_tokens_rate * 100,
+                self.alert_rate * 100,
+            )
+        with self._lock:
+            self._limits = limits
+            self._alerting = alerting
+            self._refreshed_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'alerting': sorted(self._alerting),
+                'keys': {
+                    key: {
+                        'samples': item.samples,
+                        'max_tokens': item.max_tokens,
+                        'timeout': item.timeout,
+                        'max_tokens_rate': item.max_tokens_rate,
+                    }
+                    for key, item in sorted(self._limits.items())
+                },
+            }
+
+    def _tokens_ceiling(self, value: float | None) -> int | None:
+        if value is None:
+            return None
+        return math.ceil(value * self.headroom / _TOKEN_STEP) * _TOKEN_STEP
+
+    def _refresh_done(self, task: asyncio.Future) -> None:
+        self._refresh_task = None
+        if not task.cancelled() and task.exception() is not None:
+            # Keep the previous limits and try again after the next interval.
+            self._refreshed_at = time.monotonic()
+            logger.warning('Refreshing adaptive output limits failed: %s', task.exception())
+
+
+def _load_distributions(percentile: float, days: int) -> tuple[dict, dict]:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'SELECT fortune_key, COUNT(*), '
+                'percentile_cont(%s) WITHIN GROUP (ORDER BY output_tokens), '
+                'COUNT(upstream_latency_ms), '
+                'percentile_cont(%s) WITHIN GROUP (ORDER BY upstream_latency_ms), '
+                "COUNT(*) FILTER (WHERE stop_reason = 'max_tokens') "
+                'FROM interpretation_call_stats '
+                "WHERE source = 'api' AND created_at > now() - %s * interval '1 day' "
+                'GROUP BY fortune_key',
+                (percentile, percentile, days),
+            )
+            usage = {row[0]: row[1:] for row in cur.fetchall()}
+            cur.execute(
+                "SELECT ri.input_json->>'fortune_type_key', COUNT(*), "
+                'percentile_cont(%s) WITHIN GROUP (ORDER BY char_length(iv.output_text)) '
+                'FROM interpretation_versions iv '
+                'JOIN reading_interpretations ri ON ri.reading_id = iv.reading_id '
+                'LEFT JOIN interpretation_call_stats cs ON cs.interpretation_version_id = iv.id '
+                "WHERE iv.created_at > now() - %s * interval '1 day' "
+                # Only text Claude wrote for this call: no template, fallback, cached or pregenerated copies.
+                # Versions from before call stats were recorded count unless they are template rows.
+                "AND (cs.source = 'api' OR (cs.interpretation_version_id IS NULL AND iv.model IS DISTINCT FROM 'template')) "
+                "AND ri.input_json->>'fortune_type_key' IS NOT NULL "
+                'GROUP BY 1',
+                (percentile, days),
+            )
+            lengths = {row[0]: row[1:] for row in cur.fetchall()}
+    return usage, lengths
+
+
+output_limits = OutputLimits(
+    enabled=os.environ.get('ANTHROPIC_ADAPTIVE_LIMITS', 'true').lower() == 'true',
+    percentile=float(os.environ.get('ANTHROPIC_ADAPTIVE_PERCENTILE', '0.99')),
+    headroom=float(os.environ.get('ANTHROPIC_ADAPTIVE_HEADROOM', '1.3')),
+    min_samples=int(os.environ.get('ANTHROPIC_ADAPTIVE_MIN_SAMPLES', '50')),
+    days=int(os.environ.get('ANTHROPIC_ADAPTIVE_DAYS', '7')),
+    refresh_seconds=float(os.environ.get('ANTHROPIC_ADAPTIVE_REFRESH_SECONDS', '600')),
+    min_max_tokens=int(os.environ.get('ANTHROPIC_ADAPTIVE_MIN_MAX_TOKENS', '256')),
+    min_timeout=float(os.environ.get('ANTHROPIC_ADAPTIVE_MIN_TIMEOUT', '10')),
+    alert_rate=float(os.environ.get('ANTHROPIC_MAX_TOKENS_ALERT_RATE', '0.02')),
+)
@@ -0,0 +1,104 @@
+"""Compact storage format for readings.result_json.
+
+generate_reading returns full card dicts, and slots repeat each card. Before
+INSERT, compact_result() replaces every card with its index in its deck
+(FULL_DECK or PARTNER_SEXUAL_DECK), shifted left one bit with the low bit set
+for reversed cards. Slots are dropped when their positions match
+SLOT_POSITIONS. expand_result() rebuilds the original dict at the API edge.
+Rows without the version marker (written before this format) pass through
+unchanged.
+
+    {"v": 2, "d": "f", "o": 1, "type": "hexagram", "c": [86, 13, ...], "seed": ...}
+
+Deck order is part of the format: only ever append to the decks.
+"""
+
+from .decks import FULL_DECK, PARTNER_SEXUAL_DECK
+from .spread_registry import SLOT_POSITIONS
+
+COMPACT_VERSION = 2
+
+_DECKS = {'f': FULL_DECK, 'p': PARTNER_SEXUAL_DECK}
+_INDEX = {deck_id: {card['name']: index for index, card in enumerate(deck)} for deck_id, deck in _DECKS.items()}
+# Which card list the slots are built from, per result type.
+_SLOT_SOURCE = {'today_deep': 'extra_cards'}
+_CARD_LISTS = {'cards': 'c', 'extra_cards': 'x'}
+
+
+def compact_result(result_json: dict) -> dict:
+    """Compact form of a generate_reading result; the result itself if it does not round-trip."""
+    cards = [card for key in _CARD_LISTS for card in result_json.get(key) or []]
+    if result_json.get('base_card'):
+        cards.append(result_json['base_card'])
+    if not cards:
+        return result_json
+    deck_id = 'p' if cards[0].get('arcana') == 'trump' else 'f'
+    oriented = cards[0].get('upright') is not None
+
+    compact = {'v': COMPACT_VERSION, 'd': deck_id, 'o': int(oriented)}
+    try:
+        for key, value in result_json.items():
+            if key in _CARD_LISTS:
+                compact[_CARD_LISTS[key]] = [_encode(card, deck_id, oriented) for card in value]
+            elif key == 'base_card':
+                compact['b'] = _encode(value, deck_id, oriented)
+            elif key == 'slots':
+                positions = [slot.get('position') for slot in value]
+                if positions != _default_positions(result_json.get('type'), len(value)):
+                    compact['p'] = positions
+            else:
+                compact[key] = value
+    except (KeyError, TypeError, ValueError):
+        return result_json
+    if expand_result(compact) != result_json:
+        return result_json
+    return compact
+
+
+def expand_result(result_json):
+    """Full result_json for a stored row; old (uncompacted) rows are returned as is."""
+    if not isinstance(result_json, dict) or result_json.get('v') != COMPACT_VERSION:
+        return result_json
+    deck = _DECKS[result_json['d']]
+    oriented = bool(result_json['o'])
+    expanded = {}
+    for key, value in result_json.items():
+        if key in ('v', 'd', 'o', 'p'):
+            continue
+        if key == 'c':
+            expanded['cards'] = [_decode(code, deck, oriented) for code in value]
+        elif key == 'x':
+            expanded['extra_cards'] = [_decode(code, deck, oriented) for code in value]
+        elif key == 'b':
+            expanded['base_card'] = _decode(value, deck, oriented)
+        else:
+            expanded[key] = value
+    slot_cards = expanded.get(_SLOT_SOURCE.get(expanded.get('type'), 'cards')) or []
+    positions = result_json.get('p') or _default_positions(expanded.get('type'), len(slot_cards))
+    expanded['slots'] = [{'position': position, 'card': card} for position, card in zip(positions, slot_cards)]
+    return expanded
+
+
+def _default_positions(kind: str | None, count: int) -> list[str]:
+    positions = SLOT_POSITIONS.get(kind or '', [])
+    return [positions[idx] if idx < len(positions) else f'位置{idx + 1}' for idx in range(count)]
+
+
+def _encode(card: dict, deck_id: str, oriented: bool) -> int:
+    index = _INDEX[deck_id][card['name']]
+    if not oriented:
+        if card.get('upright') is not None:
+            raise ValueError('mixed orientation')
+        return index
+    if card.get('upright') not in (True, False):
+        raise ValueError('mixed orientation')
+    return index << 1 | (card['upright'] is False)
+
+
+def _decode(code: int, deck: list[dict], oriented: bool) -> dict:
+    base = deck[code >> 1 if oriented else code]
+    card = {'name': base['name'], 'arcana': base['arcana'], 'suit': base.get('suit'), 'rank': base.get('rank')}
+    if base['arcana'] == 'trump':
+        card['asset_name'] = base.get('asset_name')
+    card['upright'] = not code & 1 if oriented else None
+    return card
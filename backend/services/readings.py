@@ -1,60 +1,32 @@
 import hashlib
 import random
+import struct
 from datetime import datetime, timezone
 
-from .partner_sexual import build_partner_profile, build_partner_sexual_deck
-
-MAJOR_ARCANA = [
-    'The Fool',
-    'The Magician',
-    'The High Priestess',
-    'The Empress',
-    'The Emperor',
-    'The Hierophant',
-    'The Lovers',
-    'The Chariot',
-    'Strength',
-    'The Hermit',
-    'Wheel of Fortune',
-    'Justice',
-    'The Hanged Man',
-    'Death',
-    'Temperance',
-    'The Devil',
-    'The Tower',
-    'The Star',
-    'The Moon',
-    'The Sun',
-    'Judgement',
-    'The World',
-]
-
-MINOR_SUITS = ['Wands', 'Cups', 'Swords', 'Pentacles']
-MINOR_RANKS = [
-    'Ace',
-    'Two',
-    'Three',
-    'Four',
-    'Five',
-    'Six',
-    'Seven',
-    'Eight',
-    'Nine',
-    'Ten',
-    'Page',
-    'Knight',
-    'Queen',
-    'King',
-]
-
-MAJOR_DECK = [{'name': name, 'arcana': 'major'} for name in MAJOR_ARCANA]
-MINOR_DECK = [
-    {'name': f'{rank} of {suit}', 'arcana': 'minor', 'suit': suit, 'rank': rank}
-    for suit in MINOR_SUITS
-    for rank in MINOR_RANKS
-]
-FULL_DECK = MAJOR_DECK + MINOR_DECK
-PARTNER_SEXUAL_DECK = build_partner_sexual_deck()
+from ..config import READINGS_SEED_VERSION, READINGS_SEED_VERSION_FROM
+from .partner_sexual import build_partner_profile
+from .spread_registry import Spread, get_spread
+
+# How a seed string becomes a draw, recorded per reading in readings.seed_version.
+# Stored readings replay exactly only through their own version, so never change one; add a new one.
+# services.batch_draws reproduces every version bit for bit.
+#   1: sha256 -> random.Random (MT19937) -> rng.sample, then rng.choice per card
+#   2: blake2b counter blocks -> uint32 words -> partial Fisher-Yates, then one word of orientation bits
+SEED_VERSIONS = (1, 2)
+
+_WORD_RANGE = 1 << 32
+
+
+def seed_version_for(date_str: str | None = None) -> int:
+    """Seed version for a new reading.
+
+    Date-seeded readings switch to READINGS_SEED_VERSION from the seed date
+    READINGS_SEED_VERSION_FROM, so one user's readings on the same date never
+    mix versions (today_deep's base card must stay today_free's card).
+    """
+    if READINGS_SEED_VERSION_FROM and date_str is not None and date_str < READINGS_SEED_VERSION_FROM:
+        return 1
+    return READINGS_SEED_VERSION
 
 
 def _seed_to_int(seed: str) -> int:
@@ -62,6 +34,40 @@ def _seed_to_int(seed: str) -> int:
     return int(digest[:16], 16)
 
 
+class CounterStream:
+    """seed_version 2 generator: uint32 words of blake2b(seed, salt=block number), 16 per block."""
+
+    __slots__ = ('_seed', '_block', '_words', '_position')
+
+    def __init__(self, seed: str):
+        self._seed = seed.encode('utf-8')
+        self._block = 0
+        self._words = _counter_block(self._seed, 0)
+        self._position = 0
+
+    def word(self) -> int:
+        if self._position == 16:
+            self._block += 1
+            self._words = _counter_block(self._seed, self._block)
+            self._position = 0
+        word = self._words[self._position]
+        self._position += 1
+        return word
+
+    def below(self, n: int) -> int:
+        """Uniform in [0, n): rejects the top partial range of a word, then takes it modulo n."""
+        limit = _WORD_RANGE - _WORD_RANGE % n
+        while True:
+            word = self.word()
+            if word < limit:
+                return word % n
+
+
+def _counter_block(seed: bytes, block: int) -> tuple[int, ...]:
+    digest = hashlib.blake2b(seed, digest_size=64, salt=block.to_bytes(16, 'little')).digest()
+    return struct.unpack('<16I', digest)
+
+
 def build_seed(user_id: str, fortune_type_key: str, date_str: str | None = None) -> str:
     if date_str is None:
         date_str = datetime.now(timezone.utc).strftime('%Y-%m-%d')
@@ -77,142 +83,60 @@ def generate_reading(
     fortune_type_key: str,
     input_json: dict | None = None,
     seed_override: str | None = None,
+    seed_version: int | None = None,
 ) -> dict:
+    """Draw a reading. Replaying a stored one needs its seed and seed_version."""
+    spread = get_spread(fortune_type_key)
     base_seed = seed_override or build_seed(user_id, fortune_type_key)
-    base_rng = random.Random(_seed_to_int(base_seed))
-
-    if fortune_type_key.startswith('hexagram_'):
-        cards = _draw_cards(base_rng, 7, major_only=False, include_upright=True)
-        return {
-            'type': 'hexagram',
-            'fortune_type_key': fortune_type_key,
-            'cards': cards,
-            'slots': _make_slots(cards, ['1', '2', '3', '4', '5', '6', '7']),
-            'seed': base_seed,
-        }
-
-    if fortune_type_key.startswith('celtic_'):
-        cards = _draw_cards(base_rng, 10, major_only=False, include_upright=True)
-        return {
-            'type': 'celtic_cross',
-            'fortune_type_key': fortune_type_key,
-            'cards': cards,
-            'slots': _make_slots(cards, ['現状', 'キー', '表層', '過去', '未来', '深層', '総合', '希望と恐れ', '周囲', '立場']),
-            'seed': base_seed,
-        }
-
-    if fortune_type_key == 'flower_timing':
-        cards = _draw_cards(base_rng, 12, major_only=True, include_upright=False)
-        return {
-            'type': 'flower_timing',
-            'fortune_type_key': fortune_type_key,
-            'cards': cards,
-            'slots': _make_slots(cards, [str(i) for i in range(1, 13)]),
-            'seed': base_seed,
-        }
-
-    if fortune_type_key == 'triangle_crime':
-        cards = _draw_cards(base_rng, 3, major_only=False, include_upright=True)
-        return {
-            'type': 'triangle_warning',
-            'fortune_type_key': fortune_type_key,
-            'cards': cards,
-            'slots': _make_slots(cards, ['動機', '機会', '自己正当化']),
-            'seed': base_seed,
-        }
-
-    if fortune_type_key == 'no_desc_draw':
-        cards = _draw_cards(random.SystemRandom(), 2, major_only=False, include_upright=True)
-        return {
-            'type': 'no_desc_draw',
-            'fortune_type_key': fortune_type_key,
-            'cards': cards,
-            'slots': _make_slots(cards, ['カード', 'カード']),
-            'seed': base_seed,
-        }
+    seed_version = seed_version or seed_version_for()
+    if seed_version not in SEED_VERSIONS:
+        raise ValueError(f'unknown seed_version {seed_version}')
 
-    if fortune_type_key == 'compatibility':
-        cards = _draw_cards(random.SystemRandom(), 3, major_only=False, include_upright=True)
-        return {
-            'type': 'compatibility',
-            'fortune_type_key': fortune_type_key,
-            'cards': cards,
-            'slots': _make_slots(cards, ['相手', '相性', '自分']),
-            'seed': base_seed,
-            'input': input_json or {},
-        }
-
-    if fortune_type_key.startswith('today_deep_'):
+    if spread.seed_mode == 'deep':
         deep_seed = f'{base_seed}:{fortune_type_key}'
-        deep_rng = random.Random(_seed_to_int(deep_seed))
-        base_card = _draw_cards(base_rng, 1, major_only=False, include_upright=True)[0]
+        base_card = _draw_cards(_generator(base_seed, seed_version), spread, 1)[0]
         extra_cards = _draw_cards(
-            deep_rng,
-            4,
-            major_only=False,
-            include_upright=True,
-            exclude_names={base_card['name']},
+            _generator(deep_seed, seed_version), spread, spread.card_count, exclude_names={base_card['name']}
         )
         return {
-            'type': 'today_deep',
+            'type': spread.result_type,
             'fortune_type_key': fortune_type_key,
             'base_card': base_card,
             'extra_cards': extra_cards,
-            'slots': _make_slots(extra_cards, ['恋愛', '仕事', '金運', 'トラブル']),
+            'slots': _make_slots(extra_cards, spread.positions),
             'seed': base_seed,
             'deep_seed': deep_seed,
         }
 
-    if fortune_type_key == 'today_free':
-        cards = _draw_cards(base_rng, 1, major_only=False, include_upright=True)
-        return {
-            'type': 'today_free',
-            'fortune_type_key': fortune_type_key,
-            'cards': cards,
-            'slots': _make_slots(cards, ['今日']),
-            'seed': base_seed,
-        }
-
-    if fortune_type_key == 'week_one':
-        cards = _draw_cards(base_rng, 5, major_only=False, include_upright=True)
-        return {
-            'type': 'week_one',
-            'fortune_type_key': fortune_type_key,
-            'cards': cards,
-            'slots': _make_slots(cards, ['総合', '恋愛', '仕事', '金運', 'トラブル']),
-            'seed': base_seed,
-        }
-
-    if fortune_type_key == 'partner_sexual':
-        cards = _draw_custom_cards(base_rng, PARTNER_SEXUAL_DECK, 7, include_upright=True)
-        profile = build_partner_profile(cards)
-        return {
-            'type': 'partner_sexual',
-            'fortune_type_key': fortune_type_key,
-            'cards': cards,
-            'slots': _make_slots(cards, [str(i) for i in range(1, 8)]),
-            'sexual_profile': profile,
-            'seed': base_seed,
-        }
-
-    cards = _draw_cards(base_rng, 1, major_only=False, include_upright=True)
-    return {
-        'type': 'single_draw',
+    rng = random.SystemRandom() if spread.seed_mode == 'random' else _generator(base_seed, seed_version)
+    cards = _draw_cards(rng, spread, spread.card_count)
+    result = {
+        'type': spread.result_type,
         'fortune_type_key': fortune_type_key,
         'cards': cards,
-        'slots': _make_slots(cards, ['カード']),
-        'seed': base_seed,
+        'slots': _make_slots(cards, spread.positions),
     }
+    if spread.result_type == 'partner_sexual':
+        result['sexual_profile'] = build_partner_profile(cards)
+    result['seed'] = base_seed
+    if spread.result_type == 'compatibility':
+        result['input'] = input_json or {}
+    return result
+
+
+def _generator(seed: str, seed_version: int) -> random.Random | CounterStream:
+    if seed_version == 1:
+        return random.Random(_seed_to_int(seed))
+    return CounterStream(seed)
 
 
 def _draw_cards(
-    rng: random.Random,
+    rng: random.Random | CounterStream,
+    spread: Spread,
     count: int,
-    major_only: bool,
-    include_upright: bool,
     exclude_names: set[str] | None = None,
 ) -> list[dict]:
-    deck = MAJOR_DECK if major_only else FULL_DECK
+    deck = spread.cards
     if exclude_names:
         available = [card for card in deck if card['name'] not in exclude_names]
     else:
@@ -221,55 +145,46 @@ def _draw_cards(
     if count > len(available):
         raise ValueError('Requested more cards than available in deck')
 
-    indices = rng.sample(range(len(available)), count)
-    cards = []
-    for idx in indices:
-        base = available[idx]
-        cards.append(
-            {
-                'name': base['name'],
-                'arcana': base['arcana'],
-                'suit': base.get('suit'),
-                'rank': base.get('rank'),
-                'upright': rng.choice([True, False]) if include_upright else None,
-            }
-        )
-    return cards
-
-
-def _draw_custom_cards(
-    rng: random.Random,
-    deck: list[dict],
-    count: int,
-    include_upright: bool,
-    exclude_names: set[str] | None = None,
-) -> list[dict]:
-    if exclude_names:
-        available = [card for card in deck if card['name'] not in exclude_names]
+    if isinstance(rng, CounterStream):
+        indices, orientations = _draw_indices_counter(rng, len(available), count, spread.oriented)
     else:
-        available = list(deck)
-
-    if count > len(available):
-        raise ValueError('Requested more cards than available in deck')
-
-    indices = rng.sample(range(len(available)), count)
-    cards: list[dict] = []
-    for idx in indices:
+        indices = rng.sample(range(len(available)), count)
+        # One choice per card after the sample; part of seed_version 1.
+        orientations = [rng.choice([True, False]) for _ in indices] if spread.oriented else None
+    cards = []
+    for position, idx in enumerate(indices):
         base = available[idx]
-        cards.append(
-            {
-                'name': base['name'],
-                'arcana': base['arcana'],
-                'suit': base.get('suit'),
-                'rank': base.get('rank'),
-                'asset_name': base.get('asset_name'),
-                'upright': rng.choice([True, False]) if include_upright else None,
-            }
-        )
+        card = {
+            'name': base['name'],
+            'arcana': base['arcana'],
+            'suit': base.get('suit'),
+            'rank': base.get('rank'),
+        }
+        if spread.deck == 'partner_sexual':
+            card['asset_name'] = base.get('asset_name')
+        card['upright'] = orientations[position] if orientations is not None else None
+        cards.append(card)
     return cards
 
 
-def _make_slots(cards: list[dict], positions: list[str]) -> list[dict]:
+def _draw_indices_counter(
+    stream: CounterStream, size: int, count: int, oriented: bool
+) -> tuple[list[int], list[bool] | None]:
+    pool = list(range(size))
+    for i in range(count):
+        j = i + stream.below(size - i)
+        pool[i], pool[j] = pool[j], pool[i]
+    if not oriented:
+        return pool[:count], None
+    # Bit i of each word is card i's orientation (set = reversed), 32 cards per word.
+    orientations = []
+    for start in range(0, count, 32):
+        word = stream.word()
+        orientations.extend(not word >> bit & 1 for bit in range(min(32, count - start)))
+    return pool[:count], orientations
+
+
+def _make_slots(cards: list[dict], positions: tuple[str, ...]) -> list[dict]:
     slots = []
     for idx, card in enumerate(cards):
         position = positions[idx] if idx < len(positions) else f'位置{idx + 1}'
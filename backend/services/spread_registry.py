@@ -0,0 +1,211 @@
+"""Spread definitions: what generate_reading draws for each fortune key.
+
+A spread is the deck, card count, major-only and orientation flags, slot
+labels and seed mode of one fortune key. Definitions come from
+fortune_spreads / fortune_spread_slots rows whose result_type is set; every
+other key uses the built-in definition below, which matches the draws from
+before the registry existed. The index is an immutable mapping that is
+swapped whole on reload(), so readers never lock. The API process loads it at
+startup and reloads it every SPREAD_REGISTRY_RELOAD_SECONDS.
+POST /metrics/spreads/reload forces a reload.
+
+Seed modes:
+- seeded: one generator from the reading's seed (per its seed version)
+- deep: today_deep style. A base card comes from the seed, then card_count
+  extra cards come from f'{seed}:{fortune_key}' with the base card excluded.
+- random: random.SystemRandom (not reproducible, never batched or precomputed)
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+
+from ..config import SPREAD_REGISTRY_RELOAD_SECONDS
+from .decks import DECKS, MAJOR_DECK
+
+logger = logging.getLogger(__name__)
+
+SEED_MODES = ('seeded', 'deep', 'random')
+
+# Slot position labels per result type, in draw order. reading_codec also
+# treats these as the default positions of stored results.
+SLOT_POSITIONS = {
+    'hexagram': ['1', '2', '3', '4', '5', '6', '7'],
+    'celtic_cross': ['現状', 'キー', '表層', '過去', '未来', '深層', '総合', '希望と恐れ', '周囲', '立場'],
+    'flower_timing': [str(i) for i in range(1, 13)],
+    'triangle_warning': ['動機', '機会', '自己正当化'],
+    'no_desc_draw': ['カード', 'カード'],
+    'compatibility': ['相手', '相性', '自分'],
+    'today_deep': ['恋愛', '仕事', '金運', 'トラブル'],
+    'today_free': ['今日'],
+    'week_one': ['総合', '恋愛', '仕事', '金運', 'トラブル'],
+    'partner_sexual': [str(i) for i in range(1, 8)],
+    'single_draw': ['カード'],
+}
+
+
+@dataclass(frozen=True)
+class Spread:
+    fortune_key: str
+    result_type: str
+    deck: str
+    major_only: bool
+    card_count: int
+    oriented: bool
+    seed_mode: str
+    positions: tuple[str, ...]
+    source: str = 'builtin'
+
+    @property
+    def cards(self) -> list[dict]:
+        return MAJOR_DECK if self.major_only else DECKS[self.deck]
+
+    @property
+    def fingerprint(self) -> str:
+        """Everything a draw's card codes depend on besides the seed (daily_draws.spread_fingerprint)."""
+        return f'{self.deck}:{int(self.major_only)}:{self.card_count}:{int(self.oriented)}:{self.seed_mode}'
+
+
+def _builtin(fortune_key: str, result_type: str, count: int, **options) -> Spread:
+    return Spread(
+        fortune_key=fortune_key,
+        result_type=result_type,
+        deck=options.get('deck', 'tarot'),
+        major_only=options.get('major_only', False),
+        card_count=count,
+        oriented=options.get('oriented', True),
+        seed_mode=options.get('seed_mode', 'seeded'),
+        positions=tuple(SLOT_POSITIONS[result_type]),
+    )
+
+
+# Built-in definitions by key prefix (exact keys first), for keys without a configured row.
+_BUILTIN_RULES = (
+    ('no_desc_draw', lambda key: _builtin(key, 'no_desc_draw', 2, seed_mode='random')),
+    ('compatibility', lambda key: _builtin(key, 'compatibility', 3, seed_mode='random')),
+    ('flower_timing', lambda key: _builtin(key, 'flower_timing', 12, major_only=True, oriented=False)),
+    ('triangle_crime', lambda key: _builtin(key, 'triangle_warning', 3)),
+    ('today_free', lambda key: _builtin(key, 'today_free', 1)),
+    ('week_one', lambda key: _builtin(key, 'week_one', 5)),
+    ('partner_sexual', lambda key: _builtin(key, 'partner_sexual', 7, deck='partner_sexual')),
+    ('hexagram_', lambda key: _builtin(key, 'hexagram', 7)),
+    ('celtic_', lambda key: _builtin(key, 'celtic_cross', 10)),
+    ('today_deep_', lambda key: _builtin(key, 'today_deep', 4, seed_mode='deep')),
+)
+
+
+@lru_cache(maxsize=1024)
+def builtin_spread(fortune_key: str) -> Spread:
+    for prefix, build in _BUILTIN_RULES:
+        if fortune_key == prefix or (prefix.endswith('_') and fortune_key.startswith(prefix)):
+            return build(fortune_key)
+    return _builtin(fortune_key, 'single_draw', 1)
+
+
+class SpreadRegistry:
+    def __init__(self, reload_seconds: float):
+        self.reload_seconds = reload_seconds
+        self._index: MappingProxyType = MappingProxyType({})
+        self._loaded_at: float | None = None
+        self._rejected: dict[str, str] = {}
+        self._reloader: threading.Thread | None = None
+        self._get_conn = None
+
+    def get(self, fortune_key: str) -> Spread:
+        return self._index.get(fortune_key) or builtin_spread(fortune_key)
+
+    def reload(self, cur) -> int:
+        """Rebuild the index from the database; returns the number of configured spreads."""
+        cur.execute(
+            'SELECT ft.key, fs.result_type, fs.deck, fs.major_only, fs.card_count, fs.oriented, fs.seed_mode, '
+            'COALESCE(array_agg(s.position_label ORDER BY s.slot_index) FILTER (WHERE s.id IS NOT NULL), ARRAY[]::text[]) '
+            'FROM fortune_spreads fs '
+            'JOIN fortune_types ft ON ft.id = fs.fortune_type_id '
+            'LEFT JOIN fortune_spread_slots s ON s.spread_id = fs.id '
+            'WHERE fs.result_type IS NOT NULL '
+            'GROUP BY ft.key, fs.id'
+        )
+        index: dict[str, Spread] = {}
+        rejected: dict[str, str] = {}
+        for fortune_key, result_type, deck, major_only, card_count, oriented, seed_mode, positions in cur.fetchall():
+            spread = Spread(
+                fortune_key=fortune_key,
+                result_type=result_type,
+                deck=deck,
+                major_only=bool(major_only),
+                card_count=card_count,
+                oriented=bool(oriented),
+                seed_mode=seed_mode,
+                positions=tuple(positions),
+                source='db',
+            )
+            problem = _validate(spread)
+            if problem:
+                rejected[fortune_key] = problem
+                continue
+            index[fortune_key] = spread
+        for fortune_key in sorted(rejected.keys() - self._rejected.keys()):
+            logger.warning('Ignoring spread for %s (%s); using the built-in definition.', fortune_key, rejected[fortune_key])
+        self._index = MappingProxyType(index)
+        self._rejected = rejected
+        self._loaded_at = time.time()
+        return len(index)
+
+    def start_reloader(self, get_conn) -> None:
+        """Load now, then reload every reload_seconds in a daemon thread.
+
+        get_conn is passed in rather than imported so that importing readings
+        (e.g. in the daily draw pool processes) never opens the app's pool.
+        """
+        self._get_conn = get_conn
+        self._safe_reload()
+        if self.reload_seconds <= 0 or self._reloader is not None:
+            return
+        self._reloader = threading.Thread(target=self._reload_loop, name='spread-registry', daemon=True)
+        self._reloader.start()
+
+    def snapshot(self) -> dict:
+        index = self._index
+        return {
+            'configured': sorted(index),
+            'rejected': dict(self._rejected),
+            'loaded_at': self._loaded_at,
+            'reload_seconds': self.reload_seconds,
+        }
+
+    def _reload_loop(self) -> None:
+        while True:
+            time.sleep(self.reload_seconds)
+            self._safe_reload()
+
+    def _safe_reload(self) -> None:
+        try:
+            with self._get_conn() as conn:
+                with conn.cursor() as cur:
+                    self.reload(cur)
+        except Exception:
+            # Keep serving the previous index (or the built-ins) until the next attempt.
+            logger.exception('Spread registry reload failed')
+
+
+def _validate(spread: Spread) -> str | None:
+    if spread.deck not in DECKS:
+        return f'unknown deck {spread.deck!r}'
+    if spread.seed_mode not in SEED_MODES:
+        return f'unknown seed_mode {spread.seed_mode!r}'
+    if spread.major_only and spread.deck != 'tarot':
+        return 'major_only needs the tarot deck'
+    available = len(spread.cards) - (1 if spread.seed_mode == 'deep' else 0)
+    if not 1 <= spread.card_count <= available:
+        return f'card_count {spread.card_count} outside 1..{available}'
+    return None
+
+
+spread_registry = SpreadRegistry(SPREAD_REGISTRY_RELOAD_SECONDS)
+
+
+def get_spread(fortune_key: str) -> Spread:
+    return spread_registry.get(fortune_key)
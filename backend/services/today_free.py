@@ -0,0 +1,65 @@
+from datetime import date, datetime, timedelta, timezone
+
+from ..db import get_conn
+from .interpretation_prompt import build_prompt
+
+
+def window_date(at: datetime | None = None) -> date:
+    """JST date of the daily window (reset at 05:00 JST) containing `at`."""
+    at = at or datetime.now(timezone.utc)
+    return (at.astimezone(timezone.utc) + timedelta(hours=9) - timedelta(hours=5)).date()
+
+
+def find_pregenerated(input_json: dict) -> tuple[str, str, str] | None:
+    """Return (prompt, output_text, model) when today's table has this exact prompt."""
+    if not isinstance(input_json, dict) or input_json.get('fortune_type_key') != 'today_free':
+        return None
+    cards = [card for card in input_json.get('cards') or [] if isinstance(card, dict)]
+    if len(cards) != 1 or not cards[0].get('card_name') or cards[0].get('upright') is None:
+        return None
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'SELECT prompt, output_text, model FROM today_free_interpretations '
+                'WHERE window_date = %s AND card_name = %s AND upright = %s',
+                (window_date(), cards[0]['card_name'], bool(cards[0]['upright'])),
+            )
+            row = cur.fetchone()
+    # A question, context or different card meanings change the prompt; only
+    # serve the pregenerated text when it was produced from the same prompt.
+    if not row or row[0] != build_prompt(input_json):
+        return None
+    return row[0], row[1], row[2]
+
+
+def existing_pregenerated(target: date) -> set[tuple[str, bool]]:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'SELECT card_name, upright FROM today_free_interpretations WHERE window_date = %s',
+                (target,),
+            )
+            return {(row[0], row[1]) for row in cur.fetchall()}
+
+
+def save_pregenerated(target: date, card_name: str, upright: bool, prompt: str, output_text: str, model: str) -> None:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'INSERT INTO today_free_interpretations (window_date, card_name, upright, prompt, output_text, model) '
+                'VALUES (%s, %s, %s, %s, %s, %s) '
+                'ON CONFLICT (window_date, card_name, upright) DO UPDATE SET '
+                'prompt = EXCLUDED.prompt, output_text = EXCLUDED.output_text, model = EXCLUDED.model, created_at = now()',
+                (target, card_name, upright, prompt, output_text, model),
+            )
+            conn.commit()
+
+
+def prune_pregenerated(keep_from: date) -> int:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute('DELETE FROM today_free_interpretations WHERE window_date < %s', (keep_from,))
+            deleted = cur.rowcount
+            conn.commit()
+    return deleted
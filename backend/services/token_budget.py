@@ -0,0 +1,96 @@
+"""Daily Claude token budgets per user and across the service.
+
+Usage is kept in interpretation_token_usage, shared by every worker and
+incremented by ClaudeClient when each Anthropic call finishes or is
+cancelled, whether or not a version is stored (cancelled streams, hedge
+duplicates, interrupted calls). The budget is checked before a generation starts, so concurrent calls can
+overshoot it by what they spend; once over, ClaudeClient serves a cached or
+template interpretation instead of calling Anthropic.
+"""
+
+import threading
+
+from ..config import (
+    ADMIN_USER_IDS,
+    DISABLE_INTERPRETATION_LIMITS,
+    INTERPRETATION_GLOBAL_DAILY_TOKENS,
+    INTERPRETATION_USER_DAILY_TOKENS,
+)
+from ..db import get_conn
+
+GLOBAL_SCOPE = 'global'
+# Budget day in JST with the same 05:00 reset as the daily fortunes.
+_BUDGET_DAY_SQL = "((now() AT TIME ZONE 'Asia/Tokyo') - interval '5 hours')::date"
+
+_lock = threading.Lock()
+_stats = {'checked': 0, 'over_user_budget': 0, 'over_global_budget': 0}
+
+
+def over_budget(reading_id: str) -> bool:
+    """True if the reading's owner, or the service as a whole, spent today's budget."""
+    if DISABLE_INTERPRETATION_LIMITS or not (INTERPRETATION_USER_DAILY_TOKENS or INTERPRETATION_GLOBAL_DAILY_TOKENS):
+        return False
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT user_id::text FROM readings WHERE id = %s', (reading_id,))
+            row = cur.fetchone()
+            user_id = row[0] if row else None
+            cur.execute(
+                f'SELECT scope, tokens FROM interpretation_token_usage WHERE day = {_BUDGET_DAY_SQL} AND scope IN (%s, %s)',
+                (GLOBAL_SCOPE, user_id or GLOBAL_SCOPE),
+            )
+            spent = dict(cur.fetchall())
+
+    over_global = bool(INTERPRETATION_GLOBAL_DAILY_TOKENS) and spent.get(GLOBAL_SCOPE, 0) >= INTERPRETATION_GLOBAL_DAILY_TOKENS
+    over_user = (
+        bool(INTERPRETATION_USER_DAILY_TOKENS)
+        and user_id is not None
+        and user_id not in ADMIN_USER_IDS
+        and spent.get(user_id, 0) >= INTERPRETATION_USER_DAILY_TOKENS
+    )
+    with _lock:
+        _stats['checked'] += 1
+        _stats['over_global_budget'] += int(over_global)
+        _stats['over_user_budget'] += int(over_user and not over_global)
+    return over_global or over_user
+
+
+def charge_tokens(reading_id: str, tokens: int) -> None:
+    """Add a call's billed tokens to today's global and per-user usage (cache reads are not counted)."""
+    if tokens <= 0:
+        return
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT user_id::text FROM readings WHERE id = %s', (reading_id,))
+            row = cur.fetchone()
+            scopes = [GLOBAL_SCOPE] + ([row[0]] if row else [])
+            for scope in scopes:
+                cur.execute(
+                    'INSERT INTO interpretation_token_usage (day, scope, tokens) '
+                    f'VALUES ({_BUDGET_DAY_SQL}, %s, %s) '
+                    'ON CONFLICT (day, scope) DO UPDATE '
+                    'SET tokens = interpretation_token_usage.tokens + EXCLUDED.tokens, updated_at = now()',
+                    (scope, tokens),
+                )
+            conn.commit()
+
+
+def budget_stats() -> dict:
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                'SELECT COALESCE(SUM(tokens) FILTER (WHERE scope = %s), 0), '
+                'COUNT(*) FILTER (WHERE scope <> %s AND tokens >= %s) '
+                f'FROM interpretation_token_usage WHERE day = {_BUDGET_DAY_SQL}',
+                (GLOBAL_SCOPE, GLOBAL_SCOPE, INTERPRETATION_USER_DAILY_TOKENS or None),
+            )
+            global_tokens, users_over = cur.fetchone()
+    with _lock:
+        checks = dict(_stats)
+    return {
+        'global_tokens_today': int(global_tokens),
+        'global_daily_limit': INTERPRETATION_GLOBAL_DAILY_TOKENS,
+        'user_daily_limit': INTERPRETATION_USER_DAILY_TOKENS,
+        'users_over_budget_today': int(users_over or 0),
+        **checks,
+    }
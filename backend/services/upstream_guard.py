@@ -0,0 +1,274 @@
+"""Per-worker protection for Anthropic calls.
+
+CircuitBreaker stops calling Anthropic while it is failing (sustained
+429/5xx/timeouts) so requests get the fallback immediately instead of burning
+retries. ConcurrencyLimiter caps outstanding upstream calls with an AIMD limit:
++1/limit per success, halved on overload signals. HedgeBudget bounds how many
+duplicate (hedged) requests ClaudeClient may fire.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_STATUSES = frozenset({408, 429, 500, 502, 503, 504, 529})
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised instead of calling Anthropic when the breaker is open or no slot is free."""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window_seconds: float,
+        min_calls: int,
+        failure_rate: float,
+        open_seconds: float,
+    ):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._state = 'closed'
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {'opened': 0, 'short_circuited': 0}
+
+    def allow(self) -> bool:
+        """Return False while open; after open_seconds one probe call is let through."""
+        with self._lock:
+            if self._state == 'closed':
+                return True
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._state = 'half_open'
+            if self._state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._stats['short_circuited'] += 1
+            return False
+
+    def record(self, success: bool | None) -> None:
+        """Record one call outcome; None means it told us nothing (e.g. cancelled)."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == 'half_open':
+                self._probe_in_flight = False
+                if success is None:
+                    return
+                if success:
+                    logger.warning('Anthropic circuit breaker closed after a successful probe.')
+                    self._state = 'closed'
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                return
+            if self._state == 'open' or success is None:
+                return
+            self._outcomes.append((now, success))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._open(now)
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._state == 'open' and time.monotonic() - self._opened_at < self.open_seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'state': self._state, 'window_calls': len(self._outcomes), **self._stats}
+
+    def _open(self, now: float) -> None:
+        logger.warning('Anthropic circuit breaker opened for %ss.', self.open_seconds)
+        self._state = 'open'
+        self._opened_at = now
+        self._outcomes.clear()
+        self._stats['opened'] += 1
+
+
+class ConcurrencyLimiter:
+    def __init__(self, initial: float, minimum: float, maximum: float, wait_seconds: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.wait_seconds = wait_seconds
+        self._limit = max(minimum, min(maximum, initial))
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self._stats = {'acquired': 0, 'rejected': 0, 'decreases': 0}
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; False if none freed up within wait_seconds."""
+        if self._in_flight < int(self._limit) and not self._waiters:
+            self._in_flight += 1
+            self._stats['acquired'] += 1
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended; pass it on.
+                self._in_flight -= 1
+                self._wake()
+            else:
+                waiter.cancel()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            self._stats['rejected'] += 1
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self._stats['acquired'] += 1
+        return True
+
+    def release(self, overloaded: bool | None) -> None:
+        self._in_flight -= 1
+        now = time.monotonic()
+        if overloaded:
+            # At most one multiplicative decrease per second so a burst of
+            # failures from the same episode does not collapse the limit.
+            if now - self._last_decrease >= 1.0:
+                self._limit = max(self.minimum, self._limit / 2)
+                self._last_decrease = now
+                self._stats['decreases'] += 1
+        elif overloaded is not None:
+            self._limit = min(self.maximum, self._limit + 1 / self._limit)
+        self._wake()
+
+    def is_saturated(self) -> bool:
+        return bool(self._waiters) and self._in_flight >= int(self._limit)
+
+    def snapshot(self) -> dict:
+        return {
+            'limit': round(self._limit, 2),
+            'in_flight': self._in_flight,
+            'waiting': len(self._waiters),
+            **self._stats,
+        }
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < int(self._limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            waiter.set_result(None)
+
+
+class HedgeBudget:
+    """Caps hedged (duplicate) requests at max_rate of eligible requests over a rolling window."""
+
+    def __init__(self, max_rate: float, window_seconds: float):
+        self.max_rate = max_rate
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._requests: deque[float] = deque()
+        self._hedges: deque[float] = deque()
+        self._stats = {'eligible': 0, 'hedged': 0, 'hedge_wins': 0, 'denied': 0}
+
+    def note_request(self) -> None:
+        with self._lock:
+            self._requests.append(time.monotonic())
+            self._stats['eligible'] += 1
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            for events in (self._requests, self._hedges):
+                while events and now - events[0] > self.window_seconds:
+                    events.popleft()
+            if len(self._hedges) + 1 > self.max_rate * len(self._requests):
+                self._stats['denied'] += 1
+                return False
+            self._hedges.append(now)
+            self._stats['hedged'] += 1
+            return True
+
+    def note_win(self) -> None:
+        with self._lock:
+            self._stats['hedge_wins'] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+breaker = CircuitBreaker(
+    window_seconds=float(os.environ.get('ANTHROPIC_BREAKER_WINDOW_SECONDS', '30')),
+    min_calls=int(os.environ.get('ANTHROPIC_BREAKER_MIN_CALLS', '10')),
+    failure_rate=float(os.environ.get('ANTHROPIC_BREAKER_FAILURE_RATE', '0.5')),
+    open_seconds=float(os.environ.get('ANTHROPIC_BREAKER_OPEN_SECONDS', '30')),
+)
+
+limiter = ConcurrencyLimiter(
+    initial=float(os.environ.get('ANTHROPIC_CONCURRENCY_INITIAL', '16')),
+    minimum=float(os.environ.get('ANTHROPIC_CONCURRENCY_MIN', '2')),
+    maximum=float(os.environ.get('ANTHROPIC_CONCURRENCY_MAX', '64')),
+    wait_seconds=float(os.environ.get('ANTHROPIC_CONCURRENCY_WAIT_SECONDS', '10')),
+)
+
+hedge_budget = HedgeBudget(
+    max_rate=float(os.environ.get('ANTHROPIC_HEDGE_MAX_RATE', '0.1')),
+    window_seconds=float(os.environ.get('ANTHROPIC_HEDGE_WINDOW_SECONDS', '60')),
+)
+
+
+class CallSlot:
+    def __init__(self):
+        self.overloaded: bool | None = None
+
+    def observe(self, status_code: int) -> None:
+        self.overloaded = status_code in OVERLOAD_STATUSES
+
+
+@asynccontextmanager
+async def guarded_call() -> AsyncIterator[CallSlot]:
+    """Hold a limiter slot for one upstream attempt and feed its outcome back.
+
+    The caller reports the HTTP status with slot.observe(); timeouts and
+    connection errors count as overload.
+    """
+    if not await limiter.acquire():
+        raise UpstreamUnavailable('no Anthropic concurrency slot became free')
+    if not breaker.allow():
+        limiter.release(None)
+        raise UpstreamUnavailable('Anthropic circuit breaker is open')
+    slot = CallSlot()
+    try:
+        yield slot
+    except (httpx.TimeoutException, httpx.TransportError):
+        slot.overloaded = True
+        raise
+    finally:
+        limiter.release(slot.overloaded)
+        breaker.record(None if slot.overloaded is None else not slot.overloaded)
+
+
+def under_load() -> bool:
+    """True while the breaker is open or callers are already queueing for a slot."""
+    return breaker.is_open() or limiter.is_saturated()
+
+
+def upstream_stats() -> dict:
+    return {
+        'circuit_breaker': breaker.snapshot(),
+        'concurrency': limiter.snapshot(),
+        'hedging': hedge_budget.snapshot(),
+    }
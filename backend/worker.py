@@ -0,0 +1,88 @@
+"""Interpretation job worker.
+
+Run separately from the API so slow Claude calls never hold request threads:
+
+    python -m backend.worker --concurrency 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+
+from .config import INTERPRETATION_WORKER_CONCURRENCY, INTERPRETATION_WORKER_POLL_SECONDS
+from .services.claude import close_http_client
+from .services.interpretation_jobs import claim_job, complete_job, fail_job
+from .services.interpretation_prefetch import prefetched_interpretation
+from .services.interpretations import generate_and_store, load_generation_input, single_flight
+
+logger = logging.getLogger('backend.worker')
+
+
+async def run_job(job: dict) -> int | None:
+    loaded = await asyncio.to_thread(load_generation_input, job['reading_id'], job['user_id'])
+    if loaded is None:
+        raise LookupError('Interpretation input not found')
+    input_json, existing_today = loaded
+    if existing_today:
+        return existing_today['version']
+    # The client may have generated a prefetched reading itself before this job ran.
+    prefetched = await asyncio.to_thread(prefetched_interpretation, job['reading_id'])
+    if prefetched:
+        return prefetched['version']
+    result = await single_flight(
+        job['reading_id'], lambda: generate_and_store(job['reading_id'], input_json, store_fallback=False)
+    )
+    if result.get('fallback'):
+        # Anthropic failed: leave no template version behind and let fail_job retry or dead-letter.
+        raise RuntimeError('Anthropic call failed; fallback text was not stored')
+    return result['version']
+
+
+async def _work_loop(worker_id: str, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        job = await asyncio.to_thread(claim_job, worker_id)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=INTERPRETATION_WORKER_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        try:
+            version = await run_job(job)
+        except Exception as exc:
+            status = await asyncio.to_thread(fail_job, job, f'{type(exc).__name__}: {exc}')
+            logger.exception('Interpretation job %s failed (attempt %s, now %s)', job['id'], job['attempts'], status)
+            continue
+        await asyncio.to_thread(complete_job, job['id'], version)
+        logger.info('Interpretation job %s succeeded version=%s', job['id'], version)
+
+
+async def run_worker(concurrency: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    base_id = f'{socket.gethostname()}:{os.getpid()}'
+    try:
+        await asyncio.gather(*(_work_loop(f'{base_id}:{i}', stop) for i in range(concurrency)))
+    finally:
+        await close_http_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run interpretation job workers.')
+    parser.add_argument('--concurrency', type=int, default=INTERPRETATION_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    asyncio.run(run_worker(max(1, args.concurrency)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+BEGIN;
+
+CREATE TABLE interpretation_cache (
+  cache_key text PRIMARY KEY,
+  model text NOT NULL,
+  max_tokens int NOT NULL,
+  output_text text NOT NULL,
+  hit_count int NOT NULL DEFAULT 0,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  last_hit_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX interpretation_cache_last_hit_at_idx ON interpretation_cache (last_hit_at);
+CREATE INDEX interpretation_cache_created_at_idx ON interpretation_cache (created_at);
+
+COMMIT;
@@ -0,0 +1,11 @@
+BEGIN;
+
+-- One row per reading whose interpretation is currently being generated.
+-- Concurrent /interpretations/generate calls wait on the holder instead of
+-- calling Claude again; rows older than the lease are taken over.
+CREATE TABLE interpretation_inflight (
+  reading_id uuid PRIMARY KEY REFERENCES readings(id),
+  started_at timestamptz NOT NULL DEFAULT now()
+);
+
+COMMIT;
@@ -0,0 +1,24 @@
+BEGIN;
+
+-- status: queued -> running -> succeeded | dead (retries go back to queued)
+CREATE TABLE interpretation_jobs (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  reading_id uuid NOT NULL REFERENCES readings(id),
+  user_id uuid NOT NULL REFERENCES users(id),
+  status text NOT NULL DEFAULT 'queued',
+  attempts int NOT NULL DEFAULT 0,
+  max_attempts int NOT NULL,
+  run_after timestamptz NOT NULL DEFAULT now(),
+  locked_at timestamptz,
+  locked_by text,
+  last_error text,
+  result_version int,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX interpretation_jobs_claim_idx ON interpretation_jobs (run_after) WHERE status IN ('queued', 'running');
+CREATE INDEX interpretation_jobs_reading_id_idx ON interpretation_jobs (reading_id, created_at);
+CREATE INDEX interpretation_jobs_dead_idx ON interpretation_jobs (updated_at) WHERE status = 'dead';
+
+COMMIT;
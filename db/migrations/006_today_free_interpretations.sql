@@ -0,0 +1,16 @@
+BEGIN;
+
+-- Pregenerated today_free interpretations: one per card and orientation
+-- (78 x 2) for each daily window, keyed by the JST date of the window.
+CREATE TABLE today_free_interpretations (
+  window_date date NOT NULL,
+  card_name text NOT NULL,
+  upright boolean NOT NULL,
+  prompt text NOT NULL,
+  output_text text NOT NULL,
+  model text NOT NULL,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (window_date, card_name, upright)
+);
+
+COMMIT;
@@ -0,0 +1,26 @@
+BEGIN;
+
+-- Per-call accounting for stored interpretation versions: where the text came
+-- from (api, cache, fallback, pregenerated, batch), token usage, upstream
+-- latency and the stop reason Anthropic reported.
+CREATE TABLE interpretation_call_stats (
+  interpretation_version_id uuid PRIMARY KEY REFERENCES interpretation_versions(id) ON DELETE CASCADE,
+  reading_id uuid NOT NULL REFERENCES readings(id),
+  fortune_key text NOT NULL DEFAULT '',
+  model text NOT NULL,
+  source text NOT NULL,
+  input_tokens int NOT NULL DEFAULT 0,
+  output_tokens int NOT NULL DEFAULT 0,
+  cache_creation_input_tokens int NOT NULL DEFAULT 0,
+  cache_read_input_tokens int NOT NULL DEFAULT 0,
+  latency_ms int NOT NULL DEFAULT 0,
+  first_token_ms int,
+  attempts int NOT NULL DEFAULT 0,
+  stop_reason text,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX interpretation_call_stats_fortune_key_idx ON interpretation_call_stats (fortune_key, created_at);
+CREATE INDEX interpretation_call_stats_model_idx ON interpretation_call_stats (model, created_at);
+
+COMMIT;
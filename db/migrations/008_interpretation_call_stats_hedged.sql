@@ -0,0 +1,6 @@
+BEGIN;
+
+-- Whether a duplicate (hedged) request was fired for this call.
+ALTER TABLE interpretation_call_stats ADD COLUMN hedged boolean NOT NULL DEFAULT false;
+
+COMMIT;
@@ -0,0 +1,13 @@
+BEGIN;
+
+-- Claude tokens spent per budget day (05:00 JST reset). scope is 'global' or
+-- a user id; rows are incremented atomically as interpretations are stored.
+CREATE TABLE interpretation_token_usage (
+  day date NOT NULL,
+  scope text NOT NULL,
+  tokens bigint NOT NULL DEFAULT 0,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (day, scope)
+);
+
+COMMIT;
@@ -0,0 +1,15 @@
+BEGIN;
+
+-- Interpretations enqueued speculatively by /readings/execute. requested_at is
+-- set the first time the client asks for the interpretation, so prefetches
+-- with requested_at NULL are wasted spend.
+CREATE TABLE interpretation_prefetches (
+  reading_id uuid PRIMARY KEY REFERENCES readings(id),
+  fortune_key text NOT NULL,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  requested_at timestamptz
+);
+
+CREATE INDEX interpretation_prefetches_created_at_idx ON interpretation_prefetches (created_at);
+
+COMMIT;
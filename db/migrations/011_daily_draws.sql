@@ -0,0 +1,19 @@
+BEGIN;
+
+-- Deterministic daily draws (today_*, week_one) computed ahead of the 05:00 JST
+-- reset by backend.jobs.precompute_daily_draws. draw_date is the UTC date that
+-- build_seed puts in the seed; cards holds deck index << 1 | reversed in draw
+-- order (today_deep_*: base card first).
+CREATE TABLE daily_draws (
+  user_id uuid NOT NULL,
+  draw_date date NOT NULL,
+  fortune_key text NOT NULL,
+  algorithm_version smallint NOT NULL,
+  cards smallint[] NOT NULL,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (user_id, draw_date, fortune_key)
+);
+
+CREATE INDEX daily_draws_draw_date_idx ON daily_draws (draw_date);
+
+COMMIT;
@@ -0,0 +1,71 @@
+BEGIN;
+
+-- Draw definitions for the spread registry (backend/services/spread_registry.py).
+-- Spreads with result_type NULL keep using the built-in definition of their
+-- fortune key, so rows inserted by older seeds keep working unchanged.
+ALTER TABLE fortune_spreads
+  ADD COLUMN result_type text,
+  ADD COLUMN deck text NOT NULL DEFAULT 'tarot' CHECK (deck IN ('tarot', 'partner_sexual')),
+  ADD COLUMN major_only boolean NOT NULL DEFAULT false,
+  ADD COLUMN card_count int NOT NULL DEFAULT 1 CHECK (card_count > 0),
+  ADD COLUMN oriented boolean NOT NULL DEFAULT true,
+  ADD COLUMN seed_mode text NOT NULL DEFAULT 'seeded' CHECK (seed_mode IN ('seeded', 'deep', 'random'));
+
+-- The seed has no unique key, so re-running it duplicated spreads. The copies are
+-- identical and the table has no creation time, so any one row per fortune type is kept.
+CREATE TEMP TABLE duplicate_spreads ON COMMIT DROP AS
+SELECT id FROM (
+  SELECT id, row_number() OVER (PARTITION BY fortune_type_id ORDER BY id) AS rn FROM fortune_spreads
+) ranked
+WHERE rn > 1;
+DELETE FROM fortune_spread_slots WHERE spread_id IN (SELECT id FROM duplicate_spreads);
+DELETE FROM fortune_spreads WHERE id IN (SELECT id FROM duplicate_spreads);
+CREATE UNIQUE INDEX fortune_spreads_fortune_type_id_key ON fortune_spreads (fortune_type_id);
+
+-- Configure the existing spreads exactly as generate_reading drew them before the registry.
+UPDATE fortune_spreads fs
+SET result_type = d.result_type, deck = d.deck, major_only = d.major_only,
+    card_count = d.card_count, oriented = d.oriented, seed_mode = d.seed_mode
+FROM fortune_types ft,
+  (VALUES
+    ('today_free', 'today_free', 'tarot', false, 1, true, 'seeded'),
+    ('today_deep_love', 'today_deep', 'tarot', false, 4, true, 'deep'),
+    ('today_deep_work', 'today_deep', 'tarot', false, 4, true, 'deep'),
+    ('today_deep_money', 'today_deep', 'tarot', false, 4, true, 'deep'),
+    ('today_deep_trouble', 'today_deep', 'tarot', false, 4, true, 'deep'),
+    ('week_one', 'week_one', 'tarot', false, 5, true, 'seeded'),
+    ('compatibility', 'compatibility', 'tarot', false, 3, true, 'random'),
+    ('no_desc_draw', 'no_desc_draw', 'tarot', false, 2, true, 'random'),
+    ('hexagram_love', 'hexagram', 'tarot', false, 7, true, 'seeded'),
+    ('hexagram_reunion', 'hexagram', 'tarot', false, 7, true, 'seeded'),
+    ('hexagram_unreq', 'hexagram', 'tarot', false, 7, true, 'seeded'),
+    ('hexagram_marriage', 'hexagram', 'tarot', false, 7, true, 'seeded'),
+    ('celtic_work', 'celtic_cross', 'tarot', false, 10, true, 'seeded'),
+    ('celtic_startup', 'celtic_cross', 'tarot', false, 10, true, 'seeded'),
+    ('celtic_job', 'celtic_cross', 'tarot', false, 10, true, 'seeded'),
+    ('flower_timing', 'flower_timing', 'tarot', true, 12, false, 'seeded'),
+    ('triangle_crime', 'triangle_warning', 'tarot', false, 3, true, 'seeded'),
+    ('partner_sexual', 'partner_sexual', 'partner_sexual', false, 7, true, 'seeded')
+  ) AS d (fortune_key, result_type, deck, major_only, card_count, oriented, seed_mode)
+WHERE ft.id = fs.fortune_type_id AND ft.key = d.fortune_key;
+
+-- Slot labels as the API has always returned them (the seeded labels were never used).
+DELETE FROM fortune_spread_slots WHERE spread_id IN (SELECT id FROM fortune_spreads WHERE result_type IS NOT NULL);
+INSERT INTO fortune_spread_slots (spread_id, slot_index, position_label)
+SELECT fs.id, labels.slot_index, labels.position_label
+FROM fortune_spreads fs
+JOIN (VALUES
+    ('hexagram', ARRAY['1', '2', '3', '4', '5', '6', '7']),
+    ('celtic_cross', ARRAY['現状', 'キー', '表層', '過去', '未来', '深層', '総合', '希望と恐れ', '周囲', '立場']),
+    ('flower_timing', ARRAY['1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12']),
+    ('triangle_warning', ARRAY['動機', '機会', '自己正当化']),
+    ('no_desc_draw', ARRAY['カード', 'カード']),
+    ('compatibility', ARRAY['相手', '相性', '自分']),
+    ('today_deep', ARRAY['恋愛', '仕事', '金運', 'トラブル']),
+    ('today_free', ARRAY['今日']),
+    ('week_one', ARRAY['総合', '恋愛', '仕事', '金運', 'トラブル']),
+    ('partner_sexual', ARRAY['1', '2', '3', '4', '5', '6', '7'])
+  ) AS positions (result_type, position_labels) ON positions.result_type = fs.result_type
+CROSS JOIN LATERAL unnest(positions.position_labels) WITH ORDINALITY AS labels (position_label, slot_index);
+
+COMMIT;
@@ -0,0 +1,11 @@
+BEGIN;
+
+-- Seed version of each reading's draw (backend/services/readings.py SEED_VERSIONS).
+-- Every existing reading was drawn with version 1 (sha256 + Mersenne Twister),
+-- which stays available so stored seeds replay exactly.
+ALTER TABLE readings ADD COLUMN seed_version smallint NOT NULL DEFAULT 1;
+
+-- daily_draws rows are per seed version too; rows of the other version count as misses.
+ALTER TABLE daily_draws RENAME COLUMN algorithm_version TO seed_version;
+
+COMMIT;
@@ -0,0 +1,11 @@
+BEGIN;
+
+-- Message Batches custom_id a version was written from (backend/jobs/regenerate_batch.py).
+-- Writing the same batch result twice (a resumed run, a resubmitted batch) keeps one version.
+ALTER TABLE interpretation_versions ADD COLUMN batch_custom_id text;
+
+CREATE UNIQUE INDEX interpretation_versions_batch_custom_id_idx
+  ON interpretation_versions (reading_id, batch_custom_id)
+  WHERE batch_custom_id IS NOT NULL;
+
+COMMIT;
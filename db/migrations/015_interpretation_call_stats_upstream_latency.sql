@@ -0,0 +1,7 @@
+BEGIN;
+
+-- Latency of the upstream attempt that produced the text, without failed
+-- attempts or retry backoff (latency_ms is the whole call).
+ALTER TABLE interpretation_call_stats ADD COLUMN upstream_latency_ms integer;
+
+COMMIT;
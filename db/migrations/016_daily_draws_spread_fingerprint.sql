@@ -0,0 +1,8 @@
+BEGIN;
+
+-- Spread definition each row was drawn with (Spread.fingerprint: deck, major-only,
+-- card count, orientation, seed mode). Rows of another definition count as misses;
+-- existing rows have none and are rewritten by the next precompute run.
+ALTER TABLE daily_draws ADD COLUMN spread_fingerprint text;
+
+COMMIT;